@@ -5,3 +5,6 @@ class AuthConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.apps.auth"
     label = "authhentication"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from src.metrics import TimedAuthenticationMixin
+
+# Permission flags carried in the tokens. They tell `StatelessJWTAuthentication`
+# the token is one it issued; the values it trusts are re-read with `is_active`.
+USER_FLAG_CLAIMS = ("is_staff", "is_superuser")
+# User columns cached per user: `is_active` followed by the flags.
+USER_STATE_FIELDS = ("is_active", *USER_FLAG_CLAIMS)
+
+
+def add_user_claims(token, user):
+    """
+    Copy the user's current permission flags into `token` (and the access
+    tokens later derived from it).
+    """
+    for claim in USER_FLAG_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def get_user_state_cache():
+    return caches[settings.JWT_USER_STATE_CACHE_ALIAS]
+
+
+def user_state_key(user_id):
+    return f"auth:user-state:{user_id}"
+
+
+def forget_user_state(user_id):
+    """
+    Drop the cached `is_active` and permission flags so the next request
+    re-reads them.
+    """
+    get_user_state_cache().delete(user_state_key(user_id))
+
+
+class TimedJWTAuthentication(TimedAuthenticationMixin, JWTAuthentication):
+    """
+    `JWTAuthentication` that counts toward the request metrics' auth time.
+    """
+
+
+class StatelessJWTAuthentication(TimedJWTAuthentication):
+    """
+    JWT authentication that builds `request.user` from the token claims
+    instead of loading the `User` row on every request.
+
+    The user is a `User` instance holding only the id and the flags; any
+    other field is loaded from the database on first access. `is_active`,
+    `is_staff` and `is_superuser` are read from the row and cached for
+    `JWT_USER_STATE_TTL` seconds (and dropped whenever the user is saved),
+    so deactivation and demotion are honoured within that window; the flag
+    claims in the token are never trusted.
+    """
+
+    def has_user_claims(self, validated_token):
+        # Tokens issued before the flags were added fall back to the row fetch,
+        # as do setups that compare the password hash on every request.
+        return not api_settings.CHECK_REVOKE_TOKEN and all(
+            claim in validated_token for claim in USER_FLAG_CLAIMS
+        )
+
+    def get_user_id(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+        return self.user_model._meta.get_field(api_settings.USER_ID_FIELD).to_python(user_id)
+
+    def check_active(self, state):
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not state[0]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+    def build_user(self, user_id, state):
+        """
+        Return a `User` with every field but the id and flags deferred.
+        """
+        values = {
+            self.user_model._meta.get_field(api_settings.USER_ID_FIELD).attname: user_id,
+            **dict(zip(USER_STATE_FIELDS, map(bool, state))),
+        }
+        field_names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in values]
+        return self.user_model.from_db(
+            router.db_for_read(self.user_model),
+            field_names,
+            [values[name] for name in field_names],
+        )
+
+    def user_state(self, user_id):
+        return self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(
+            *USER_STATE_FIELDS
+        )
+
+    def get_user(self, validated_token):
+        if not self.has_user_claims(validated_token):
+            return super().get_user(validated_token)
+
+        user_id = self.get_user_id(validated_token)
+        cache = get_user_state_cache()
+        key = user_state_key(user_id)
+        state = cache.get(key)
+        if state is None:
+            state = self.user_state(user_id).first()
+            if state is not None:
+                cache.set(key, state, timeout=settings.JWT_USER_STATE_TTL)
+        self.check_active(state)
+        return self.build_user(user_id, state)
+
+
+class AsyncJWTAuthentication(StatelessJWTAuthentication):
+    """
+    JWT authentication for async (ASGI-native) views.
+
+    The token is verified in-process exactly like `JWTAuthentication`; the
+    user is built from the claims or loaded with the async ORM instead of a
+    blocking query.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """
+        Async counterpart of `get_user`.
+        """
+        user_id = self.get_user_id(validated_token)
+
+        if self.has_user_claims(validated_token):
+            cache = get_user_state_cache()
+            key = user_state_key(user_id)
+            state = await cache.aget(key)
+            if state is None:
+                state = await self.user_state(user_id).afirst()
+                if state is not None:
+                    await cache.aset(key, state, timeout=settings.JWT_USER_STATE_TTL)
+            self.check_active(state)
+            return self.build_user(user_id, state)
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
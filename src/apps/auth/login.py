@@ -0,0 +1,171 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+
+class HashingPool:
+    """
+    Runs password hashing on a fixed number of worker threads.
+
+    At most `workers` hashes run at once and `queue_depth` more may wait;
+    anything beyond that, or waiting longer than `timeout` seconds, is
+    refused with a 429 instead of piling up on the CPU.
+    """
+
+    def __init__(self, workers, queue_depth, timeout):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="login-hash")
+        self.slots = threading.BoundedSemaphore(workers + queue_depth)
+        self.timeout = timeout
+
+    def busy(self):
+        return Throttled(
+            wait=settings.LOGIN_BUSY_RETRY_AFTER,
+            detail="Too many logins in progress, please try again shortly.",
+        )
+
+    def run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise self.busy()
+        try:
+            future = self.executor.submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                if future.cancel():
+                    raise self.busy()
+                # Already hashing; it finishes in one hash time.
+                return future.result()
+        finally:
+            self.slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """
+    Return the process-wide `HashingPool`, created on first use (after any
+    worker fork).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(
+                    settings.LOGIN_HASH_WORKERS,
+                    settings.LOGIN_HASH_QUEUE_DEPTH,
+                    settings.LOGIN_HASH_QUEUE_TIMEOUT,
+                )
+    return _pool
+
+
+def verify_and_rehash(password, encoded):
+    """
+    Return (is_correct, new_encoded); `new_encoded` is a hash with the
+    preferred hasher when the stored one is outdated, else None.
+    """
+    is_correct, must_update = verify_password(password, encoded)
+    if is_correct and must_update:
+        return True, make_password(password)
+    return is_correct, None
+
+
+def check_login_password(user, password):
+    """
+    Check `password` on the hashing pool. Returns (is_correct, changed_fields);
+    an outdated hash is replaced on `user` but not saved.
+    """
+    is_correct, new_encoded = get_hashing_pool().run(verify_and_rehash, password, user.password)
+    if new_encoded is None:
+        return is_correct, []
+    user.password = new_encoded
+    return is_correct, ["password"]
+
+
+class FailureCounter:
+    """
+    Failed logins per identifier, limited with GCRA and kept in the Django
+    cache.
+
+    The cache holds the time (in ms) at which the identifier's budget of
+    `capacity` failures is full again; each failure pushes it
+    `LOGIN_FAILURE_REFILL_SECONDS` further with the cache's atomic `add` and
+    `incr`, so concurrent failures are all counted. Attempts are refused
+    while it is more than `capacity - 1` refills ahead of the clock, so one
+    attempt comes back every `LOGIN_FAILURE_REFILL_SECONDS`.
+    """
+
+    def __init__(self, scope, capacity):
+        self.scope = scope
+        self.capacity = capacity
+
+    def get_cache(self):
+        return caches[settings.LOGIN_RATE_LIMIT_CACHE_ALIAS]
+
+    def key(self, ident):
+        return f"auth:login-failures:{self.scope}:{ident}"
+
+    def retry_after(self, ident):
+        """
+        Return the seconds until an attempt is allowed, or 0.
+        """
+        full_at = self.get_cache().get(self.key(ident))
+        if full_at is None:
+            return 0
+        ahead = full_at / 1000 - time.time()
+        return max(ahead - (self.capacity - 1) * settings.LOGIN_FAILURE_REFILL_SECONDS, 0)
+
+    def consume(self, ident):
+        now = time.time()
+        cache = self.get_cache()
+        key = self.key(ident)
+        refill = settings.LOGIN_FAILURE_REFILL_SECONDS
+        # A missing entry is a full budget: start counting from now.
+        cache.add(key, int(now * 1000), timeout=refill + 1)
+        try:
+            full_at = cache.incr(key, refill * 1000)
+        except ValueError:
+            # Expired between `add` and `incr`.
+            full_at = int(now * 1000) + refill * 1000
+            cache.add(key, full_at, timeout=refill + 1)
+        # Drop the entry once the budget is full again.
+        cache.touch(key, timeout=int(full_at / 1000 - now) + 1)
+
+    def reset(self, ident):
+        self.get_cache().delete(self.key(ident))
+
+
+def get_failure_counters(username, request):
+    """
+    Return the (counter, identifier) pairs a login attempt counts against.
+
+    Clients are told apart by `REMOTE_ADDR`; `X-Forwarded-For` is only used
+    when `NUM_PROXIES` says how many trusted proxies append to it.
+    """
+    return [
+        (FailureCounter("username", settings.LOGIN_FAILURES_PER_USERNAME), username.lower()),
+        (FailureCounter("ip", settings.LOGIN_FAILURES_PER_IP), BaseThrottle().get_ident(request)),
+    ]
+
+
+def check_login_allowed(username, request):
+    wait = max(counter.retry_after(ident) for counter, ident in get_failure_counters(username, request))
+    if wait:
+        raise Throttled(wait=wait, detail="Too many failed login attempts.")
+
+
+def record_login_failure(username, request):
+    for counter, ident in get_failure_counters(username, request):
+        counter.consume(ident)
+
+
+def record_login_success(username, request):
+    counter, ident = get_failure_counters(username, request)[0]
+    counter.reset(ident)
@@ -0,0 +1,59 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.exceptions import Throttled
+
+from src.apps.auth.login import check_login_password
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure password checks per second through the login hashing pool, "
+        "with concurrent clients and in-memory users (no database writes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200, help="Number of login attempts.")
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=None,
+            help="Concurrent clients (default: twice the pool workers plus the queue depth).",
+        )
+        parser.add_argument(
+            "--hasher",
+            default=None,
+            help="Hasher algorithm the stored passwords use, e.g. pbkdf2_sha256 (default: preferred).",
+        )
+
+    def handle(self, *args, **options):
+        workers = settings.LOGIN_HASH_WORKERS
+        clients = options["clients"] or 2 * (workers + settings.LOGIN_HASH_QUEUE_DEPTH)
+        password = "benchmark-password"
+        encoded = make_password(password, hasher=options["hasher"] or "default")
+
+        def login(_):
+            user = User(username="benchmark-logins", password=encoded)
+            try:
+                is_correct, _fields = check_login_password(user, password)
+            except Throttled:
+                return "shed"
+            return "ok" if is_correct else "failed"
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            outcomes = list(executor.map(login, range(options["logins"])))
+        elapsed = time.perf_counter() - started
+
+        accepted = outcomes.count("ok")
+        cores = min(workers, os.cpu_count() or 1)
+        self.stdout.write(f"Hasher:        {encoded.split('$', 1)[0]}")
+        self.stdout.write(f"Pool workers:  {workers} (queue depth {settings.LOGIN_HASH_QUEUE_DEPTH}, {clients} clients)")
+        self.stdout.write(f"Accepted:      {accepted}, shed with 429: {outcomes.count('shed')}")
+        self.stdout.write(f"Logins/s:      {accepted / elapsed:,.1f}")
+        self.stdout.write(self.style.SUCCESS(f"Logins/s/core: {accepted / elapsed / cores:,.1f}"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from src.apps.auth.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Delete revoked refresh token JTIs whose tokens have expired (past REFRESH_TOKEN_LIFETIME)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would be deleted.")
+
+    def handle(self, *args, **options):
+        expired = RevokedToken.objects.filter(expires_at__lte=timezone.now())
+        if options["dry_run"]:
+            self.stdout.write(f"{expired.count()} expired revoked tokens would be deleted.")
+            return
+        deleted, _ = expired.delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired revoked tokens."))
@@ -1,3 +1,17 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class RevokedToken(models.Model):
+    """
+    JTI of a refresh token revoked before its expiry, e.g. on logout.
+
+    Rows are only needed until the token would have expired anyway; the
+    `purge_revoked_tokens` command deletes them after that.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,84 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import RevokedToken
+
+
+class RevocationList:
+    """
+    In-process copy of the revoked JTIs, so checking a refresh token is a
+    dict lookup instead of a query.
+
+    Each process loads the unexpired rows once, then at most every
+    `REVOKED_TOKEN_SYNC_SECONDS` pulls the rows revoked since its previous
+    sync, and forgets JTIs once their token has expired.
+    """
+    # Re-read this far back on each sync, for rows committed after a sync
+    # that started later than their `revoked_at`.
+    overlap = timedelta(minutes=1)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.expiries = {}
+        self.synced_at = None
+        self.sync_started_at = None
+
+    def sync(self):
+        with self.lock:
+            started_at = timezone.now()
+            if self.sync_started_at is None:
+                rows = RevokedToken.objects.filter(expires_at__gt=started_at)
+            else:
+                rows = RevokedToken.objects.filter(revoked_at__gte=self.sync_started_at - self.overlap)
+            for jti, expires_at in rows.values_list("jti", "expires_at").iterator(chunk_size=2000):
+                self.expiries[jti] = expires_at.timestamp()
+            now = time.time()
+            self.expiries = {jti: expiry for jti, expiry in self.expiries.items() if expiry > now}
+            self.sync_started_at = started_at
+            self.synced_at = time.monotonic()
+
+    def is_stale(self):
+        return self.synced_at is None or time.monotonic() - self.synced_at >= settings.REVOKED_TOKEN_SYNC_SECONDS
+
+    def add(self, jti, expires_at):
+        with self.lock:
+            self.expiries[jti] = expires_at.timestamp()
+
+    def __contains__(self, jti):
+        if self.is_stale():
+            self.sync()
+        return jti in self.expiries
+
+
+revoked_tokens = RevocationList()
+
+
+class RevocableRefreshToken(RefreshToken):
+    """
+    Refresh token rejected once its JTI has been revoked.
+    """
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if self.payload[api_settings.JTI_CLAIM] in revoked_tokens:
+            raise TokenError(_("Token is revoked"))
+
+    def revoke(self):
+        """
+        Persist this token's JTI as revoked until the token expires.
+        """
+        jti = self.payload[api_settings.JTI_CLAIM]
+        expires_at = datetime.fromtimestamp(self.payload["exp"], tz=dt_timezone.utc)
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=jti, expires_at=expires_at)],
+            ignore_conflicts=True,
+        )
+        revoked_tokens.add(jti, expires_at)
@@ -1,9 +1,23 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
+from src.metrics import TimedSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+from .authentication import StatelessJWTAuthentication, add_user_claims
+from .login import (
+    check_login_allowed,
+    check_login_password,
+    record_login_failure,
+    record_login_success,
+)
+from .revocation import RevocableRefreshToken
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for user details.
     """
@@ -13,7 +27,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "username", "email")
 
 
-class UserRegisterSerializer(serializers.ModelSerializer):
+class UserRegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for user registration.
     """
@@ -63,15 +77,27 @@ class UserLoginSerializer(serializers.Serializer):
         if not username or not password:
             raise serializers.ValidationError({"msg": "Username and password are required."})
 
+        request = self.context.get("request")
+        if request is not None:
+            check_login_allowed(username, request)
+
         try:
             user: User = User.objects.get(username=username)
         except User.DoesNotExist:
+            if request is not None:
+                record_login_failure(username, request)
             raise serializers.ValidationError({"msg": "User does not exist."})
-        
-        if user.check_password(password):
+
+        is_correct, changed_fields = check_login_password(user, password)
+        if is_correct:
             attrs["user"] = user
+            attrs["changed_fields"] = changed_fields
+            if request is not None:
+                record_login_success(username, request)
         else:
             attrs["user"] = None
+            if request is not None:
+                record_login_failure(username, request)
             raise serializers.ValidationError({"msg": "Incorrect username or password."})
 
         return attrs
@@ -85,4 +111,47 @@ class UserLogoutSerializer(serializers.Serializer):
         max_length=255*2,
         required=True,
         help_text="Refresh token to be blacklisted.",
-    )
\ No newline at end of file
+    )
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Token pair serializer whose tokens carry the user's staff and superuser
+    flags for `StatelessJWTAuthentication`.
+    """
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that rejects revoked refresh tokens from memory and
+    checks the user through `StatelessJWTAuthentication`'s cached state
+    instead of loading the user row. The new tokens carry the user's
+    current flags, not the ones copied at login.
+    """
+    token_class = RevocableRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        try:
+            user = StatelessJWTAuthentication().get_user(refresh)
+        except AuthenticationFailed:
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"],
+                "no_active_account",
+            )
+        add_user_claims(refresh, user)
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.revoke()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+
+        return data
@@ -0,0 +1,16 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_user_state
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user_state(sender, instance, raw=False, **kwargs):
+    """
+    Make logins, logouts and admin edits visible to `StatelessJWTAuthentication`
+    on the next request instead of after the cache entry expires.
+    """
+    if not raw:
+        forget_user_state(instance.pk)
@@ -1,3 +1,351 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from src.apps.auth.login import FailureCounter, HashingPool
+from src.apps.auth.models import RevokedToken
+from src.apps.auth.revocation import RevocationList
+from src.apps.expenses.models import Expense
+from src.testing import QueryBudgetMixin
+
+
+class AuthEndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Every auth endpoint must run a fixed, small number of queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("budget", "budget@example.com", "password123")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post(
+            reverse("user-login"), {"username": "budget", "password": "password123"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_register(self):
+        payload = {"username": "newcomer", "email": "newcomer@example.com", "password": "password123"}
+        with self.assertMaxQueries(3):
+            response = self.client.post(reverse("user-register"), payload, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_login(self):
+        with self.assertMaxQueries(1):
+            self.login()
+
+    def test_refresh(self):
+        tokens = self.login()
+        with self.assertMaxQueries(1):
+            response = self.client.post(reverse("token-refresh"), {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_profile(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.assertMaxQueries(2):
+            self.assertEqual(self.client.get(reverse("user-profile")).status_code, 200)
+        with self.assertMaxQueries(2):
+            response = self.client.patch(reverse("user-profile"), {"first_name": "Budget"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.assertMaxQueries(4):
+            response = self.client.post(
+                reverse("user-logout"), {"refresh_token": tokens["refresh"]}, format="json"
+            )
+        self.assertEqual(response.status_code, 205)
+
+
+class StatelessAuthenticationTests(TestCase):
+    """
+    Tokens must not outlive a deactivation or a demotion: the flags that
+    `request.user` is built from are re-read, not taken from the token.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("root", "root@example.com", "password123")
+        owner = User.objects.create_user("owner", "owner@example.com", "password123")
+        cls.expense = Expense.objects.create(user=owner, title="Private", amount=Decimal("10.00"))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        response = self.client.post(
+            reverse("user-login"), {"username": "root", "password": "password123"}, format="json"
+        )
+        self.tokens = response.json()
+        self.url = reverse("expense-detail", args=[self.expense.pk])
+
+    def get_expense(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        return self.client.get(self.url).status_code
+
+    def refresh(self):
+        self.client.credentials()
+        return self.client.post(reverse("token-refresh"), {"refresh": self.tokens["refresh"]}, format="json")
+
+    def test_demotion_applies_to_issued_tokens(self):
+        self.assertEqual(self.get_expense(self.tokens["access"]), 200)
+
+        self.admin.is_superuser = self.admin.is_staff = False
+        self.admin.save()
+        self.assertEqual(self.get_expense(self.tokens["access"]), 404)
+
+        response = self.refresh()
+        self.assertEqual(response.status_code, 200, response.content)
+        access = response.json()["access"]
+        self.assertFalse(AccessToken(access)["is_superuser"])
+        self.assertEqual(self.get_expense(access), 404)
+
+    def test_deactivation_applies_to_issued_tokens(self):
+        self.assertEqual(self.get_expense(self.tokens["access"]), 200)
+
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.get_expense(self.tokens["access"]), 401)
+        self.assertEqual(self.refresh().status_code, 401)
+
+
+@override_settings(LOGIN_FAILURES_PER_USERNAME=3, LOGIN_FAILURES_PER_IP=5, LOGIN_FAILURE_REFILL_SECONDS=60)
+class LoginThrottleTests(TestCase):
+    """
+    Failed logins must be limited per username and per client address, and
+    the address must not be taken from headers the client controls.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("victim", "victim@example.com", "password123")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.now = 1_000_000.0
+        self.enterContext(mock.patch("src.apps.auth.login.time.time", side_effect=lambda: self.now))
+
+    def login(self, username="victim", password="wrong-password", **extra):
+        return self.client.post(
+            reverse("user-login"), {"username": username, "password": password}, format="json", **extra
+        )
+
+    def test_username_lockout(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 400)
+        response = self.login(password="password123")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+
+        # Other usernames from another address are unaffected.
+        self.assertEqual(self.login("other", REMOTE_ADDR="10.0.0.2").status_code, 400)
+
+        # One attempt comes back every LOGIN_FAILURE_REFILL_SECONDS.
+        self.now += 60
+        self.assertEqual(self.login().status_code, 400)
+        self.assertEqual(self.login().status_code, 429)
+        self.now += 60
+        self.assertEqual(self.login(password="password123").status_code, 200)
+        self.assertEqual(self.login().status_code, 400)
+
+    def test_address_limit_ignores_forwarded_for(self):
+        for index in range(5):
+            response = self.login(f"user{index}", HTTP_X_FORWARDED_FOR=f"203.0.113.{index}")
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.login("user9", HTTP_X_FORWARDED_FOR="203.0.113.9").status_code, 429)
+        self.assertEqual(self.login("user9", REMOTE_ADDR="10.0.0.2").status_code, 400)
+
+    def test_failures_are_counted_atomically(self):
+        counter = FailureCounter("ip", 100)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: counter.consume("10.0.0.1"), range(40)))
+        self.assertEqual(cache.get(counter.key("10.0.0.1")), (self.now + 40 * 60) * 1000)
+
+
+class LoginHashingTests(TestCase):
+    """
+    Logins must be refused with a 429 once the hashing pool and its queue
+    are full, and an outdated password hash must be upgraded on login.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("hasher", "hasher@example.com", "password123")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, password="password123"):
+        return self.client.post(
+            reverse("user-login"), {"username": "hasher", "password": password}, format="json"
+        )
+
+    def use_pool(self, workers, queue_depth, timeout):
+        pool = HashingPool(workers, queue_depth, timeout)
+        self.addCleanup(pool.executor.shutdown)
+        self.enterContext(mock.patch("src.apps.auth.login._pool", pool))
+        return pool
+
+    def occupy(self, pool):
+        """
+        Keep one of the pool's workers busy until the returned callable runs.
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            started.set()
+            # Bounded so a login wrongly queued behind it fails instead of hanging.
+            release.wait(timeout=5)
+
+        thread = threading.Thread(target=pool.run, args=(hold,))
+        thread.start()
+        started.wait()
+
+        def finish():
+            release.set()
+            thread.join()
+
+        self.addCleanup(finish)
+        return finish
+
+    def test_full_pool_sheds_logins(self):
+        pool = self.use_pool(workers=1, queue_depth=0, timeout=5)
+        finish = self.occupy(pool)
+        with mock.patch.object(pool.executor, "submit", wraps=pool.executor.submit) as submit:
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        # Refused up front, without queueing for the worker.
+        submit.assert_not_called()
+        self.assertEqual(response["Retry-After"], str(settings.LOGIN_BUSY_RETRY_AFTER))
+
+        finish()
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_queued_login_times_out(self):
+        pool = self.use_pool(workers=1, queue_depth=1, timeout=0.01)
+        self.occupy(pool)
+        self.assertEqual(self.login().status_code, 429)
+
+    def test_outdated_hash_is_upgraded(self):
+        outdated = make_password("password123", hasher="pbkdf2_sha1")
+        User.objects.filter(pk=self.user.pk).update(password=outdated)
+
+        self.assertEqual(self.login("wrong-password").status_code, 400)
+        self.assertEqual(User.objects.get(pk=self.user.pk).password, outdated)
+
+        self.assertEqual(self.login().status_code, 200)
+        upgraded = User.objects.get(pk=self.user.pk).password
+        self.assertEqual(identify_hasher(upgraded).algorithm, get_hasher().algorithm)
+        self.assertTrue(check_password("password123", upgraded))
+
+        # A current hash is left alone.
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(User.objects.get(pk=self.user.pk).password, upgraded)
+
+
+class TokenRevocationTests(TestCase):
+    """
+    A refresh token revoked on logout must be refused by every process: at
+    once by the one that revoked it, and within REVOKED_TOKEN_SYNC_SECONDS
+    by the others.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("leaver", "leaver@example.com", "password123")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.tokens = self.client.post(
+            reverse("user-login"), {"username": "leaver", "password": "password123"}, format="json"
+        ).json()
+        # This test's stand-in for the process handling the requests.
+        self.enterContext(mock.patch("src.apps.auth.revocation.revoked_tokens", RevocationList()))
+
+    def refresh(self):
+        self.client.credentials()
+        return self.client.post(reverse("token-refresh"), {"refresh": self.tokens["refresh"]}, format="json")
+
+    def logout(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        response = self.client.post(reverse("user-logout"), {"refresh_token": self.tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 205)
+        # Logout also deactivates the user; reactivate to see the revocation alone.
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        cache.clear()
+
+    def test_logged_out_refresh_token_is_rejected(self):
+        self.assertEqual(self.refresh().status_code, 200)
+        self.logout()
+        response = self.refresh()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "token_not_valid")
+        self.assertTrue(RevokedToken.objects.filter(jti=RefreshToken(self.tokens["refresh"], verify=False)["jti"]).exists())
+
+    def test_other_processes_reject_it_after_a_sync(self):
+        other = RevocationList()
+        other.sync()
+        self.logout()
+
+        with mock.patch("src.apps.auth.revocation.revoked_tokens", other):
+            # Within the sync interval the other process has not seen it yet.
+            self.assertEqual(self.refresh().status_code, 200)
+            other.synced_at -= settings.REVOKED_TOKEN_SYNC_SECONDS
+            self.assertEqual(self.refresh().status_code, 401)
+
+        # A process started after the logout loads it on its first check.
+        with mock.patch("src.apps.auth.revocation.revoked_tokens", RevocationList()):
+            self.assertEqual(self.refresh().status_code, 401)
+
+    def test_other_users_token_is_not_revoked(self):
+        User.objects.create_user("bystander", "bystander@example.com", "password123")
+        theirs = self.client.post(
+            reverse("user-login"), {"username": "bystander", "password": "password123"}, format="json"
+        ).json()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        response = self.client.post(reverse("user-logout"), {"refresh_token": theirs["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RevokedToken.objects.exists())
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_active)
+
+        self.client.credentials()
+        response = self.client.post(reverse("token-refresh"), {"refresh": theirs["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_purge_keeps_unexpired_tokens(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti="expired", expires_at=now - timedelta(seconds=1))
+        RevokedToken.objects.create(jti="live", expires_at=now + timedelta(days=1))
+        output = StringIO()
+        call_command("purge_revoked_tokens", "--dry-run", stdout=output)
+        self.assertIn("1 expired revoked tokens would be deleted.", output.getvalue())
+        call_command("purge_revoked_tokens", stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["live"])
+
+        revocations = RevocationList()
+        revocations.add("expired", now - timedelta(seconds=1))
+        self.assertIn("live", revocations)
+        self.assertNotIn("expired", revocations)
@@ -1,14 +1,16 @@
+from django.contrib.auth.models import User
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings
 
 from .serializers import (
     UserSerializer,
     UserRegisterSerializer,
     UserLoginSerializer,
     UserLogoutSerializer,
+    UserTokenObtainPairSerializer,
 )
+from .revocation import RevocableRefreshToken
 
 class UserDetailView(generics.RetrieveUpdateAPIView):
     """
@@ -18,7 +20,8 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # `request.user` may be token-backed with most fields deferred.
+        return User.objects.get(pk=self.request.user.pk)
 
 class UserRegistrationView(generics.CreateAPIView):
     """
@@ -51,9 +54,13 @@ class UserLoginView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        user.is_active = True  # Ensure user is active
-        user.save()
-        token = TokenObtainPairSerializer.get_token(user)
+        changed_fields = serializer.validated_data['changed_fields']
+        if not user.is_active:
+            user.is_active = True  # Ensure user is active
+            changed_fields.append("is_active")
+        if changed_fields:
+            user.save(update_fields=changed_fields)
+        token = UserTokenObtainPairSerializer.get_token(user)
 
 
         return Response({
@@ -68,7 +75,7 @@ class UserLoginView(generics.GenericAPIView):
 
 class UserLogoutView(generics.GenericAPIView):
     """
-    View to log out a user by blacklisting the refresh token.
+    View to log out a user by revoking the refresh token.
     """
     serializer_class = UserLogoutSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -84,12 +91,18 @@ class UserLogoutView(generics.GenericAPIView):
                 {"msg": "Refresh token is required."},
                 status=status.HTTP_400_BAD_REQUEST
                 )
-        token = RefreshToken(refresh_token)
         try:
-            token.blacklist()
+            token = RevocableRefreshToken(refresh_token)
+            user_id = User._meta.get_field(api_settings.USER_ID_FIELD).to_python(token.get(api_settings.USER_ID_CLAIM))
+            if user_id != request.user.pk:
+                return Response(
+                    {"msg": "Refresh token does not belong to this user."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            token.revoke()
             user = request.user
             user.is_active = False  # Deactivate user on logout
-            user.save()
+            user.save(update_fields=["is_active"])
 
             return Response(
                 {"msg": "User logged out successfully."},
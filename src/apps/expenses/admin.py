@@ -1,4 +1,36 @@
 from django.contrib import admin
-from .models import Expense
+from .models import Expense, Job, RecurringExpense
 
-admin.site.register(Expense)
+
+@admin.register(Expense)
+class ExpenseAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "title", "transaction_type", "total", "created_at")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
+
+
+@admin.register(RecurringExpense)
+class RecurringExpenseAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "user", "frequency", "interval", "next_run_at", "is_active")
+    list_select_related = ("user",)
+    list_filter = ("frequency", "is_active")
+    raw_id_fields = ("user",)
+    readonly_fields = ("occurrences", "next_run_at")
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Write only the edited fields: the scheduler may have advanced
+            # `occurrences`/`next_run_at` since the form was loaded.
+            obj.save(update_fields=[*form.changed_data, "updated_at"])
+        else:
+            obj.schedule_next()
+            obj.save()
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "user", "kind", "status", "attempts", "run_at", "locked_by")
+    list_select_related = ("user",)
+    list_filter = ("kind", "status")
+    raw_id_fields = ("user",)
+    readonly_fields = ("attempts", "locked_by", "locked_until", "progress", "progress_detail", "result", "error")
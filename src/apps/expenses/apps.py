@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ExpensesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.apps.expenses"
+
+    def ready(self):
+        from . import caching, replicas, signals  # noqa: F401
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedExpense, Expense
+from .rollups import signals_suspended
+from .writer import serialized_writes
+
+# Columns copied verbatim from `Expense` to `ArchivedExpense`.
+ARCHIVE_FIELDS = (
+    "id",
+    "user_id",
+    "title",
+    "description",
+    "amount",
+    "transaction_type",
+    "tax",
+    "tax_type",
+    "total",
+    "created_at",
+    "updated_at",
+    "recurring_id",
+    "occurrence",
+)
+
+
+def archive_cutoff(days=None):
+    """
+    Return the instant before which expenses belong in the archive.
+    """
+    if days is None:
+        days = settings.EXPENSE_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    return Expense.objects.filter(created_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to `batch_size` expenses created before `cutoff` into the archive
+    in one short transaction, returning how many were moved.
+
+    The rows keep their ids and stay counted in the rollups; rows locked by
+    a concurrent writer are skipped and picked up by a later batch.
+    """
+    with serialized_writes(), transaction.atomic():
+        rows = list(
+            archivable(cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by("pk")
+            .values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        # Delete first: on SQLite the delete trigger would otherwise drop the
+        # full-text entries the archive insert just added under the same ids.
+        with signals_suspended():
+            Expense.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+        ArchivedExpense.objects.bulk_create([ArchivedExpense(**row) for row in rows])
+    return len(rows)
@@ -0,0 +1,12 @@
+from django.urls import path
+from .async_views import (
+    AsyncExpenseListView,
+    AsyncExpenseDetailView,
+    AsyncExpenseSummaryView,
+)
+
+urlpatterns = [
+    path('', AsyncExpenseListView.as_view(), name='async-expense-list'),
+    path('<int:pk>/', AsyncExpenseDetailView.as_view(), name='async-expense-detail'),
+    path('summary/', AsyncExpenseSummaryView.as_view(), name='async-expense-summary'),
+]
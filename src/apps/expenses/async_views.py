@@ -0,0 +1,194 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.dateparse import parse_datetime
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from src.apps.auth.authentication import AsyncJWTAuthentication
+from src.metrics import timed
+
+from .filters import filter_expenses
+from .models import AllExpense
+from .search import search_expenses
+from .serializers import (
+    ExpenseFastSerializer,
+    ExpenseSummaryQuerySerializer,
+    ExpenseSummarySerializer,
+)
+from .summaries import summary_rows
+
+
+class AsyncExpenseView(View):
+    """
+    Base for ASGI-native expense read views.
+
+    Plain Django async views: authentication, queries and rendering never
+    block the event loop on a worker thread for the whole request, and the
+    responses match the DRF views they mirror.
+    """
+    authentication = AsyncJWTAuthentication()
+    http_method_names = ["get", "head", "options"]
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        return HttpResponse(
+            JSONRenderer().render(data),
+            content_type="application/json",
+            status=status_code,
+            headers=headers,
+        )
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            with timed("auth"):
+                result = await self.authentication.aauthenticate(request)
+        except exceptions.APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+            return self.render(detail, exc.status_code, self.challenge(request))
+        if result is None:
+            return self.render(
+                {"detail": exceptions.NotAuthenticated.default_detail},
+                status.HTTP_401_UNAUTHORIZED,
+                self.challenge(request),
+            )
+        request.user, request.auth = result
+        return await super().dispatch(request, *args, **kwargs)
+
+    def challenge(self, request):
+        return {"WWW-Authenticate": self.authentication.authenticate_header(request)}
+
+    def get_queryset(self):
+        """
+        Return the expenses (hot and archived) the authenticated user is
+        allowed to read.
+        """
+        user = self.request.user
+        return AllExpense.objects.all() if user.is_superuser else AllExpense.objects.filter(user=user)
+
+
+def get_page_size(request, default):
+    try:
+        page_size = int(request.GET["page_size"])
+    except (KeyError, ValueError):
+        return default
+    return min(page_size, settings.EXPENSE_MAX_PAGE_SIZE) if page_size > 0 else default
+
+
+def encode_cursor(row):
+    position = json.dumps([row["created_at"].isoformat(), row["id"]])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = parse_datetime(created_at)
+    except (TypeError, ValueError):
+        raise exceptions.NotFound("Invalid cursor")
+    if created_at is None or not isinstance(pk, int):
+        raise exceptions.NotFound("Invalid cursor")
+    return created_at, pk
+
+
+class AsyncExpenseListView(AsyncExpenseView):
+    """
+    Async expense list with page-number (`?page=`) or forward keyset
+    (`?pagination=cursor`) pagination, and the filters, `ordering` and `q`
+    search of `ExpenseListCreateView`.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        cursor = "cursor" in request.GET or request.GET.get("pagination") == "cursor"
+        queryset = self.get_queryset()
+        query = request.GET.get("q", "").strip()
+        queryset = search_expenses(queryset, query) if query else queryset.order_by("-created_at", "-id")
+        try:
+            queryset = filter_expenses(queryset, request.GET, cursor)
+        except exceptions.ValidationError as exc:
+            return self.render(exc.detail, status.HTTP_400_BAD_REQUEST)
+        if cursor:
+            # Like `ExpenseCursorPagination`, always newest first.
+            rows = queryset.order_by("-created_at", "-id").values(*ExpenseFastSerializer.source_fields)
+            return await self.cursor_page(request, rows)
+        return await self.numbered_page(request, queryset, queryset.values(*ExpenseFastSerializer.source_fields))
+
+    async def numbered_page(self, request, queryset, rows):
+        page_size = get_page_size(request, settings.EXPENSE_PAGE_SIZE)
+        try:
+            page = int(request.GET.get("page", 1))
+        except ValueError:
+            page = 0
+        count = await queryset.acount()
+        last_page = max((count + page_size - 1) // page_size, 1)
+        if not 1 <= page <= last_page:
+            return self.render({"detail": "Invalid page."}, status.HTTP_404_NOT_FOUND)
+
+        offset = (page - 1) * page_size
+        results = [row async for row in rows[offset:offset + page_size].aiterator()]
+        url = request.build_absolute_uri()
+        previous = None
+        if page > 1:
+            previous = remove_query_param(url, "page") if page == 2 else replace_query_param(url, "page", page - 1)
+        return self.render({
+            "count": count,
+            "next": replace_query_param(url, "page", page + 1) if page < last_page else None,
+            "previous": previous,
+            "results": ExpenseFastSerializer(results, many=True).data,
+        })
+
+    async def cursor_page(self, request, rows):
+        page_size = get_page_size(request, settings.EXPENSE_PAGE_SIZE)
+        if "cursor" in request.GET:
+            try:
+                created_at, pk = decode_cursor(request.GET["cursor"])
+            except exceptions.NotFound as exc:
+                return self.render({"detail": exc.detail}, status.HTTP_404_NOT_FOUND)
+            rows = rows.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        results = [row async for row in rows[:page_size + 1].aiterator()]
+        next_url = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", encode_cursor(results[-1]))
+        return self.render({
+            "next": next_url,
+            "previous": None,
+            "results": ExpenseFastSerializer(results, many=True).data,
+        })
+
+
+class AsyncExpenseDetailView(AsyncExpenseView):
+    """
+    Async retrieval of a single expense.
+    """
+
+    async def get(self, request, pk, *args, **kwargs):
+        queryset = self.get_queryset()
+        row = await queryset.values(*ExpenseFastSerializer.source_fields).filter(pk=pk).afirst()
+        if row is None:
+            # The message of `get_object_or_404` in the DRF view.
+            detail = f"No {queryset.model._meta.object_name} matches the given query."
+            return self.render({"detail": detail}, status.HTTP_404_NOT_FOUND)
+        return self.render(ExpenseFastSerializer(row).data)
+
+
+class AsyncExpenseSummaryView(AsyncExpenseView):
+    """
+    Async counterpart of `ExpenseSummaryView`.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        params = ExpenseSummaryQuerySerializer(data=request.GET)
+        if not params.is_valid():
+            return self.render(params.errors, status.HTTP_400_BAD_REQUEST)
+        filters = params.validated_data
+        rows = [row async for row in summary_rows(request.user, filters).aiterator()]
+        return self.render({
+            "period": filters["period"],
+            "results": ExpenseSummarySerializer(rows, many=True).data,
+        })
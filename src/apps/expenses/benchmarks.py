@@ -0,0 +1,305 @@
+import json
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import Max
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Expense, TaxTypeChoice, TransactionTypeChoice
+from .rollups import record_changes, signals_suspended
+from .writer import serialized_writes
+
+# Password of every seeded user, so scenarios can log in as them.
+SEED_PASSWORD = "benchmark-password"
+SEED_USER_PREFIX = "bench"
+
+# Most entries are spending; income comes in fewer, larger amounts.
+TRANSACTION_TYPE_WEIGHTS = {TransactionTypeChoice.DEBIT: 85, TransactionTypeChoice.CREDIT: 15}
+TAX_TYPE_WEIGHTS = {TaxTypeChoice.PERCENTAGE: 65, TaxTypeChoice.FLAT: 35}
+TAX_RATE_WEIGHTS = {0: 20, 5: 25, 8: 10, 10: 15, 12: 10, 18: 15, 20: 5}
+TITLES = {
+    TransactionTypeChoice.DEBIT: (
+        "Groceries", "Coffee", "Rent", "Electricity", "Internet", "Fuel", "Lunch",
+        "Train ticket", "Pharmacy", "Gym membership", "Books", "Cinema", "Taxi",
+    ),
+    TransactionTypeChoice.CREDIT: ("Salary", "Freelance invoice", "Refund", "Interest", "Gift"),
+}
+# Parameters of the log-normal amount distributions (median = e ** mu).
+AMOUNT_MU_SIGMA = {TransactionTypeChoice.DEBIT: (3.4, 1.1), TransactionTypeChoice.CREDIT: (7.3, 0.7)}
+MAX_AMOUNT = Decimal("99999999.99")
+MAX_FLAT_TAX = Decimal("999.99")
+
+# Items per request of the `bulk_create` scenario.
+BULK_ITEMS = 100
+
+# Metrics `compare` checks; throughput regresses when it drops, latencies when they grow.
+HIGHER_IS_BETTER = {"throughput": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+DEFAULT_COMPARED_METRICS = ("throughput", "p95_ms")
+
+
+def weighted_choice(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def fake_expense(rng, user, created_at):
+    """
+    Return an unsaved `Expense` drawn from the seed distributions.
+    """
+    transaction_type = weighted_choice(rng, TRANSACTION_TYPE_WEIGHTS)
+    tax_type = weighted_choice(rng, TAX_TYPE_WEIGHTS)
+    mu, sigma = AMOUNT_MU_SIGMA[transaction_type]
+    amount = min(Decimal(str(round(rng.lognormvariate(mu, sigma), 2))), MAX_AMOUNT) or Decimal("0.01")
+    if tax_type == TaxTypeChoice.PERCENTAGE:
+        tax = Decimal(weighted_choice(rng, TAX_RATE_WEIGHTS))
+    else:
+        tax = min((amount * Decimal(rng.uniform(0, 0.1))).quantize(Decimal("0.01")), MAX_FLAT_TAX)
+    return Expense(
+        user=user,
+        title=rng.choice(TITLES[transaction_type]),
+        description="Imported from bank statement" if rng.random() < 0.2 else None,
+        amount=amount,
+        tax=tax,
+        tax_type=tax_type,
+        transaction_type=transaction_type,
+        created_at=created_at,
+    )
+
+
+def seed_users(users, expenses_per_user, seed=0, days=730, prefix=SEED_USER_PREFIX, batch_size=None):
+    """
+    Replace the users named `<prefix>-<n>` with `users` fresh ones holding
+    `expenses_per_user` expenses each, spread over the last `days` days.
+
+    The same arguments always produce the same rows (apart from the
+    timestamps, which are relative to now), so runs are comparable.
+    """
+    rng = random.Random(seed)
+    batch_size = batch_size or settings.EXPENSE_BULK_BATCH_SIZE
+    now = timezone.now()
+
+    with serialized_writes(), transaction.atomic(), signals_suspended():
+        # The user's rollups go with it, so nothing needs recording.
+        User.objects.filter(username__startswith=f"{prefix}-").delete()
+        password = make_password(SEED_PASSWORD)
+        seeded = User.objects.bulk_create(
+            User(username=f"{prefix}-{index}", email=f"{prefix}-{index}@example.com", password=password)
+            for index in range(users)
+        )
+
+    for user in seeded:
+        offsets = sorted((rng.uniform(0, days) for _ in range(expenses_per_user)), reverse=True)
+        for start in range(0, expenses_per_user, batch_size):
+            expenses = [
+                fake_expense(rng, user, now - timedelta(days=offset))
+                for offset in offsets[start:start + batch_size]
+            ]
+            with serialized_writes(), transaction.atomic():
+                Expense.objects.bulk_create(expenses, batch_size=batch_size)
+                record_changes(added=expenses)
+    return seeded
+
+
+class BenchUser:
+    """
+    A seeded user with its tokens and a sample of its expense ids.
+    """
+
+    def __init__(self, user, tokens, expense_ids):
+        self.user = user
+        self.username = user.username
+        self.access = tokens["access"]
+        self.refresh = tokens["refresh"]
+        self.expense_ids = expense_ids
+
+
+def expense_payload(rng):
+    return {
+        "title": rng.choice(TITLES[TransactionTypeChoice.DEBIT]),
+        "amount": f"{rng.lognormvariate(3.4, 1.1):.2f}",
+        "transaction_type": TransactionTypeChoice.DEBIT,
+        "tax": "10.00",
+        "tax_type": TaxTypeChoice.PERCENTAGE,
+    }
+
+
+def login(client, user, rng):
+    return client.post(
+        reverse("user-login"), {"username": user.username, "password": SEED_PASSWORD}, format="json"
+    )
+
+
+def list_page(client, user, rng):
+    pages = max(1, min(20, math.ceil(len(user.expense_ids) / settings.EXPENSE_PAGE_SIZE)))
+    return client.get(
+        reverse("expense-list-create"), {"page": rng.randint(1, pages), "page_size": settings.EXPENSE_PAGE_SIZE}
+    )
+
+
+def list_cursor(client, user, rng):
+    return client.get(reverse("expense-list-create"), {"pagination": "cursor"})
+
+
+def detail(client, user, rng):
+    return client.get(reverse("expense-detail", args=[rng.choice(user.expense_ids)]))
+
+
+def create(client, user, rng):
+    return client.post(reverse("expense-list-create"), expense_payload(rng), format="json")
+
+
+def bulk_create(client, user, rng):
+    return client.post(reverse("expense-bulk"), [expense_payload(rng) for _ in range(BULK_ITEMS)], format="json")
+
+
+def summary(client, user, rng):
+    return client.get(reverse("expense-summary"), {"period": "month"})
+
+
+def export(client, user, rng):
+    return client.get(reverse("expense-export"), {"output": "ndjson"})
+
+
+# Scenario name -> request it times. Each call runs as a seeded user.
+SCENARIOS = {
+    "login": login,
+    "list_page": list_page,
+    "list_cursor": list_cursor,
+    "detail": detail,
+    "create": create,
+    "bulk_create": bulk_create,
+    "summary": summary,
+    "export": export,
+}
+WRITE_SCENARIOS = {"create", "bulk_create"}
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def prepare_users(prefix=SEED_USER_PREFIX, sample=500):
+    """
+    Log in every seeded user once (untimed) and collect its expense ids.
+    """
+    client = APIClient()
+    users = []
+    for user in User.objects.filter(username__startswith=f"{prefix}-").order_by("pk"):
+        response = login(client, user, None)
+        if response.status_code != 200:
+            raise RuntimeError(f"Cannot log in as {user.username}: {response.status_code} {response.content!r}")
+        expense_ids = list(Expense.objects.filter(user=user).order_by("-created_at", "-id").values_list("id", flat=True)[:sample])
+        users.append(BenchUser(user, response.json(), expense_ids))
+    return users
+
+
+def timed_request(scenario, client, user, rng):
+    started = time.perf_counter()
+    response = scenario(client, user, rng)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return time.perf_counter() - started, response.status_code < 400
+
+
+def run_scenario(name, users, requests, concurrency=1, warmup=5, seed=0):
+    """
+    Run `requests` requests of scenario `name` over `concurrency` threads,
+    cycling through `users`, and return its throughput and latencies.
+
+    Rows created by write scenarios are deleted afterwards, outside the
+    timed section, so every scenario sees the seeded data set.
+    """
+    scenario = SCENARIOS[name]
+    high_water = Expense.objects.aggregate(last=Max("id"))["last"] or 0
+
+    def worker(index):
+        client = APIClient()
+        rng = random.Random(seed * 1000 + index)
+        latencies, errors = [], 0
+        for number in range(index, requests, concurrency):
+            user = users[number % len(users)]
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {user.access}")
+            elapsed, ok = timed_request(scenario, client, user, rng)
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+        return latencies, errors
+
+    def thread_worker(index):
+        try:
+            return worker(index)
+        finally:
+            # Connections are per thread; the pool's threads end here.
+            connections.close_all()
+
+    warmup_client = APIClient()
+    warmup_rng = random.Random(seed)
+    for number in range(warmup):
+        user = users[number % len(users)]
+        warmup_client.credentials(HTTP_AUTHORIZATION=f"Bearer {user.access}")
+        timed_request(scenario, warmup_client, user, warmup_rng)
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        outcomes = [worker(0)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(thread_worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    if name in WRITE_SCENARIOS:
+        Expense.objects.filter(user__in=[user.user for user in users], pk__gt=high_water).delete()
+
+    latencies = [latency for samples, _ in outcomes for latency in samples]
+    result = {
+        "requests": requests,
+        "errors": sum(errors for _, errors in outcomes),
+        "seconds": round(elapsed, 6),
+        "throughput": round(len(latencies) / elapsed, 3) if elapsed else None,
+    }
+    for label, fraction in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        value = percentile(latencies, fraction)
+        result[label] = None if value is None else round(value * 1000, 3)
+    return result
+
+
+def compare(results, baseline, max_regression, metrics=DEFAULT_COMPARED_METRICS):
+    """
+    Return a message per metric of each scenario that is more than
+    `max_regression` percent worse than in `baseline`.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric in metrics:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            if HIGHER_IS_BETTER[metric]:
+                change = (before - after) / before * 100
+            else:
+                change = (after - before) / before * 100
+            if change > max_regression:
+                regressions.append(f"{name}: {metric} {before} -> {after} ({change:.1f}% worse)")
+    return regressions
+
+
+def load_results(path):
+    with open(path) as fileobj:
+        return json.load(fileobj)
@@ -0,0 +1,147 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+
+from .models import expenses_changed
+
+# Generation of the expenses visible to superusers, who list every user's.
+ALL_USERS = "all"
+
+
+def get_cache():
+    return caches[settings.EXPENSE_CACHE_ALIAS]
+
+
+def response_cache_enabled():
+    """
+    Cache responses only in a cache shared by every worker: a generation
+    bumped in one process's local memory would leave the other processes
+    serving their stale pages.
+    """
+    return settings.EXPENSE_CACHE_ENABLED and not isinstance(get_cache(), LocMemCache)
+
+
+def generation_key(owner):
+    return f"expenses:generation:{owner}"
+
+
+def get_generation(owner):
+    """
+    Return the current generation of `owner`'s expenses.
+
+    A missing counter (never set or evicted) is started from the clock
+    rather than from 1, so it cannot match the keys of older entries.
+    """
+    cache = get_cache()
+    key = generation_key(owner)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(owner):
+    """
+    Invalidate every cached response of `owner` in O(1) by moving them to
+    a new generation.
+    """
+    cache = get_cache()
+    key = generation_key(owner)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+@receiver(expenses_changed)
+def invalidate_cached_responses(sender, user_ids, **kwargs):
+    """
+    Bump the generations once the write has committed, so readers cannot
+    cache the pre-commit rows under the new generation.
+    """
+    def bump():
+        for user_id in user_ids:
+            bump_generation(user_id)
+        bump_generation(ALL_USERS)
+
+    transaction.on_commit(bump)
+
+
+def matches_etag(request, etag):
+    """
+    Check `etag` against the request's `If-None-Match` header.
+    """
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+class CachedResponseMixin:
+    """
+    Read-through cache for GET responses of expense views.
+
+    Responses are keyed by user, path, query parameters and the user's
+    generation counter, which `expenses_changed` bumps on every write. The
+    ETag is derived from that key, so a client holding a current ETag gets
+    a 304 without the database, the cache body or the serializer.
+
+    Nothing is cached while `EXPENSE_CACHE_ALIAS` is a local-memory cache.
+    """
+
+    def get_cache_owner(self):
+        user = self.request.user
+        return ALL_USERS if user.is_superuser else user.pk
+
+    def get_cache_key(self):
+        request = self.request
+        owner = self.get_cache_owner()
+        fingerprint = hashlib.sha256(
+            "\n".join([
+                request.get_host(),
+                request.path,
+                "&".join(sorted(request.GET.urlencode().split("&"))),
+                request.accepted_media_type or "",
+            ]).encode()
+        ).hexdigest()
+        return f"expenses:response:{owner}:{get_generation(owner)}:{fingerprint}"
+
+    def get(self, request, *args, **kwargs):
+        if not response_cache_enabled():
+            return super().get(request, *args, **kwargs)
+
+        key = self.get_cache_key()
+        etag = f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+        if matches_etag(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            cached = get_cache().get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = super().get(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                if getattr(request.accepted_renderer, "format", None) == "json":
+                    response = self.finalize_response(request, response, *args, **kwargs)
+                    response.render()
+                    get_cache().set(
+                        key,
+                        (response.content, response["Content-Type"]),
+                        timeout=settings.EXPENSE_CACHE_TIMEOUT,
+                    )
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ("Authorization",))
+        return response
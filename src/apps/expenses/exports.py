@@ -0,0 +1,85 @@
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import ExpenseFastSerializer
+
+# Columns in output order, matching the fields of `ExpenseSerializer`.
+EXPORT_COLUMNS = (
+    "id",
+    "total",
+    "title",
+    "description",
+    "amount",
+    "transaction_type",
+    "tax",
+    "tax_type",
+    "created_at",
+    "updated_at",
+    "user",
+)
+
+
+class Echo:
+    """
+    File-like object whose `write` hands the line back to `csv.writer`.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, chunk_size=None):
+    """
+    Stream expenses as `ExpenseSerializer`-shaped dicts, fetching
+    `chunk_size` rows at a time and never building model instances.
+    """
+    chunk_size = chunk_size or settings.EXPENSE_EXPORT_CHUNK_SIZE
+    serializer = ExpenseFastSerializer()
+    rows = queryset.values(*ExpenseFastSerializer.source_fields).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield serializer.to_representation(row)
+
+
+def batched(lines, size):
+    """
+    Join lines into blocks so the server writes fewer, larger chunks.
+    """
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= size:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+def stream_csv(queryset, chunk_size=None):
+    """
+    Yield the expenses as CSV, header first so the first byte is sent
+    before the query has run.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    lines = (writer.writerow(row.values()) for row in iter_rows(queryset, chunk_size))
+    yield from batched(lines, settings.EXPENSE_EXPORT_FLUSH_ROWS)
+
+
+def stream_ndjson(queryset, chunk_size=None):
+    """
+    Yield the expenses as newline-delimited JSON objects, each encoded
+    exactly as the API's JSON renderer would.
+    """
+    lines = (
+        json.dumps(row, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(",", ":")) + "\n"
+        for row in iter_rows(queryset, chunk_size)
+    )
+    yield from batched(lines, settings.EXPENSE_EXPORT_FLUSH_ROWS)
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv", "csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson", "ndjson"),
+}
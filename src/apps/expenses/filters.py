@@ -0,0 +1,70 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .pagination import ExpenseCursorPagination, get_pagination_class
+from .serializers import ExpenseListQuerySerializer
+
+# Query parameter -> ORM lookup of the whitelisted expense list filters.
+EXPENSE_FILTERS = {
+    "start": "created_at__gte",
+    "end": "created_at__lt",
+    "min_amount": "amount__gte",
+    "max_amount": "amount__lte",
+    "min_total": "total__gte",
+    "max_total": "total__lte",
+    "transaction_type": "transaction_type",
+    "tax_type": "tax_type",
+}
+
+
+def filter_expenses(queryset, query_params, cursor=False):
+    """
+    Filter and order `queryset` by the whitelisted list parameters in
+    `query_params`, raising `ValidationError` for anything invalid.
+
+    `ordering` applies to page-number pagination; cursor pagination (when
+    `cursor` is true) always walks newest first. `q` search results are
+    ranked by relevance, so combining `q` with either is rejected rather
+    than silently re-ordered.
+    """
+    params = ExpenseListQuerySerializer(data=query_params)
+    params.is_valid(raise_exception=True)
+    filters = params.validated_data
+    if query_params.get("q", "").strip():
+        if "ordering" in filters:
+            raise ValidationError({"ordering": "Search results are ordered by relevance; remove `ordering` or `q`."})
+        if cursor:
+            raise ValidationError({"pagination": "Search results are ordered by relevance and use page-number pagination."})
+    queryset = queryset.filter(
+        **{lookup: filters[param] for param, lookup in EXPENSE_FILTERS.items() if param in filters}
+    )
+    if "ordering" in filters:
+        # Break ties by id in the same direction so one index serves both.
+        ordering = filters["ordering"]
+        queryset = queryset.order_by(ordering, "-id" if ordering.startswith("-") else "id")
+    return queryset
+
+
+class ExpenseFilterBackend(BaseFilterBackend):
+    """
+    Filter and order the expense list with `filter_expenses`; anything
+    invalid is a 400.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        cursor = get_pagination_class(request) is ExpenseCursorPagination
+        return filter_expenses(queryset, request.query_params, cursor)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {"name": "start", "required": False, "in": "query", "schema": {"type": "string", "format": "date-time"}},
+            {"name": "end", "required": False, "in": "query", "schema": {"type": "string", "format": "date-time"}},
+            {"name": "min_amount", "required": False, "in": "query", "schema": {"type": "number"}},
+            {"name": "max_amount", "required": False, "in": "query", "schema": {"type": "number"}},
+            {"name": "min_total", "required": False, "in": "query", "schema": {"type": "number"}},
+            {"name": "max_total", "required": False, "in": "query", "schema": {"type": "number"}},
+            {"name": "transaction_type", "required": False, "in": "query", "schema": {"type": "string"}},
+            {"name": "tax_type", "required": False, "in": "query", "schema": {"type": "string"}},
+            {"name": "ordering", "required": False, "in": "query", "schema": {"type": "string"}},
+            {"name": "q", "required": False, "in": "query", "schema": {"type": "string"}},
+        ]
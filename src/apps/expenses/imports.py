@@ -0,0 +1,221 @@
+import csv
+import io
+import os
+from datetime import datetime, time
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from src.storage import private_storage
+
+from .models import (
+    Expense,
+    ExpenseImport,
+    ImportStatusChoice,
+    TaxTypeChoice,
+    TransactionTypeChoice,
+)
+from .rollups import record_changes
+from .writer import serialized_writes
+
+# Expense fields an import can fill; `title` and `amount` are required.
+IMPORT_FIELDS = ("title", "description", "amount", "transaction_type", "tax", "tax_type", "created_at")
+REQUIRED_FIELDS = ("title", "amount")
+
+REJECT_COLUMNS = ("row", "error")
+
+
+class ImportInterrupted(Exception):
+    """
+    Raised by a `run_import` progress callback to stop the import without
+    failing it: the chunk in flight is rolled back and the import stays
+    resumable from the last committed one.
+    """
+
+
+def choice_lookup(choices):
+    """
+    Map both codes and labels (case-insensitively) to the stored code,
+    e.g. "CR", "cr" and "credit" all map to "CR".
+    """
+    lookup = {}
+    for value, label in choices.choices:
+        lookup[value.lower()] = value
+        lookup[label.lower()] = value
+    return lookup
+
+
+TRANSACTION_TYPES = choice_lookup(TransactionTypeChoice)
+TAX_TYPES = choice_lookup(TaxTypeChoice)
+
+
+def read_csv(fileobj, skip=0):
+    """
+    Yield (row_number, row) pairs from a CSV file one line at a time,
+    skipping the first `skip` data rows. Row numbers start at 1.
+    """
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    rows = enumerate(reader, start=1)
+    yield from islice(rows, skip, None)
+
+
+def chunked(iterable, size):
+    """
+    Yield lists of at most `size` items from `iterable`.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_created_at(value):
+    """
+    Parse an ISO datetime or date; naive values use the current time zone.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValidationError("Enter a valid date or datetime.")
+        parsed = datetime.combine(date, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class RowValidator:
+    """
+    Validates mapped CSV rows against the `Expense` field rules without the
+    per-field overhead of a DRF serializer.
+    """
+
+    def __init__(self, user, columns=None):
+        self.user = user
+        self.columns = {field: (columns or {}).get(field, field) for field in IMPORT_FIELDS}
+        self.fields = {field: Expense._meta.get_field(field) for field in IMPORT_FIELDS}
+        self.now = timezone.now()
+
+    def clean_value(self, field, value):
+        if field == "transaction_type":
+            try:
+                return TRANSACTION_TYPES[value.lower()]
+            except KeyError:
+                raise ValidationError(f"Unknown transaction type {value!r}.")
+        if field == "tax_type":
+            try:
+                return TAX_TYPES[value.lower()]
+            except KeyError:
+                raise ValidationError(f"Unknown tax type {value!r}.")
+        if field == "created_at":
+            return parse_created_at(value)
+        return self.fields[field].clean(value, None)
+
+    def __call__(self, row):
+        """
+        Return an unsaved `Expense` for the row or raise `ValidationError`
+        with a message per failing field.
+        """
+        values = {}
+        errors = {}
+        for field, column in self.columns.items():
+            value = (row.get(column) or "").strip()
+            if not value:
+                if field in REQUIRED_FIELDS:
+                    errors[field] = "This field is required."
+                continue
+            try:
+                values[field] = self.clean_value(field, value)
+            except ValidationError as exc:
+                errors[field] = " ".join(exc.messages)
+        if errors:
+            raise ValidationError(errors)
+        values.setdefault("created_at", self.now)
+        return Expense(user=self.user, **values)
+
+
+def reject_report_path(expense_import):
+    return private_storage.path(f"imports/rejects/{expense_import.pk}.csv")
+
+
+def write_rejects(path, rejects):
+    """
+    Append rejected rows to the reject report, creating it on first use.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    is_new = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as report:
+        writer = csv.writer(report)
+        if is_new:
+            writer.writerow(REJECT_COLUMNS)
+        writer.writerows(rejects)
+
+
+def run_import(expense_import, fileobj, batch_size=None, progress=None):
+    """
+    Import the CSV in `fileobj` chunk by chunk, resuming after the rows
+    `expense_import` has already committed.
+
+    Each chunk is inserted with `bulk_create` and its progress recorded in
+    the same transaction, so a crash loses at most the chunk in flight.
+    Rejected rows are appended to the reject report once their chunk commits.
+    `progress` (if given) is called with the rows processed so far inside
+    each chunk's transaction, so it can veto the commit by raising.
+    """
+    batch_size = batch_size or settings.EXPENSE_IMPORT_BATCH_SIZE
+    validate = RowValidator(expense_import.user, expense_import.columns)
+    if not expense_import.reject_report:
+        expense_import.reject_report = reject_report_path(expense_import)
+    expense_import.status = ImportStatusChoice.RUNNING
+    expense_import.save(update_fields=["reject_report", "status", "updated_at"])
+
+    rows = read_csv(fileobj, skip=expense_import.rows_processed)
+    try:
+        for chunk in chunked(rows, batch_size):
+            expenses = []
+            rejects = []
+            for number, row in chunk:
+                try:
+                    expenses.append(validate(row))
+                except ValidationError as exc:
+                    rejects.append((number, "; ".join(
+                        f"{field}: {' '.join(messages)}" for field, messages in exc.message_dict.items()
+                    )))
+            with serialized_writes(), transaction.atomic():
+                Expense.objects.bulk_create(expenses, batch_size=batch_size)
+                record_changes(added=expenses)
+                ExpenseImport.objects.filter(pk=expense_import.pk).update(
+                    rows_processed=F("rows_processed") + len(chunk),
+                    imported_count=F("imported_count") + len(expenses),
+                    rejected_count=F("rejected_count") + len(rejects),
+                    updated_at=timezone.now(),
+                )
+                if progress is not None:
+                    progress(number)
+            if rejects:
+                write_rejects(expense_import.reject_report, rejects)
+    except ImportInterrupted:
+        raise
+    except Exception as exc:
+        ExpenseImport.objects.filter(pk=expense_import.pk).update(
+            status=ImportStatusChoice.FAILED,
+            error=str(exc),
+            updated_at=timezone.now(),
+        )
+        raise
+
+    ExpenseImport.objects.filter(pk=expense_import.pk).update(
+        status=ImportStatusChoice.COMPLETED,
+        error="",
+        updated_at=timezone.now(),
+    )
+    expense_import.refresh_from_db()
+    return expense_import
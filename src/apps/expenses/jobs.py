@@ -0,0 +1,281 @@
+import logging
+import os
+import random
+import socket
+import tempfile
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from src.storage import private_storage
+
+from .exports import EXPORT_FORMATS
+from .imports import ImportInterrupted, run_import
+from .models import AllExpense, ExpenseImport, Job, JobStatusChoice
+from .rollups import rebuild_for_users
+from .serializers import ExpenseExportQuerySerializer
+
+logger = logging.getLogger("jobs")
+
+# Candidates read per claim; more than one so that losing a race to
+# another worker does not leave this one idle for a poll interval.
+CLAIM_CANDIDATES = 10
+
+
+class JobLost(Exception):
+    """
+    Raised in a handler whose lease ran out and was claimed by another worker.
+    """
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(user, kind, params=None, max_attempts=None, run_at=None):
+    """
+    Queue a job of `kind` for `user`; a worker picks it up on its next poll.
+    """
+    return Job.objects.create(
+        user=user,
+        kind=kind,
+        params=params or {},
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def claimable(now):
+    """
+    Return the jobs a worker may start: queued ones that are due, and
+    running ones whose worker stopped renewing the lease.
+    """
+    return Job.objects.filter(
+        Q(status=JobStatusChoice.QUEUED, run_at__lte=now)
+        | Q(status=JobStatusChoice.RUNNING, locked_until__lt=now, attempts__lt=F("max_attempts"))
+    )
+
+
+def fail_abandoned(now):
+    """
+    Fail the jobs whose lease ran out on their last attempt, e.g. because
+    they keep killing their worker.
+    """
+    return Job.objects.filter(
+        status=JobStatusChoice.RUNNING, locked_until__lt=now, attempts__gte=F("max_attempts")
+    ).update(
+        status=JobStatusChoice.FAILED,
+        error="The worker stopped before the job finished.",
+        locked_until=None,
+        finished_at=now,
+        updated_at=now,
+    )
+
+
+def claim(worker, now=None):
+    """
+    Take the next due job for `worker`, or return None.
+
+    Candidates are read with `SELECT ... FOR UPDATE SKIP LOCKED` where the
+    database supports it; the claim itself is a conditional UPDATE on the
+    attempt count, so two workers can never both win a job, on SQLite too.
+    SQLite cannot upgrade a read transaction to a write while another
+    worker writes, so there the updates run in autocommit instead.
+    """
+    now = now or timezone.now()
+    fail_abandoned(now)
+    skip_locked = connections[router.db_for_write(Job)].features.has_select_for_update_skip_locked
+    with transaction.atomic() if skip_locked else nullcontext():
+        candidates = claimable(now).order_by("run_at", "id").values_list("id", "attempts")
+        if skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        for pk, attempts in list(candidates[:CLAIM_CANDIDATES]):
+            claimed = claimable(now).filter(pk=pk, attempts=attempts).update(
+                status=JobStatusChoice.RUNNING,
+                attempts=F("attempts") + 1,
+                locked_by=worker,
+                locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                started_at=now,
+                error="",
+                updated_at=now,
+            )
+            if claimed:
+                return Job.objects.select_related("user").get(pk=pk)
+    return None
+
+
+def report_progress(job, percent, detail=""):
+    """
+    Record a handler's progress (0-100) and renew the job's lease.
+
+    Raises `JobLost` when the lease had already run out and another worker
+    took the job over, so the handler stops instead of running twice.
+    """
+    now = timezone.now()
+    job.progress = max(0, min(int(percent), 100))
+    job.progress_detail = detail[:200]
+    updated = Job.objects.filter(pk=job.pk, status=JobStatusChoice.RUNNING, locked_by=job.locked_by).update(
+        progress=job.progress,
+        progress_detail=job.progress_detail,
+        locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        updated_at=now,
+    )
+    if not updated:
+        raise JobLost(f"Job {job.pk} is no longer held by {job.locked_by}.")
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait before attempt `attempts + 1`: exponential, capped, and
+    jittered so jobs that failed together do not retry together.
+    """
+    delay = min(settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.75, 1.0)
+
+
+def finish(job, **fields):
+    now = timezone.now()
+    return Job.objects.filter(pk=job.pk, status=JobStatusChoice.RUNNING, locked_by=job.locked_by).update(
+        locked_until=None, updated_at=now, **fields
+    )
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its result, or queue a retry if it failed
+    and has attempts left.
+    """
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind {job.kind!r}.")
+        result = handler(job)
+    except JobLost:
+        logger.warning("Job %s lost its lease to another worker", job.pk)
+        return
+    except Exception as exc:
+        error = "".join(traceback.format_exception_only(exc)).strip()
+        if job.attempts < job.max_attempts and handler is not None:
+            delay = retry_delay(job.attempts)
+            finish(job, status=JobStatusChoice.QUEUED, run_at=timezone.now() + timedelta(seconds=delay), error=error)
+            logger.warning("Job %s failed (attempt %d), retrying in %.0fs: %s", job.pk, job.attempts, delay, error)
+        else:
+            finish(job, status=JobStatusChoice.FAILED, finished_at=timezone.now(), error=error)
+            logger.exception("Job %s failed for good after %d attempt(s)", job.pk, job.attempts)
+        return
+    finish(
+        job,
+        status=JobStatusChoice.SUCCEEDED,
+        progress=100,
+        result=result,
+        finished_at=timezone.now(),
+    )
+
+
+def run_next(worker=None):
+    """
+    Claim and run one job; return it, or None if nothing was due.
+    """
+    job = claim(worker or worker_name())
+    if job is not None:
+        run_job(job)
+    return job
+
+
+def work(worker, stop, poll_interval=None, burst=False):
+    """
+    Worker loop: run jobs until `stop` is set, sleeping `poll_interval`
+    seconds when the queue is empty, or returning then if `burst`.
+    """
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    while not stop.is_set():
+        try:
+            job = run_next(worker)
+        except DatabaseError:
+            # E.g. the database restarting; an unfinished job's lease runs out.
+            logger.exception("Worker %s could not reach the queue", worker)
+            job = None
+        if job is None:
+            if burst:
+                return
+            stop.wait(poll_interval)
+
+
+def export_job(job):
+    """
+    Write the user's expenses (hot and archived) to a file in the private
+    storage, like the export endpoint would stream them.
+    """
+    params = ExpenseExportQuerySerializer(data=job.params)
+    params.is_valid(raise_exception=True)
+    filters = params.validated_data
+
+    queryset = AllExpense.objects.filter(user=job.user).order_by("created_at", "id")
+    if "start" in filters:
+        queryset = queryset.filter(created_at__gte=filters["start"])
+    if "end" in filters:
+        queryset = queryset.filter(created_at__lt=filters["end"])
+    total = queryset.count()
+
+    stream, content_type, extension = EXPORT_FORMATS[filters["output"]]
+    written = 0
+    with tempfile.TemporaryFile() as output:
+        for block in stream(queryset):
+            output.write(block.encode("utf-8"))
+            written += block.count("\n")
+            report_progress(job, 99 * min(written, total) / (total or 1), f"{min(written, total)} of {total} rows")
+        output.seek(0)
+        name = private_storage.save(f"exports/{job.pk}/expenses.{extension}", File(output))
+    return {"file": name, "content_type": content_type, "rows": total}
+
+
+def import_job(job):
+    """
+    Run, or resume after the last committed chunk, an uploaded CSV import.
+    """
+    expense_import = ExpenseImport.objects.get(pk=job.params["import_id"], user=job.user)
+    with expense_import.file.open("rb") as fileobj:
+        size = expense_import.file.size or 1
+
+        def progress(rows):
+            # Called inside each chunk's transaction: the lease is renewed
+            # with the chunk, so a worker that lost the job commits nothing
+            # more. The reader buffers ahead, so the position is an estimate;
+            # its text wrapper closes the file once the last row has been read.
+            position = size if fileobj.closed else fileobj.tell()
+            try:
+                report_progress(job, 99 * min(position / size, 1), f"{rows} rows processed")
+            except JobLost as exc:
+                # Leave the import running for the worker that took it over.
+                raise ImportInterrupted(str(exc)) from exc
+
+        try:
+            expense_import = run_import(expense_import, fileobj, progress=progress)
+        except ImportInterrupted as exc:
+            raise JobLost(str(exc)) from exc
+    return {
+        "import_id": expense_import.pk,
+        "imported_count": expense_import.imported_count,
+        "rejected_count": expense_import.rejected_count,
+    }
+
+
+def rebuild_rollups_job(job):
+    """
+    Recompute the user's monthly rollups from their expenses.
+    """
+    return {"buckets": rebuild_for_users([job.user_id])}
+
+
+# Job kind -> handler(job) returning the JSON result.
+JOB_HANDLERS = {
+    "export": export_job,
+    "import": import_job,
+    "rebuild_rollups": rebuild_rollups_job,
+}
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from src.apps.expenses.archive import archivable, archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Move expenses older than EXPENSE_ARCHIVE_AFTER_DAYS from the hot table to the archive, "
+        "one short transaction per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Archive expenses older than this many days.")
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows moved per transaction.")
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches, leaving the database to other writers.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only count the expenses that would be moved.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size is None:
+            batch_size = settings.EXPENSE_ARCHIVE_BATCH_SIZE
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+        if options["days"] is not None and options["days"] < 0:
+            raise CommandError("--days must not be negative.")
+
+        cutoff = archive_cutoff(options["days"])
+        if options["dry_run"]:
+            count = archivable(cutoff).count()
+            self.stdout.write(f"{count} expense(s) created before {cutoff:%Y-%m-%d %H:%M} would be archived.")
+            return
+
+        moved = 0
+        while True:
+            count = archive_batch(cutoff, batch_size)
+            if not count:
+                break
+            moved += count
+            self.stdout.write(f"Archived {moved} expense(s)...")
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} expense(s) created before {cutoff:%Y-%m-%d %H:%M}."))
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from src.apps.expenses.models import ArchivedExpense, Expense, expense_total
+from src.apps.expenses.writer import serialized_writes
+
+
+class Command(BaseCommand):
+    help = "Fill in the stored tax-inclusive `total` of hot and archived expenses, a batch of rows at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Rows updated per transaction (defaults to EXPENSE_BULK_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every row, not only those without a total.",
+        )
+
+    def backfill(self, model, batch_size, recompute):
+        queryset = model.objects.only("id", "amount", "tax", "tax_type", "total").order_by("pk")
+        if not recompute:
+            queryset = queryset.filter(total__isnull=True)
+
+        updated = 0
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            changed = []
+            for row in rows:
+                total = expense_total(row.amount, row.tax, row.tax_type)
+                if total != row.total:
+                    row.total = total
+                    changed.append(row)
+            if changed:
+                with serialized_writes(), transaction.atomic():
+                    model.objects.bulk_update(changed, ["total"], batch_size=batch_size)
+            updated += len(changed)
+            self.stdout.write(f"{model._meta.verbose_name_plural}: up to id {last_pk}, {updated} updated.")
+        return updated
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size is None:
+            batch_size = settings.EXPENSE_BULK_BATCH_SIZE
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        updated = sum(self.backfill(model, batch_size, options["all"]) for model in (Expense, ArchivedExpense))
+        self.stdout.write(self.style.SUCCESS(f"Updated the total of {updated} expense(s)."))
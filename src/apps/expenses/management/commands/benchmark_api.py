@@ -0,0 +1,108 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from src.apps.expenses.benchmarks import (
+    DEFAULT_COMPARED_METRICS,
+    HIGHER_IS_BETTER,
+    SCENARIOS,
+    SEED_USER_PREFIX,
+    compare,
+    load_results,
+    prepare_users,
+    run_scenario,
+)
+from src.apps.expenses.caching import response_cache_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the API scenarios in-process against the configured database as the "
+        "seeded users (see seed_expenses) and report throughput and p50/p95/p99 "
+        "latencies as JSON, optionally failing on regressions against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=list(SCENARIOS),
+            help="Scenario to run; repeat for several (default: all).",
+        )
+        parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=1, help="Client threads per scenario.")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests before each scenario.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the request parameters.")
+        parser.add_argument("--prefix", default=SEED_USER_PREFIX, help="Username prefix of the seeded users.")
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Disable the expense response cache so every read reaches the database.",
+        )
+        parser.add_argument("--output", help="Write the results to this JSON file instead of stdout.")
+        parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=10.0,
+            help="Percent a compared metric may worsen against the baseline (default 10).",
+        )
+        parser.add_argument(
+            "--metric",
+            action="append",
+            choices=list(HIGHER_IS_BETTER),
+            help=f"Metric to compare; repeat for several (default: {', '.join(DEFAULT_COMPARED_METRICS)}).",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1 or options["warmup"] < 0:
+            raise CommandError("--requests and --concurrency must be positive and --warmup not negative.")
+        baseline = load_results(options["baseline"]) if options["baseline"] else None
+
+        users = prepare_users(options["prefix"])
+        if not users:
+            raise CommandError(f"No users named {options['prefix']}-<n>; run seed_expenses first.")
+        if not all(user.expense_ids for user in users):
+            raise CommandError("Every seeded user needs at least one expense; run seed_expenses with --expenses.")
+
+        results = {
+            "meta": {
+                "database": connection.vendor,
+                "users": len(users),
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "cache": not options["no_cache"] and response_cache_enabled(),
+            },
+            "scenarios": {},
+        }
+        with override_settings(**({"EXPENSE_CACHE_ENABLED": False} if options["no_cache"] else {})):
+            for name in options["scenario"] or SCENARIOS:
+                self.stderr.write(f"Running {name}...")
+                results["scenarios"][name] = run_scenario(
+                    name,
+                    users,
+                    options["requests"],
+                    concurrency=options["concurrency"],
+                    warmup=options["warmup"],
+                    seed=options["seed"],
+                )
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fileobj:
+                fileobj.write(output + "\n")
+            self.stderr.write(f"Results written to {options['output']}.")
+        else:
+            self.stdout.write(output)
+
+        if baseline is not None:
+            regressions = compare(
+                results, baseline, options["max_regression"], options["metric"] or DEFAULT_COMPARED_METRICS
+            )
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} regression(s) over {options['max_regression']}%:\n" + "\n".join(regressions)
+                )
+            self.stderr.write(self.style.SUCCESS(f"No regression over {options['max_regression']}% against the baseline."))
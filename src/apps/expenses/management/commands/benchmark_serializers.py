@@ -0,0 +1,72 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from src.apps.expenses.models import Expense, TaxTypeChoice, TransactionTypeChoice
+from src.apps.expenses.serializers import ExpenseFastSerializer, ExpenseSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure rows per second of ExpenseSerializer and ExpenseFastSerializer "
+        "over freshly inserted expenses (rolled back afterwards)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Number of expenses to serialize.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per serializer; the best is reported.")
+
+    def best_rate(self, rows, repeat, run):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return rows / best
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user("benchmark-serializers", password=None)
+                Expense.objects.bulk_create(
+                    [
+                        Expense(
+                            user=user,
+                            title=f"Expense {index}",
+                            amount=Decimal(index % 10000) + Decimal("0.99"),
+                            tax=Decimal(index % 20),
+                            tax_type=TaxTypeChoice.PERCENTAGE if index % 2 else TaxTypeChoice.FLAT,
+                            transaction_type=TransactionTypeChoice.CREDIT if index % 3 == 0 else TransactionTypeChoice.DEBIT,
+                        )
+                        for index in range(rows)
+                    ],
+                    batch_size=1000,
+                )
+                queryset = Expense.objects.filter(user=user).order_by("-created_at", "-id")
+
+                model_rate = self.best_rate(
+                    rows, repeat, lambda: ExpenseSerializer(queryset.all(), many=True).data
+                )
+                fast_rate = self.best_rate(
+                    rows,
+                    repeat,
+                    lambda: ExpenseFastSerializer(
+                        queryset.values(*ExpenseFastSerializer.source_fields), many=True
+                    ).data,
+                )
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"ExpenseSerializer:     {model_rate:>12,.0f} rows/s")
+        self.stdout.write(f"ExpenseFastSerializer: {fast_rate:>12,.0f} rows/s")
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {fast_rate / model_rate:.1f}x"))
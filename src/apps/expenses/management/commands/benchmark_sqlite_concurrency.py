@@ -0,0 +1,150 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = """
+    CREATE TABLE expense (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title VARCHAR(255) NOT NULL,
+        amount DECIMAL NOT NULL,
+        created_at DATETIME NOT NULL
+    );
+    CREATE INDEX expense_user_created ON expense (user_id, created_at DESC, id DESC);
+"""
+READ = "SELECT id, title, amount, created_at FROM expense WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT 50"
+WRITE = "INSERT INTO expense (user_id, title, amount, created_at) VALUES (?, ?, ?, datetime('now'))"
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Profile:
+    """
+    How the workers talk to SQLite: Django's defaults (new connection per
+    request, rollback journal, deferred transactions) or the production
+    profile from `SQLITE_PRAGMAS`.
+    """
+
+    def __init__(self, name, production):
+        self.name = name
+        self.production = production
+        self.writer_lock = threading.Lock() if production else None
+
+    def connect(self, path):
+        connection = sqlite3.connect(path, timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        if self.production:
+            for name, value in settings.SQLITE_PRAGMAS.items():
+                connection.execute(f"PRAGMA {name}={value}")
+        return connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Run N reader and M writer threads against a scratch SQLite database, "
+        "with Django's default SQLite settings and with the production profile, "
+        "and report p50/p99 latencies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8, help="Concurrent reader threads.")
+        parser.add_argument("--writers", type=int, default=2, help="Concurrent writer threads.")
+        parser.add_argument("--seconds", type=float, default=5, help="Duration of each run.")
+        parser.add_argument("--rows", type=int, default=50000, help="Rows preloaded before each run.")
+        parser.add_argument("--batch", type=int, default=500, help="Rows inserted per write transaction.")
+
+    def prepare(self, path, rows):
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.executescript(SCHEMA)
+        connection.execute("BEGIN")
+        connection.executemany(
+            WRITE, ((index % 100, f"Expense {index}", index % 1000) for index in range(rows))
+        )
+        connection.execute("COMMIT")
+        connection.close()
+
+    def reader(self, profile, path, deadline, latencies, errors):
+        connection = profile.connect(path) if profile.production else None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    # CONN_MAX_AGE=0: one connection per request.
+                    with profile.connect(path) as per_request:
+                        per_request.execute(READ, (random.randrange(100),)).fetchall()
+                    per_request.close()
+                else:
+                    connection.execute(READ, (random.randrange(100),)).fetchall()
+            except sqlite3.OperationalError:
+                errors.append(1)
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    def writer(self, profile, path, deadline, batch, latencies, errors):
+        connection = profile.connect(path)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            rows = [(random.randrange(100), "Imported", 1) for _ in range(batch)]
+            try:
+                if profile.writer_lock is not None:
+                    with profile.writer_lock:
+                        connection.execute("BEGIN IMMEDIATE")
+                        connection.executemany(WRITE, rows)
+                        connection.execute("COMMIT")
+                else:
+                    connection.execute("BEGIN")
+                    connection.executemany(WRITE, rows)
+                    connection.execute("COMMIT")
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                errors.append(1)
+                continue
+            latencies.append(time.perf_counter() - started)
+        connection.close()
+
+    def run(self, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "benchmark.sqlite3")
+            self.prepare(path, options["rows"])
+            if profile.production:
+                profile.connect(path).close()  # Switch the file to WAL before the run.
+            deadline = time.perf_counter() + options["seconds"]
+            reads, writes, read_errors, write_errors = [], [], [], []
+            threads = [
+                threading.Thread(target=self.reader, args=(profile, path, deadline, reads, read_errors))
+                for _ in range(options["readers"])
+            ] + [
+                threading.Thread(
+                    target=self.writer, args=(profile, path, deadline, options["batch"], writes, write_errors)
+                )
+                for _ in range(options["writers"])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(profile.name))
+        for label, samples, errors in (("reads ", reads, read_errors), ("writes", writes, write_errors)):
+            self.stdout.write(
+                f"  {label}: {len(samples):>7} ok, {len(errors):>5} locked, "
+                f"p50 {percentile(samples, 0.50) * 1000:8.2f} ms, "
+                f"p99 {percentile(samples, 0.99) * 1000:8.2f} ms, "
+                f"mean {statistics.fmean(samples) * 1000 if samples else float('nan'):8.2f} ms"
+            )
+
+    def handle(self, *args, **options):
+        self.run(Profile("Default SQLite settings", production=False), options)
+        self.run(Profile("Production profile (SQLITE_PRODUCTION)", production=True), options)
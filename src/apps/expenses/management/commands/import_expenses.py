@@ -0,0 +1,73 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from src.apps.expenses.imports import IMPORT_FIELDS, run_import
+from src.apps.expenses.models import ExpenseImport, ImportStatusChoice
+
+
+class Command(BaseCommand):
+    help = "Import expenses for a user from a CSV file in bulk, or resume a crashed import."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="CSV file to import.")
+        parser.add_argument("--user", help="Username or id of the user the expenses belong to.")
+        parser.add_argument(
+            "--column",
+            action="append",
+            default=[],
+            metavar="FIELD=HEADER",
+            help=f"Map an expense field ({', '.join(IMPORT_FIELDS)}) to a CSV header (repeatable).",
+        )
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows validated and inserted per chunk.")
+        parser.add_argument("--resume", type=int, metavar="IMPORT_ID", help="Resume an unfinished import.")
+
+    def get_user(self, value):
+        lookup = {"pk": value} if value.isdigit() else {"username": value}
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"User {value!r} does not exist.")
+
+    def get_columns(self, mappings):
+        columns = {}
+        for mapping in mappings:
+            field, sep, header = mapping.partition("=")
+            if not sep or field not in IMPORT_FIELDS:
+                raise CommandError(f"Invalid --column {mapping!r}; expected FIELD=HEADER with FIELD in {IMPORT_FIELDS}.")
+            columns[field] = header
+        return columns
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            try:
+                expense_import = ExpenseImport.objects.select_related("user").get(pk=options["resume"])
+            except ExpenseImport.DoesNotExist:
+                raise CommandError(f"Import {options['resume']} does not exist.")
+            if expense_import.status == ImportStatusChoice.COMPLETED:
+                raise CommandError(f"Import {expense_import.pk} has already completed.")
+            path = expense_import.file.path if expense_import.file else (options["path"] or expense_import.source)
+            self.stdout.write(f"Resuming import {expense_import.pk} after row {expense_import.rows_processed}.")
+        else:
+            if not options["path"] or not options["user"]:
+                raise CommandError("A CSV path and --user are required unless --resume is given.")
+            path = options["path"]
+            expense_import = ExpenseImport.objects.create(
+                user=self.get_user(options["user"]),
+                source=os.path.abspath(path),
+                columns=self.get_columns(options["column"]),
+            )
+            self.stdout.write(f"Started import {expense_import.pk}.")
+
+        if not os.path.exists(path):
+            raise CommandError(f"File {path!r} does not exist.")
+        with open(path, "rb") as fileobj:
+            expense_import = run_import(expense_import, fileobj, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import {expense_import.pk} completed: {expense_import.imported_count} imported, "
+            f"{expense_import.rejected_count} rejected."
+        ))
+        if expense_import.rejected_count:
+            self.stdout.write(f"Rejected rows: {expense_import.reject_report}")
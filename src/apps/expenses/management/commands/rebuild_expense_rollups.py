@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from src.apps.expenses.models import ROLLUP_SCALE
+from src.apps.expenses.rollups import diff_for_users, rebuild_for_users
+
+
+class Command(BaseCommand):
+    help = "Rebuild or verify the per-user monthly expense rollups, a chunk of users at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the stored rollups with the expenses and report mismatches.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of users processed per chunk.",
+        )
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="Restrict to this user id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be a positive integer.")
+
+        user_ids = User.objects.order_by("pk").values_list("pk", flat=True)
+        if options["users"]:
+            user_ids = user_ids.filter(pk__in=options["users"])
+
+        mismatches = 0
+        buckets = 0
+        last_pk = 0
+        while True:
+            chunk = list(user_ids.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+
+            if options["verify"]:
+                diff = diff_for_users(chunk)
+                for (user_id, month, transaction_type, tax_type), (stored, expected) in sorted(diff.items()):
+                    self.stdout.write(
+                        f"user={user_id} month={month:%Y-%m} {transaction_type}/{tax_type}: "
+                        f"stored total={Decimal(stored[0]) / ROLLUP_SCALE} count={stored[1]}, "
+                        f"expected total={Decimal(expected[0]) / ROLLUP_SCALE} count={expected[1]}"
+                    )
+                mismatches += len(diff)
+            else:
+                buckets += rebuild_for_users(chunk)
+                self.stdout.write(f"Rebuilt rollups for users up to id {last_pk}.")
+
+        if options["verify"]:
+            if mismatches:
+                raise CommandError(f"{mismatches} rollup bucket(s) out of date.")
+            self.stdout.write(self.style.SUCCESS("All expense rollups are up to date."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} expense rollup bucket(s)."))
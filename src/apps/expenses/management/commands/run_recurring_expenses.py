@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from src.apps.expenses.recurring import due, materialize_due
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the expenses of every due recurring expense schedule, including occurrences "
+        "missed while the scheduler was down, one batch of schedules per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Schedules per transaction (defaults to EXPENSE_RECURRING_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--catch-up-limit",
+            type=int,
+            default=None,
+            help="Occurrences of one schedule per batch (defaults to EXPENSE_RECURRING_CATCH_UP_LIMIT).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only count the due schedules.")
+
+    def handle(self, *args, **options):
+        for option in ("batch_size", "catch_up_limit"):
+            if options[option] is not None and options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be a positive integer.")
+
+        now = timezone.now()
+        if options["dry_run"]:
+            self.stdout.write(f"{due(now).count()} schedule(s) due at {now:%Y-%m-%d %H:%M}.")
+            return
+
+        started = time.perf_counter()
+        schedules, expenses = materialize_due(
+            now,
+            batch_size=options["batch_size"],
+            catch_up_limit=options["catch_up_limit"],
+            progress=lambda schedules, expenses: self.stdout.write(
+                f"{schedules} schedule(s) handled, {expenses} expense(s) created..."
+            ),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {expenses} expense(s) from {schedules} due schedule(s) "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,86 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from src.apps.expenses.jobs import work, worker_name
+
+
+def worker_process(number, stop, poll_interval, burst):
+    # Connections inherited from the parent must not be shared with it.
+    connections.close_all()
+    # Ctrl+C (and a service manager's SIGTERM) may reach the whole process
+    # group; the parent sets `stop`, and the job in hand is finished first.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        work(f"{worker_name()}/{number}", stop, poll_interval=poll_interval, burst=burst)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs (exports, imports, rollup rebuilds) in a pool of worker "
+        "processes until interrupted; SIGINT/SIGTERM let running jobs finish first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Worker processes (defaults to JOB_WORKER_CONCURRENCY).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds an idle worker waits before looking for jobs again (defaults to JOB_POLL_INTERVAL).",
+        )
+        parser.add_argument("--burst", action="store_true", help="Exit once no job is due instead of waiting for more.")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"] or settings.JOB_WORKER_CONCURRENCY
+        if concurrency < 1:
+            raise CommandError("--concurrency must be a positive integer.")
+        poll_interval = options["poll_interval"]
+        burst = options["burst"]
+
+        stop = multiprocessing.Event()
+        # Setting `stop` takes its lock, which a handler interrupting
+        # `stop.is_set()` would deadlock on; record the signal instead.
+        received = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: received.append(signum))
+
+        def start(number):
+            process = multiprocessing.Process(
+                target=worker_process, args=(number, stop, poll_interval, burst), name=f"job-worker-{number}"
+            )
+            process.start()
+            return process
+
+        connections.close_all()
+        processes = {number: start(number) for number in range(concurrency)}
+        self.stdout.write(f"Started {concurrency} worker(s); press Ctrl+C to stop.")
+
+        while processes and not received:
+            time.sleep(1)
+            for number, process in list(processes.items()):
+                if process.is_alive():
+                    continue
+                del processes[number]
+                if not received and not burst and process.exitcode != 0:
+                    self.stderr.write(f"Worker {number} exited with code {process.exitcode}; restarting it.")
+                    processes[number] = start(number)
+
+        if processes:
+            self.stdout.write("Stopping; waiting for running jobs to finish.")
+            stop.set()
+            for process in processes.values():
+                process.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from src.apps.expenses.benchmarks import SEED_PASSWORD, SEED_USER_PREFIX, seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace the benchmark users with N fresh users holding M expenses each, "
+        "drawn from realistic transaction and tax type distributions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10, help="Number of users to create.")
+        parser.add_argument("--expenses", type=int, default=1000, help="Expenses per user.")
+        parser.add_argument("--days", type=int, default=730, help="Spread the expenses over this many past days.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument(
+            "--prefix",
+            default=SEED_USER_PREFIX,
+            help="Usernames are <prefix>-<n>; existing users with the prefix are deleted first.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Expenses inserted per transaction (defaults to EXPENSE_BULK_BATCH_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["expenses"] < 0 or options["days"] < 1:
+            raise CommandError("--users and --days must be positive and --expenses not negative.")
+        if options["batch_size"] is not None and options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        users = seed_users(
+            options["users"],
+            options["expenses"],
+            seed=options["seed"],
+            days=options["days"],
+            prefix=options["prefix"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} user(s) with {options['expenses']} expense(s) each "
+            f"(password {SEED_PASSWORD!r})."
+        ))
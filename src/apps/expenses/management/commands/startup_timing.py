@@ -0,0 +1,112 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Boots the project in a fresh interpreter and serves one request through WSGI.
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+environ = {"PATH_INFO": sys.argv[1]}
+setup_testing_defaults(environ)
+statuses = []
+for _ in application(environ, lambda status, headers, exc_info=None: statuses.append(status)):
+    pass
+served = time.perf_counter()
+print(json.dumps({"setup": loaded - started, "first_request": served - loaded, "status": statuses[0]}))
+"""
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def parse_import_times(stderr):
+    """
+    Return [(module, self µs, cumulative µs, depth)] from `-X importtime` output.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            modules.append((module, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the project in fresh interpreters, serve one request, and report "
+        "the time to the first response with import time broken down by module."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/v1/expenses/", help="Path of the first request.")
+        parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure; the fastest is reported.")
+        parser.add_argument("--top", type=int, default=15, help="Packages and modules listed.")
+        parser.add_argument(
+            "--env",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="Environment override for the probe, e.g. SERVE_ADMIN=False; repeat for several.",
+        )
+
+    def cold_start(self, path, env):
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, path],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - started
+        if process.returncode != 0:
+            raise CommandError(f"The probe failed:\n{process.stderr[-2000:]}")
+        return elapsed, json.loads(process.stdout.splitlines()[-1]), parse_import_times(process.stderr)
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be a positive integer.")
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "src.settings")}
+        for override in options["env"]:
+            name, sep, value = override.partition("=")
+            if not sep:
+                raise CommandError(f"--env expects NAME=VALUE, got {override!r}.")
+            env[name] = value
+
+        elapsed, timings, modules = min(
+            (self.cold_start(options["path"], env) for _ in range(options["runs"])), key=lambda run: run[0]
+        )
+        total_import = sum(own for _, own, _, _ in modules)
+        by_package = Counter()
+        for module, own, _, _ in modules:
+            by_package[module.split(".")[0]] += own
+
+        top = options["top"]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Cold start (best of {options['runs']})"))
+        self.stdout.write(f"  process to first response: {elapsed * 1000:8.1f} ms")
+        self.stdout.write(f"  django setup + WSGI app:   {timings['setup'] * 1000:8.1f} ms")
+        self.stdout.write(
+            f"  first request:             {timings['first_request'] * 1000:8.1f} ms "
+            f"(GET {options['path']} -> {timings['status']})"
+        )
+        self.stdout.write(f"  imports, all modules:      {total_import / 1000:8.1f} ms")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Import time by package (own time)"))
+        for package, own in by_package.most_common(top):
+            self.stdout.write(f"  {package:<32} {own / 1000:8.1f} ms {own / total_import:6.1%}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest top-level imports (cumulative)"))
+        roots = sorted((module for module in modules if module[3] == 0), key=lambda module: module[2], reverse=True)
+        for module, _, cumulative, _ in roots[:top]:
+            self.stdout.write(f"  {module:<48} {cumulative / 1000:8.1f} ms")
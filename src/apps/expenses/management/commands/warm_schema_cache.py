@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from src.schema import schema_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema with its gzip/brotli variants and write them "
+        "to API_SCHEMA_CACHE_DIR, so workers serve it without running the generator."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Directory to write to instead of API_SCHEMA_CACHE_DIR.")
+
+    def handle(self, *args, **options):
+        if not settings.SERVE_API_DOCS:
+            raise CommandError("The API docs are turned off (SERVE_API_DOCS=False).")
+        overrides = {"API_SCHEMA_CACHE_DIR": options["dir"]} if options["dir"] else {}
+        with override_settings(**overrides):
+            directory = schema_cache.directory
+            if directory is None:
+                raise CommandError("Set API_SCHEMA_CACHE_DIR or pass --dir.")
+            started = time.perf_counter()
+            variants = schema_cache.refresh()
+            elapsed = time.perf_counter() - started
+            pruned = schema_cache.prune()
+
+        for variant in variants.values():
+            sizes = ", ".join(f"{encoding} {len(content):,}" for encoding, content in variant.encoded.items())
+            self.stdout.write(f"{variant.format}: {len(variant.content):,} bytes ({sizes}), ETag {variant.etags[None]}")
+        if pruned:
+            self.stdout.write(f"Deleted {pruned} file(s) of earlier builds.")
+        self.stdout.write(self.style.SUCCESS(f"Schema written to {directory} in {elapsed * 1000:.0f} ms."))
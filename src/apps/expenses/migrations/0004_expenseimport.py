@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # The rollups' switch to integer micros, first shipped in this migration,
+    # now lives in 0014_expensemonthlyrollup_total_micros.
+    replaces = [
+        ('expenses', '0004_expenseimport_rollup_micros'),
+    ]
+
+    dependencies = [
+        ('expenses', '0003_expensemonthlyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expense',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ExpenseImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500)),
+                ('file', models.FileField(blank=True, upload_to='imports/')),
+                ('columns', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('RU', 'running'), ('CO', 'completed'), ('FA', 'failed')], default='RU', max_length=2)),
+                ('rows_processed', models.PositiveBigIntegerField(default=0)),
+                ('imported_count', models.PositiveBigIntegerField(default=0)),
+                ('rejected_count', models.PositiveBigIntegerField(default=0)),
+                ('reject_report', models.CharField(blank=True, max_length=500)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
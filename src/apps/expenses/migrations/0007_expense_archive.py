@@ -0,0 +1,133 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+EXPENSE_COLUMNS = "id, user_id, title, description, amount, transaction_type, tax, tax_type, created_at, updated_at"
+
+# The full-text index as this migration left it, kept here rather than
+# imported from `search`, which may change after it.
+FTS_TABLE = "expenses_expense_fts"
+
+
+def fts_triggers(table, prefix):
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE OF id, title, description ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+        """,
+    ]
+
+
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {prefix}_{event}"
+    for prefix in (FTS_TABLE, f"{FTS_TABLE}_archive")
+    for event in ("insert", "delete", "update")
+] + [f"DROP TABLE IF EXISTS {FTS_TABLE}"]
+
+# Over the view of both tiers instead of the hot table only.
+SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, content='expenses_expense_all', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    *fts_triggers("expenses_expense", FTS_TABLE),
+    *fts_triggers("expenses_archivedexpense", f"{FTS_TABLE}_archive"),
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def archive_search_index():
+    return GinIndex(SearchVector("title", "description", config="simple"), name="expense_archive_search_idx")
+
+
+def run_sql(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def index_both_tiers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        # Re-create the full-text index over the view instead of the hot table.
+        run_sql(schema_editor, SQLITE_DROP + SQLITE_CREATE)
+    elif vendor == "postgresql":
+        schema_editor.add_index(apps.get_model("expenses", "ArchivedExpense"), archive_search_index())
+
+
+def unindex_archive(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        run_sql(schema_editor, SQLITE_DROP)
+    elif vendor == "postgresql":
+        schema_editor.remove_index(apps.get_model("expenses", "ArchivedExpense"), archive_search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_expense_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllExpense',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('transaction_type', models.CharField(choices=[('CR', 'credit'), ('DB', 'debit')], max_length=2)),
+                ('tax', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('tax_type', models.CharField(choices=[('FL', 'flat'), ('PE', 'percentage')], max_length=2)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'expenses_expense_all',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedExpense',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('transaction_type', models.CharField(choices=[('CR', 'credit'), ('DB', 'debit')], max_length=2)),
+                ('tax', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('tax_type', models.CharField(choices=[('FL', 'flat'), ('PE', 'percentage')], max_length=2)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_expenses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='expense_archive_user_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            f"CREATE VIEW expenses_expense_all AS SELECT {EXPENSE_COLUMNS} FROM expenses_expense "
+            f"UNION ALL SELECT {EXPENSE_COLUMNS} FROM expenses_archivedexpense",
+            "DROP VIEW expenses_expense_all",
+        ),
+        migrations.RunPython(index_both_tiers, unindex_archive),
+    ]
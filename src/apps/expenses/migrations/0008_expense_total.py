@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+OLD_COLUMNS = "id, user_id, title, description, amount, transaction_type, tax, tax_type, created_at, updated_at"
+NEW_COLUMNS = "id, user_id, title, description, amount, transaction_type, tax, tax_type, total, created_at, updated_at"
+
+
+def create_view(columns):
+    return (
+        f"CREATE VIEW expenses_expense_all AS SELECT {columns} FROM expenses_expense "
+        f"UNION ALL SELECT {columns} FROM expenses_archivedexpense"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_expense_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL("DROP VIEW expenses_expense_all", create_view(OLD_COLUMNS)),
+        migrations.AddField(
+            model_name='archivedexpense',
+            name='total',
+            field=models.DecimalField(decimal_places=2, max_digits=17, null=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='total',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=17, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'total', 'id'], name='expense_user_total_idx'),
+        ),
+        migrations.RunSQL(create_view(NEW_COLUMNS), "DROP VIEW expenses_expense_all"),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_expense_total'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringExpense',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('transaction_type', models.CharField(choices=[('CR', 'credit'), ('DB', 'debit')], default='DB', max_length=2)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('tax_type', models.CharField(choices=[('FL', 'flat'), ('PE', 'percentage')], default='FL', max_length=2)),
+                ('frequency', models.CharField(choices=[('D', 'daily'), ('W', 'weekly'), ('M', 'monthly'), ('Y', 'yearly')], max_length=1)),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(blank=True, null=True)),
+                ('occurrences', models.PositiveIntegerField(default=0, editable=False)),
+                ('next_run_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_expenses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_active', True), ('next_run_at__isnull', False)), fields=['next_run_at'], name='recurring_due_idx'), models.Index(fields=['user', '-created_at'], name='recurring_user_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:53
+
+import os
+import shutil
+
+import src.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_to_private_storage(apps, schema_editor):
+    """
+    Move uploaded statements and reject reports out of the publicly served
+    MEDIA_ROOT; the stored file names stay valid in the private storage.
+    """
+    ExpenseImport = apps.get_model("expenses", "ExpenseImport")
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    private_root = os.path.abspath(settings.PRIVATE_MEDIA_ROOT)
+
+    def move(source, target):
+        if os.path.exists(source) and not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+
+    for expense_import in ExpenseImport.objects.all().iterator():
+        if expense_import.file:
+            move(os.path.join(media_root, expense_import.file.name), os.path.join(private_root, expense_import.file.name))
+        report = expense_import.reject_report
+        if report and os.path.abspath(report).startswith(media_root + os.sep):
+            target = os.path.join(private_root, os.path.relpath(report, media_root))
+            move(report, target)
+            expense_import.reject_report = target
+            expense_import.save(update_fields=["reject_report"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expenseimport',
+            name='file',
+            field=models.FileField(blank=True, storage=src.storage.PrivateStorage(), upload_to='imports/'),
+        ),
+        migrations.RunPython(move_to_private_storage, migrations.RunPython.noop),
+    ]
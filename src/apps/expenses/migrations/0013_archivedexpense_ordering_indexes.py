@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+FOREIGN_KEYS = ("user", "recurring")
+
+
+def drop_foreign_key_indexes(apps, schema_editor):
+    """
+    Drop the automatic single-column indexes of the foreign keys, which
+    `expense_archive_user_idx` already covers or nothing queries by.
+
+    Done by hand because `AlterField` rebuilds the table on SQLite, which
+    the `expenses_expense_all` view and the full-text triggers depend on.
+    """
+    model = apps.get_model("expenses", "ArchivedExpense")
+    for name in FOREIGN_KEYS:
+        column = model._meta.get_field(name).column
+        for index in schema_editor._constraint_names(model, [column], index=True):
+            schema_editor.execute(schema_editor._delete_index_sql(model, index))
+
+
+def create_foreign_key_indexes(apps, schema_editor):
+    model = apps.get_model("expenses", "ArchivedExpense")
+    for name in FOREIGN_KEYS:
+        schema_editor.execute(schema_editor._create_index_sql(model, fields=[model._meta.get_field(name)]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0012_expense_recurring_occurrence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_foreign_key_indexes, create_foreign_key_indexes),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='archivedexpense',
+                    name='recurring',
+                    field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_expenses', to='expenses.recurringexpense'),
+                ),
+                migrations.AlterField(
+                    model_name='archivedexpense',
+                    name='user',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_expenses', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedexpense',
+            index=models.Index(fields=['user', 'amount', 'id'], name='expense_archive_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedexpense',
+            index=models.Index(fields=['user', 'total', 'id'], name='expense_archive_total_idx'),
+        ),
+    ]
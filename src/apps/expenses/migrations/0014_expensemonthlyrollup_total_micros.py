@@ -0,0 +1,55 @@
+from django.db import migrations, models
+
+
+def totals_to_micros(apps, schema_editor):
+    ExpenseMonthlyRollup = apps.get_model("expenses", "ExpenseMonthlyRollup")
+    for rollup in ExpenseMonthlyRollup.objects.all().iterator():
+        rollup.total_micros = int(rollup.total * 10 ** 6)
+        rollup.save(update_fields=["total_micros"])
+
+
+CONVERSION = [
+    migrations.AddField(
+        model_name='expensemonthlyrollup',
+        name='total_micros',
+        field=models.BigIntegerField(default=0),
+    ),
+    migrations.RunPython(totals_to_micros, migrations.RunPython.noop),
+    migrations.RemoveField(
+        model_name='expensemonthlyrollup',
+        name='total',
+    ),
+]
+
+
+class ConvertRollupTotals(migrations.SeparateDatabaseAndState):
+    """
+    Store the rollup totals as integer millionths, skipping the database
+    work where the combined 0004_expenseimport_rollup_micros already did it.
+    """
+
+    def __init__(self):
+        super().__init__(database_operations=CONVERSION, state_operations=CONVERSION)
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {}
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        connection = schema_editor.connection
+        with connection.cursor() as cursor:
+            columns = {
+                column.name for column in connection.introspection.get_table_description(cursor, "expenses_expensemonthlyrollup")
+            }
+        if "total_micros" not in columns:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0013_archivedexpense_ordering_indexes'),
+    ]
+
+    operations = [
+        ConvertRollupTotals(),
+    ]
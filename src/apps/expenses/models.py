@@ -1,5 +1,20 @@
+import calendar
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.db import models
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, TruncDay, TruncMonth, TruncWeek
 from django.contrib.auth.models import User
+from django.dispatch import Signal
+from django.utils import timezone
+
+from src.storage import private_storage
+
+
+# Sent with `user_ids` whenever expenses are created, updated or deleted,
+# including bulk writes that bypass the model signals.
+expenses_changed = Signal()
 
 
 class TransactionTypeChoice(models.TextChoices):
@@ -10,6 +25,122 @@ class TaxTypeChoice(models.TextChoices):
     FLAT = 'FL', 'flat'
     PERCENTAGE = 'PE', 'percentage'
 
+class FrequencyChoice(models.TextChoices):
+    DAILY = 'D', 'daily'
+    WEEKLY = 'W', 'weekly'
+    MONTHLY = 'M', 'monthly'
+    YEARLY = 'Y', 'yearly'
+
+# Totals are rounded half up to whole cents wherever they are stored.
+TOTAL_QUANTUM = Decimal("0.01")
+
+
+def expense_total(amount, tax, tax_type):
+    """
+    Calculate the tax-inclusive total of an expense based on the tax type,
+    rounded half up to cents.
+    """
+    if tax_type == TaxTypeChoice.FLAT.value:
+        total = amount + tax
+    elif tax_type == TaxTypeChoice.PERCENTAGE.value:
+        total = amount + (amount * (tax / 100))
+    else:
+        total = amount
+    return total.quantize(TOTAL_QUANTUM, rounding=ROUND_HALF_UP)
+
+
+def total_field():
+    return models.DecimalField(max_digits=17, decimal_places=2)
+
+SUMMARY_PERIODS = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+SUMMARY_DIMENSIONS = ("transaction_type", "tax_type")
+
+# Orderings the expense list accepts (`?ordering=`), each served by an index.
+EXPENSE_ORDERINGS = ("created_at", "-created_at", "amount", "-amount", "total", "-total")
+
+# Fields `Expense.total` is derived from.
+TOTAL_SOURCE_FIELDS = ("amount", "tax", "tax_type")
+
+
+def total_expression():
+    """
+    SQL equivalent of `expense_total` (before rounding): flat tax is added
+    to the amount, percentage tax is applied to it.
+
+    The percentage is scaled with `* 0.01` rather than `/ 100` so SQLite does
+    not fall back to integer division for whole-number amounts.
+    """
+    return Case(
+        When(tax_type=TaxTypeChoice.FLAT, then=F("amount") + F("tax")),
+        When(
+            tax_type=TaxTypeChoice.PERCENTAGE,
+            then=F("amount") + F("amount") * F("tax") * Value(Decimal("0.01")),
+        ),
+        default=F("amount"),
+        output_field=total_field(),
+    )
+
+
+def stored_total():
+    """
+    The stored `total`, computed in SQL for rows `backfill_expense_totals`
+    has not reached yet.
+    """
+    return Coalesce(F("total"), total_expression(), output_field=total_field())
+
+
+class ExpenseQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Insert the expenses with their `total` filled in, as `save()` does.
+        """
+        objs = list(objs)
+        for obj in objs:
+            obj.set_total()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """
+        Update the expenses, refreshing `total` when a field it depends on
+        is among `fields`.
+        """
+        objs = list(objs)
+        fields = list(fields)
+        if set(fields) & set(TOTAL_SOURCE_FIELDS) and "total" not in fields:
+            for obj in objs:
+                obj.set_total()
+            fields.append("total")
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def summary(self, period="month", group_by=()):
+        """
+        Aggregate tax-inclusive totals per `period` bucket (and any extra
+        `group_by` dimensions) in a single query, returning plain dicts.
+        """
+        zero = Value(Decimal("0"), output_field=total_field())
+        credit = Coalesce(
+            Sum(stored_total(), filter=Q(transaction_type=TransactionTypeChoice.CREDIT)),
+            zero,
+        )
+        debit = Coalesce(
+            Sum(stored_total(), filter=Q(transaction_type=TransactionTypeChoice.DEBIT)),
+            zero,
+        )
+        dimensions = ["period", *group_by]
+        return (
+            self.annotate(period=SUMMARY_PERIODS[period]("created_at"))
+            .values(*dimensions)
+            .annotate(credit=credit, debit=debit, count=Count("id"))
+            .annotate(net=F("credit") - F("debit"))
+            .order_by(*dimensions)
+        )
+
+
 class Expense(models.Model):
     """
     Model representing an expense.
@@ -29,9 +160,378 @@ class Expense(models.Model):
         choices=TaxTypeChoice.choices,
         default=TaxTypeChoice.FLAT
     )
+    # `expense_total` of the row, kept up to date by `save()`, `bulk_create`
+    # and `bulk_update`; null until `backfill_expense_totals` reaches older rows.
+    total = models.DecimalField(max_digits=17, decimal_places=2, null=True, editable=False)
+    # Defaults to now like `auto_now_add`, but lets bulk imports keep the
+    # original transaction date.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # The schedule and occurrence number of an expense created by a
+    # `RecurringExpense`; unique together, so an occurrence exists at most
+    # once. The unique index also serves lookups by schedule.
+    recurring = models.ForeignKey(
+        'RecurringExpense',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=False,
+        related_name='expenses',
+    )
+    occurrence = models.PositiveIntegerField(blank=True, null=True, editable=False)
+
+    objects = ExpenseQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recurring", "occurrence"],
+                name="expense_recurring_occurrence_uniq",
+                condition=Q(recurring__isnull=False),
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="expense_user_created_idx"),
+            models.Index(fields=["user", "transaction_type", "-created_at", "-id"], name="expense_user_type_created_idx"),
+            models.Index(fields=["user", "tax_type", "-created_at", "-id"], name="expense_user_tax_created_idx"),
+            models.Index(fields=["user", "amount", "id"], name="expense_user_amount_idx"),
+            models.Index(fields=["user", "total", "id"], name="expense_user_total_idx"),
+        ]
+
+    def __str__(self):
+        # Only use the username when the user is already loaded, so listing
+        # or logging expenses does not cost a query per row.
+        owner = self.user.username if Expense.user.is_cached(self) else self.user_id
+        return f"{owner} - {self.amount} on {self.created_at.strftime('%Y-%m-%d')}"
+
+    def set_total(self):
+        """
+        Recompute `total` from the amount, tax and tax type.
+        """
+        amount = self._meta.get_field("amount").to_python(self.amount)
+        tax = self._meta.get_field("tax").to_python(self.tax)
+        self.total = expense_total(amount, tax, self.tax_type)
+
+    def save(self, *args, **kwargs):
+        self.set_total()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(TOTAL_SOURCE_FIELDS):
+            kwargs["update_fields"] = {*update_fields, "total"}
+        super().save(*args, **kwargs)
+
+
+
+class ArchivedExpense(models.Model):
+    """
+    Model holding an expense moved out of `Expense` by `archive_expenses`,
+    under its original id. Only the indexes the list orderings need (date,
+    amount and total per user) are kept.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False, related_name='archived_expenses')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_type = models.CharField(max_length=2, choices=TransactionTypeChoice.choices)
+    tax = models.DecimalField(max_digits=5, decimal_places=2)
+    tax_type = models.CharField(max_length=2, choices=TaxTypeChoice.choices)
+    total = models.DecimalField(max_digits=17, decimal_places=2, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    recurring = models.ForeignKey(
+        'RecurringExpense', on_delete=models.SET_NULL, null=True, db_index=False, related_name='archived_expenses'
+    )
+    occurrence = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="expense_archive_user_idx"),
+            models.Index(fields=["user", "amount", "id"], name="expense_archive_amount_idx"),
+            models.Index(fields=["user", "total", "id"], name="expense_archive_total_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.amount} on {self.created_at.strftime('%Y-%m-%d')} (archived)"
+
+
+class AllExpense(models.Model):
+    """
+    Read-only model over the `expenses_expense_all` view, the union of the
+    hot `Expense` table and `ArchivedExpense`.
+    """
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_type = models.CharField(max_length=2, choices=TransactionTypeChoice.choices)
+    tax = models.DecimalField(max_digits=5, decimal_places=2)
+    tax_type = models.CharField(max_length=2, choices=TaxTypeChoice.choices)
+    total = models.DecimalField(max_digits=17, decimal_places=2, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    objects = ExpenseQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = "expenses_expense_all"
+
+    def __str__(self):
+        return f"{self.user_id} - {self.amount} on {self.created_at.strftime('%Y-%m-%d')}"
+
+
+# Rollup totals are stored as integer millionths so that the running
+# `total + delta` updates stay exact on every backend, SQLite included.
+ROLLUP_SCALE = 10 ** 6
+
+
+def rollup_total(transaction_type):
+    """
+    Sum of the stored rollup totals of one transaction type, as a decimal.
+    """
+    return Coalesce(
+        Sum("total_micros", filter=Q(transaction_type=transaction_type))
+        * Value(Decimal(1) / ROLLUP_SCALE),
+        Value(Decimal("0")),
+        output_field=total_field(),
+    )
+
+
+class ExpenseMonthlyRollupQuerySet(models.QuerySet):
+    def summary(self, group_by=()):
+        """
+        Aggregate the monthly buckets into the same shape as
+        `ExpenseQuerySet.summary(period="month")`.
+        """
+        credit = rollup_total(TransactionTypeChoice.CREDIT)
+        debit = rollup_total(TransactionTypeChoice.DEBIT)
+        dimensions = ["period", *group_by]
+        return (
+            self.annotate(period=Cast("month", models.DateTimeField()))
+            .values(*dimensions)
+            .annotate(credit=credit, debit=debit, count=Sum("count"))
+            .annotate(net=F("credit") - F("debit"))
+            .order_by(*dimensions)
+        )
+
+
+class ExpenseMonthlyRollup(models.Model):
+    """
+    Model holding the running tax-inclusive total and count of a user's
+    expenses per month, transaction type and tax type.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_rollups')
+    month = models.DateField()
+    transaction_type = models.CharField(max_length=2, choices=TransactionTypeChoice.choices)
+    tax_type = models.CharField(max_length=2, choices=TaxTypeChoice.choices)
+    total_micros = models.BigIntegerField(default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    objects = ExpenseMonthlyRollupQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "month", "transaction_type", "tax_type"],
+                name="expense_rollup_unique_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.month.strftime('%Y-%m')} {self.transaction_type}/{self.tax_type}: {self.total}"
+
+    @property
+    def total(self):
+        return Decimal(self.total_micros) / ROLLUP_SCALE
+
+
+class ImportStatusChoice(models.TextChoices):
+    RUNNING = 'RU', 'running'
+    COMPLETED = 'CO', 'completed'
+    FAILED = 'FA', 'failed'
+
+
+class ExpenseImport(models.Model):
+    """
+    Model tracking a CSV import so that it can be resumed from the last
+    committed chunk after a crash.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_imports')
+    source = models.CharField(max_length=500)
+    file = models.FileField(upload_to='imports/', storage=private_storage, blank=True)
+    columns = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=2,
+        choices=ImportStatusChoice.choices,
+        default=ImportStatusChoice.RUNNING
+    )
+    rows_processed = models.PositiveBigIntegerField(default=0)
+    imported_count = models.PositiveBigIntegerField(default=0)
+    rejected_count = models.PositiveBigIntegerField(default=0)
+    reject_report = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} ({self.get_status_display()}, {self.rows_processed} rows)"
+
+
+class RecurringExpense(models.Model):
+    """
+    Model representing a schedule that creates an expense at every occurrence.
+
+    Occurrences follow an RRULE-like spec: `starts_at`, then every
+    `interval` days, weeks, months or years (FREQ and INTERVAL), at most
+    `count` times (COUNT) and not after `ends_at` (UNTIL). Monthly and
+    yearly occurrences keep the day of `starts_at`, clamped to the end of
+    shorter months. Occurrence `n` is computed from `starts_at`, so the
+    schedule never drifts.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_expenses')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_type = models.CharField(
+        max_length=2,
+        choices=TransactionTypeChoice.choices,
+        default=TransactionTypeChoice.DEBIT
+    )
+    tax = models.DecimalField(default=0, max_digits=5, decimal_places=2)
+    tax_type = models.CharField(
+        max_length=2,
+        choices=TaxTypeChoice.choices,
+        default=TaxTypeChoice.FLAT
+    )
+    frequency = models.CharField(max_length=1, choices=FrequencyChoice.choices)
+    interval = models.PositiveSmallIntegerField(default=1)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField(blank=True, null=True)
+    count = models.PositiveIntegerField(blank=True, null=True)
+    # Occurrences already created; the next one is occurrence number `occurrences`.
+    occurrences = models.PositiveIntegerField(default=0, editable=False)
+    # When the next occurrence is due; null once the schedule has ended.
+    next_run_at = models.DateTimeField(blank=True, null=True, editable=False)
+    is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # The scheduler's scan for due schedules; ended and paused ones stay out of it.
+            models.Index(
+                fields=["next_run_at"],
+                name="recurring_due_idx",
+                condition=Q(is_active=True, next_run_at__isnull=False),
+            ),
+            models.Index(fields=["user", "-created_at"], name="recurring_user_created_idx"),
+        ]
+
     def __str__(self):
-        return f"{self.user.username} - {self.amount} on {self.created_at.strftime('%Y-%m-%d')}"
+        return f"{self.title} - {self.amount} {self.get_frequency_display()} from {self.starts_at.strftime('%Y-%m-%d')}"
+
+    def occurrence_at(self, number):
+        """
+        Return when occurrence `number` (0 for `starts_at`) happens, in
+        wall-clock time of the current time zone.
+        """
+        start = timezone.localtime(self.starts_at)
+        steps = number * self.interval
+        if self.frequency == FrequencyChoice.DAILY:
+            return start + timedelta(days=steps)
+        if self.frequency == FrequencyChoice.WEEKLY:
+            return start + timedelta(weeks=steps)
+        months = steps * 12 if self.frequency == FrequencyChoice.YEARLY else steps
+        year, month = divmod(start.month - 1 + months, 12)
+        year += start.year
+        day = min(start.day, calendar.monthrange(year, month + 1)[1])
+        return start.replace(year=year, month=month + 1, day=day)
 
+    def schedule_next(self):
+        """
+        Set `next_run_at` to occurrence number `occurrences`, or to None if
+        the schedule has run `count` times or passed `ends_at`.
+        """
+        if self.count is not None and self.occurrences >= self.count:
+            self.next_run_at = None
+            return
+        next_run_at = self.occurrence_at(self.occurrences)
+        self.next_run_at = None if self.ends_at is not None and next_run_at > self.ends_at else next_run_at
+
+    def skip_until(self, moment):
+        """
+        Move past the occurrences before `moment` without creating them,
+        e.g. when a paused schedule is resumed.
+        """
+        while self.next_run_at is not None and self.next_run_at < moment:
+            self.occurrences += 1
+            self.schedule_next()
+
+    def make_expense(self):
+        """
+        Return the unsaved expense of the occurrence due at `next_run_at`.
+        """
+        return Expense(
+            user_id=self.user_id,
+            title=self.title,
+            description=self.description,
+            amount=self.amount,
+            transaction_type=self.transaction_type,
+            tax=self.tax,
+            tax_type=self.tax_type,
+            created_at=self.next_run_at,
+            recurring_id=self.pk,
+            occurrence=self.occurrences,
+        )
+
+
+class JobStatusChoice(models.TextChoices):
+    QUEUED = 'QU', 'queued'
+    RUNNING = 'RU', 'running'
+    SUCCEEDED = 'SU', 'succeeded'
+    FAILED = 'FA', 'failed'
+
+
+class Job(models.Model):
+    """
+    Model representing a background job run by `manage.py run_workers`.
+
+    A worker holds a running job for `JOB_LEASE_SECONDS`, renewed by every
+    progress report; a job whose lease ran out (its worker died) is claimed
+    again. Failed attempts are retried with exponential backoff until
+    `max_attempts`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=2,
+        choices=JobStatusChoice.choices,
+        default=JobStatusChoice.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    # Earliest start; pushed back by the retry backoff.
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    progress_detail = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # What workers scan: queued jobs by start time, and leases that may have run out.
+            models.Index(fields=["run_at", "id"], name="job_queued_idx", condition=Q(status=JobStatusChoice.QUEUED)),
+            models.Index(fields=["locked_until"], name="job_lease_idx", condition=Q(status=JobStatusChoice.RUNNING)),
+            models.Index(fields=["user", "-created_at"], name="job_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()}, {self.progress}%)"
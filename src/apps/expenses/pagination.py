@@ -0,0 +1,44 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ExpensePageNumberPagination(PageNumberPagination):
+    """
+    Default page-number pagination for the expense list.
+    """
+    page_size = settings.EXPENSE_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.EXPENSE_MAX_PAGE_SIZE
+
+
+class ExpenseCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id) for the expense list.
+
+    The cursor is opaque to clients and each page is served by seeking
+    on the (user, -created_at, -id) index instead of an OFFSET scan,
+    so latency does not grow with the size of a user's history.
+    """
+    page_size = settings.EXPENSE_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.EXPENSE_MAX_PAGE_SIZE
+    ordering = ("-created_at", "-id")
+
+
+PAGINATION_MODES = {
+    "page": ExpensePageNumberPagination,
+    "cursor": ExpenseCursorPagination,
+}
+
+
+def get_pagination_class(request):
+    """
+    Return the paginator class requested with `?pagination=page|cursor`.
+
+    A request carrying a `cursor` parameter is always served in cursor
+    mode so that `next`/`previous` links keep working.
+    """
+    if "cursor" in request.query_params:
+        return ExpenseCursorPagination
+    mode = request.query_params.get("pagination", "page")
+    return PAGINATION_MODES.get(mode, ExpensePageNumberPagination)
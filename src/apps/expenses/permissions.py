@@ -10,5 +10,5 @@ class IsExpenseOwnerOrAdmin(BasePermission):
         """
         if request.method in SAFE_METHODS:
             return True
-        return (obj.owner == request.user or request.user.is_staff)
+        return (obj.user_id == request.user.pk or request.user.is_staff)
 
@@ -0,0 +1,134 @@
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Expense, RecurringExpense
+from .rollups import record_changes
+from .writer import serialized_writes
+
+logger = logging.getLogger("jobs")
+
+# Schedule fields the scheduler changes.
+SCHEDULER_FIELDS = ("occurrences", "next_run_at", "updated_at")
+
+
+def due(now):
+    """
+    Return the schedules with an occurrence due at `now`, oldest first,
+    read through the partial `recurring_due_idx` index.
+    """
+    return RecurringExpense.objects.filter(is_active=True, next_run_at__lte=now).order_by("next_run_at", "pk")
+
+
+def save_progress(schedules):
+    """
+    Write the scheduler fields of `schedules` back with one prepared UPDATE
+    run through `executemany`. `bulk_update` would build a CASE branch per
+    row and field, which costs more than inserting the expenses.
+    """
+    meta = RecurringExpense._meta
+    fields = [meta.get_field(name) for name in SCHEDULER_FIELDS]
+    connection = connections[router.db_for_write(RecurringExpense)]
+    quote = connection.ops.quote_name
+    assignments = ", ".join(f"{quote(field.column)} = %s" for field in fields)
+    sql = f"UPDATE {quote(meta.db_table)} SET {assignments} WHERE {quote(meta.pk.column)} = %s"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(schedule, field.attname), connection) for field in fields] + [schedule.pk]
+            for schedule in schedules
+        ])
+
+
+def resync_counters(schedules):
+    """
+    Move the `occurrences` counter of `schedules` past the last occurrence
+    they already created, returning how many were behind.
+    """
+    latest = dict(
+        Expense.objects.filter(recurring__in=schedules)
+        .values("recurring")
+        .annotate(last=Max("occurrence"))
+        .values_list("recurring", "last")
+    )
+    behind = [schedule for schedule in schedules if latest.get(schedule.pk, -1) >= schedule.occurrences]
+    for schedule in behind:
+        schedule.occurrences = latest[schedule.pk] + 1
+        schedule.schedule_next()
+        schedule.updated_at = timezone.now()
+    save_progress(behind)
+    return len(behind)
+
+
+def create_occurrences(now, batch_size, catch_up_limit):
+    """
+    Claim up to `batch_size` due schedules and create their occurrences;
+    see `materialize_batch`.
+    """
+    with serialized_writes(), transaction.atomic():
+        schedules = list(due(now).select_for_update(skip_locked=True)[:batch_size])
+        if not schedules:
+            return 0, 0
+        expenses = []
+        for schedule in schedules:
+            for _ in range(catch_up_limit):
+                if schedule.next_run_at is None or schedule.next_run_at > now:
+                    break
+                expenses.append(schedule.make_expense())
+                schedule.occurrences += 1
+                schedule.schedule_next()
+            schedule.updated_at = now
+        Expense.objects.bulk_create(expenses, batch_size=settings.EXPENSE_BULK_BATCH_SIZE)
+        record_changes(added=expenses)
+        save_progress(schedules)
+    return len(schedules), len(expenses)
+
+
+def materialize_batch(now, batch_size=None, catch_up_limit=None):
+    """
+    Create the due occurrences of up to `batch_size` schedules in one
+    transaction, returning (schedules, expenses) handled.
+
+    Each schedule is claimed and its `occurrences`/`next_run_at` advanced
+    in the same transaction that inserts its expenses, so an occurrence is
+    created exactly once: a crash rolls both back, a rerun starts after the
+    last committed occurrence, and concurrent schedulers skip locked rows.
+    The unique (recurring, occurrence) key of `Expense` backs this up; if
+    it rejects the batch, the counters that fell behind are moved past the
+    existing occurrences and the batch is retried.
+    A schedule that is far behind gets at most `catch_up_limit` occurrences
+    per batch and stays due for the next one.
+    """
+    batch_size = batch_size or settings.EXPENSE_RECURRING_BATCH_SIZE
+    catch_up_limit = catch_up_limit or settings.EXPENSE_RECURRING_CATCH_UP_LIMIT
+    try:
+        return create_occurrences(now, batch_size, catch_up_limit)
+    except IntegrityError:
+        with serialized_writes(), transaction.atomic():
+            behind = resync_counters(list(due(now).select_for_update(skip_locked=True)[:batch_size]))
+        logger.warning("Skipped past existing occurrences of %d recurring expense(s)", behind)
+        if not behind:
+            raise
+        return create_occurrences(now, batch_size, catch_up_limit)
+
+
+def materialize_due(now=None, batch_size=None, catch_up_limit=None, progress=None):
+    """
+    Create every occurrence due at `now` (default: when the run starts),
+    batch by batch, and return the (schedules, expenses) totals.
+
+    `progress` is called with the running totals after each batch.
+    """
+    now = now or timezone.now()
+    schedules = expenses = 0
+    while True:
+        handled, created = materialize_batch(now, batch_size, catch_up_limit)
+        if not handled:
+            break
+        schedules += handled
+        expenses += created
+        if progress is not None:
+            progress(schedules, expenses)
+    return schedules, expenses
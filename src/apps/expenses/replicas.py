@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+
+from src.routers import choose_replica, reset_read_alias, set_read_alias
+
+from .models import expenses_changed
+
+
+def get_cache():
+    return caches[settings.DATABASE_REPLICA_PIN_CACHE_ALIAS]
+
+
+def replicas_enabled():
+    """
+    Use the replicas only when the pins live in a cache shared by every
+    worker: a pin kept in one process's local memory would let the other
+    processes serve a user's reads from a replica that lacks their writes.
+    """
+    return bool(settings.DATABASE_REPLICA_ALIASES) and not isinstance(get_cache(), LocMemCache)
+
+
+def pin_key(user_id):
+    return f"db:primary-pin:{user_id}"
+
+
+def pin_to_primary(user_ids):
+    """
+    Read the users' requests from `default` for the stickiness window, so
+    they see their own writes before the replicas catch up.
+    """
+    if replicas_enabled():
+        get_cache().set_many(
+            {pin_key(user_id): True for user_id in user_ids},
+            timeout=settings.DATABASE_REPLICA_STICKY_SECONDS,
+        )
+
+
+def is_pinned(user_id):
+    return get_cache().get(pin_key(user_id), False)
+
+
+@receiver(expenses_changed)
+def pin_expense_owners(sender, user_ids, **kwargs):
+    pin_to_primary(user_ids)
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests from a read replica unless the user is pinned to
+    the primary by a recent write; the chosen alias is `self.read_alias`
+    (None for `default`). Without a shared pin cache every read stays on
+    `default`.
+    """
+    read_alias = None
+
+    def dispatch(self, request, *args, **kwargs):
+        token = set_read_alias(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            reset_read_alias(token)
+
+    def get_read_alias(self, request):
+        if request.method not in SAFE_METHODS or not request.user.is_authenticated or not replicas_enabled():
+            return None
+        if is_pinned(request.user.pk):
+            return None
+        return choose_replica()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.read_alias = self.get_read_alias(request)
+        set_read_alias(self.read_alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and request.user.is_authenticated:
+            pin_to_primary([request.user.pk])
+        return response
@@ -0,0 +1,178 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ROLLUP_SCALE, AllExpense, Expense, ExpenseMonthlyRollup, expense_total, expenses_changed
+from .writer import serialized_writes
+
+# Fields that decide which bucket an expense lands in and what it adds to it.
+ROLLUP_FIELDS = ("user_id", "amount", "tax", "tax_type", "transaction_type", "created_at")
+
+_state = threading.local()
+
+
+@contextmanager
+def signals_suspended():
+    """
+    Stop the per-instance signal handlers from touching the rollups, for bulk
+    paths that call `record_changes` once for the whole batch instead.
+    """
+    previous = getattr(_state, "suspended", False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def signals_are_suspended():
+    return getattr(_state, "suspended", False)
+
+
+def month_of(created_at):
+    """
+    Return the first day of the month `created_at` falls in, in the current
+    time zone (matching `TruncMonth`).
+    """
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def bucket_of(row):
+    """
+    Return the (key, total in millionths) contribution of an expense row to
+    the rollups.
+
+    `row` is anything exposing the `ROLLUP_FIELDS` as attributes or keys.
+    """
+    if not isinstance(row, dict):
+        row = {field: getattr(row, field) for field in ROLLUP_FIELDS}
+    amount, tax = row["amount"], row["tax"]
+    # Unsaved instances may still hold ints or strings rather than Decimals.
+    if not isinstance(amount, Decimal):
+        amount = Expense._meta.get_field("amount").to_python(amount)
+    if not isinstance(tax, Decimal):
+        tax = Expense._meta.get_field("tax").to_python(tax)
+    key = (row["user_id"], month_of(row["created_at"]), row["transaction_type"], row["tax_type"])
+    return key, int(expense_total(amount, tax, row["tax_type"]) * ROLLUP_SCALE)
+
+
+def collect_deltas(added=(), removed=()):
+    """
+    Fold added and removed expense rows into one (total, count) delta per bucket.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for rows, sign in ((added, 1), (removed, -1)):
+        for row in rows:
+            key, total = bucket_of(row)
+            deltas[key][0] += sign * total
+            deltas[key][1] += sign
+    return {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+
+
+def apply_deltas(deltas):
+    """
+    Apply per-bucket deltas with one atomic `UPDATE ... SET total = total + x`
+    per bucket, creating buckets on first use and dropping emptied ones.
+    """
+    with transaction.atomic():
+        for (user_id, month, transaction_type, tax_type), (total, count) in deltas.items():
+            key = {
+                "user_id": user_id,
+                "month": month,
+                "transaction_type": transaction_type,
+                "tax_type": tax_type,
+            }
+            bucket = ExpenseMonthlyRollup.objects.filter(**key)
+            updated = bucket.update(total_micros=F("total_micros") + total, count=F("count") + count)
+            if updated:
+                if count < 0:
+                    bucket.filter(count=0).delete()
+                continue
+            if count <= 0:
+                # Nothing to take away from, e.g. the user is being deleted.
+                continue
+            try:
+                with transaction.atomic():
+                    ExpenseMonthlyRollup.objects.create(**key, total_micros=total, count=count)
+            except IntegrityError:
+                # Lost a race with a concurrent writer creating the same bucket.
+                bucket.update(total_micros=F("total_micros") + total, count=F("count") + count)
+
+
+def snapshot(instance):
+    """
+    Return the rollup-relevant state of an instance before it is modified.
+    """
+    return {field: getattr(instance, field) for field in ROLLUP_FIELDS}
+
+
+def record_changes(added=(), removed=()):
+    """
+    Update the monthly rollups for expense rows written outside `Expense.save()`
+    and `Expense.delete()`, e.g. by `bulk_create` or `QuerySet.update`, and
+    send `expenses_changed` for the users they belong to.
+    """
+    added, removed = list(added), list(removed)
+    apply_deltas(collect_deltas(added=added, removed=removed))
+    user_ids = {row["user_id"] if isinstance(row, dict) else row.user_id for row in (*added, *removed)}
+    if user_ids:
+        expenses_changed.send(sender=Expense, user_ids=user_ids)
+
+
+def expected_rollups(queryset, chunk_size=2000):
+    """
+    Recompute the rollup buckets for `queryset` from scratch, streaming the
+    expenses instead of loading them all.
+    """
+    rows = queryset.values(*ROLLUP_FIELDS).order_by().iterator(chunk_size=chunk_size)
+    return collect_deltas(added=rows)
+
+
+def rebuild_for_users(user_ids, chunk_size=2000):
+    """
+    Replace the rollups of `user_ids` with values recomputed from their
+    expenses, archived ones included.
+    """
+    expected = expected_rollups(AllExpense.objects.filter(user_id__in=user_ids), chunk_size)
+    with serialized_writes(), transaction.atomic():
+        ExpenseMonthlyRollup.objects.filter(user_id__in=user_ids).delete()
+        ExpenseMonthlyRollup.objects.bulk_create(
+            [
+                ExpenseMonthlyRollup(
+                    user_id=user_id,
+                    month=month,
+                    transaction_type=transaction_type,
+                    tax_type=tax_type,
+                    total_micros=total,
+                    count=count,
+                )
+                for (user_id, month, transaction_type, tax_type), (total, count) in expected.items()
+            ],
+            batch_size=chunk_size,
+        )
+    return len(expected)
+
+
+def diff_for_users(user_ids, chunk_size=2000):
+    """
+    Return the buckets of `user_ids` whose stored values differ from the
+    expenses, as {key: (stored, expected)}.
+    """
+    expected = expected_rollups(AllExpense.objects.filter(user_id__in=user_ids), chunk_size)
+    stored = {
+        (row["user_id"], row["month"], row["transaction_type"], row["tax_type"]): [row["total_micros"], row["count"]]
+        for row in ExpenseMonthlyRollup.objects.filter(user_id__in=user_ids).values(
+            "user_id", "month", "transaction_type", "tax_type", "total_micros", "count"
+        )
+    }
+    empty = [0, 0]
+    return {
+        key: (stored.get(key, empty), expected.get(key, empty))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key, empty) != expected.get(key, empty)
+    }
@@ -0,0 +1,137 @@
+import re
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F
+
+# SQLite: external-content FTS5 table over both storage tiers (the
+# `expenses_expense_all` view), filled by triggers on each table so
+# `bulk_create`, `QuerySet.update`, raw writes and archiving are indexed too.
+FTS_TABLE = "expenses_expense_fts"
+FTS_CONTENT = "expenses_expense_all"
+
+
+def fts_triggers(table, prefix):
+    return {
+        f"{prefix}_insert": f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+            END
+        """,
+        f"{prefix}_delete": f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            END
+        """,
+        f"{prefix}_update": f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE OF id, title, description ON {table} BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+            END
+        """,
+    }
+
+
+# Table -> triggers keeping the full-text index in step with it.
+SQLITE_TRIGGERS = {
+    "expenses_expense": fts_triggers("expenses_expense", FTS_TABLE),
+    "expenses_archivedexpense": fts_triggers("expenses_archivedexpense", f"{FTS_TABLE}_archive"),
+}
+
+# PostgreSQL: expression GIN index; `search_vector()` must stay identical to it.
+SEARCH_CONFIG = "simple"
+SEARCH_INDEX_NAME = "expense_search_idx"
+ARCHIVE_SEARCH_INDEX_NAME = "expense_archive_search_idx"
+
+
+def search_vector():
+    return SearchVector("title", "description", config=SEARCH_CONFIG)
+
+
+def search_index(name=SEARCH_INDEX_NAME):
+    return GinIndex(search_vector(), name=name)
+
+
+def ensure_sqlite_search(connection):
+    """
+    Create the FTS5 table and the triggers of the existing tables if missing,
+    rebuilding the index when triggers had to be (re)created, e.g. after a
+    migration rebuilt `expenses_expense` and dropped them.
+    """
+    tables = set(connection.introspection.table_names(include_views=True))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"title, description, content='{FTS_CONTENT}', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {name for (name,) in cursor.fetchall()}
+        missing = [
+            sql
+            for table, triggers in SQLITE_TRIGGERS.items()
+            if table in tables
+            for name, sql in triggers.items()
+            if name not in existing
+        ]
+        for sql in missing:
+            cursor.execute(sql)
+        # The content view only exists once both tiers do.
+        if missing and FTS_CONTENT in tables:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return bool(missing)
+
+
+def drop_sqlite_search(connection):
+    with connection.cursor() as cursor:
+        for triggers in SQLITE_TRIGGERS.values():
+            for name in triggers:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def search_terms(query):
+    """
+    Split a search string into word tokens; punctuation is ignored.
+    """
+    return re.findall(r"\w+", query)
+
+
+def search_expenses(queryset, query):
+    """
+    Filter `queryset` to expenses whose title or description contains every
+    word of `query` as a word prefix, best matches first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "sqlite":
+        match = " ".join('"{}"*'.format(term) for term in terms)
+        # The unary `+` stops SQLite from driving the join from the expense
+        # side (one MATCH per row of the user); the full-text index is scanned
+        # once per tier and matches are looked up by primary key.
+        return queryset.extra(
+            select={"search_rank": f"bm25({FTS_TABLE})"},
+            tables=[FTS_TABLE],
+            where=[f"+{FTS_TABLE}.rowid = {queryset.model._meta.db_table}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+        ).order_by("search_rank", "-created_at", "-id")
+
+    if vendor == "postgresql":
+        search_query = SearchQuery(" & ".join(f"{term}:*" for term in terms), config=SEARCH_CONFIG, search_type="raw")
+        return (
+            queryset.annotate(search=search_vector())
+            .filter(search=search_query)
+            .annotate(search_rank=SearchRank(F("search"), search_query))
+            .order_by("-search_rank", "-created_at", "-id")
+        )
+
+    # Other backends have no index; fall back to a scan.
+    for term in terms:
+        queryset = queryset.filter(title__icontains=term) | queryset.filter(description__icontains=term)
+    return queryset
@@ -1,22 +1,458 @@
+import decimal
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Expense, TaxTypeChoice
+from src.metrics import TimedListSerializer, TimedSerializerMixin
+from src.schema import extend_schema_field
+from .models import (
+    EXPENSE_ORDERINGS,
+    Expense,
+    ExpenseImport,
+    Job,
+    RecurringExpense,
+    SUMMARY_DIMENSIONS,
+    SUMMARY_PERIODS,
+    TaxTypeChoice,
+    TransactionTypeChoice,
+    expense_total,
+)
+from .imports import IMPORT_FIELDS
+from .rollups import record_changes, snapshot
+from .writer import serialized_writes
+
+# Placeholder for items rejected in partial-success mode.
+REJECTED = object()
+
+# Reads the `id` of bulk update items; numeric strings such as "5" are accepted.
+ITEM_ID = serializers.IntegerField(min_value=1)
+
+
+class ExpenseListSerializer(TimedListSerializer):
+    """
+    List serializer writing many expenses with one `bulk_create` or
+    `bulk_update` inside a single transaction.
+
+    For updates, `instance` is a mapping of primary key to expense and each
+    item must carry the `id` of the expense it changes. With
+    `partial_success` in the context, invalid items are collected in
+    `item_errors` (keyed by index) instead of failing the whole batch.
+    """
+
+    def to_internal_value(self, data):
+        self.item_errors = {}
+        self.valid_indexes = []
+        self.matched_instances = []
+        self._next_index = 0
+        self._seen_ids = set()
+        validated = super().to_internal_value(data)
+        return [attrs for attrs in validated if attrs is not REJECTED]
+
+    def run_child_validation(self, data):
+        index = self._next_index
+        self._next_index += 1
+        try:
+            if self.instance is not None:
+                self.child.instance = self.get_child_instance(data)
+            attrs = self.child.run_validation(data)
+        except serializers.ValidationError as exc:
+            if not self.context.get("partial_success"):
+                raise
+            self.item_errors[index] = exc.detail
+            return REJECTED
+        self.valid_indexes.append(index)
+        if self.instance is not None:
+            self.matched_instances.append(self.child.instance)
+        return attrs
+
+    @staticmethod
+    def item_ids(data):
+        """
+        Return the valid ids the items of a bulk update refer to, read as
+        `get_child_instance` reads them.
+        """
+        ids = []
+        for item in data if isinstance(data, list) else ():
+            if isinstance(item, dict) and item.get("id") is not None:
+                try:
+                    ids.append(ITEM_ID.run_validation(item["id"]))
+                except serializers.ValidationError:
+                    pass
+        return ids
+
+    def get_child_instance(self, data):
+        """
+        Return the expense an update item refers to.
+        """
+        pk = data.get("id") if isinstance(data, dict) else None
+        if pk is None:
+            raise serializers.ValidationError({"id": ["This field is required."]})
+        try:
+            pk = ITEM_ID.run_validation(pk)
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({"id": exc.detail})
+        expense = self.instance.get(pk)
+        if expense is None:
+            raise serializers.ValidationError({"id": ["Expense not found."]})
+        if expense.pk in self._seen_ids:
+            raise serializers.ValidationError({"id": ["Duplicate expense in the batch."]})
+        self._seen_ids.add(expense.pk)
+        return expense
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        expenses = [model(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            model.objects.bulk_create(expenses, batch_size=settings.EXPENSE_BULK_BATCH_SIZE)
+            record_changes(added=expenses)
+        return expenses
+
+    def update(self, instance, validated_data):
+        model = self.child.Meta.model
+        expenses = self.matched_instances
+        previous = [snapshot(expense) for expense in expenses]
+        now = timezone.now()
+        fields = {"updated_at"}
+        for expense, attrs in zip(expenses, validated_data):
+            for attr, value in attrs.items():
+                setattr(expense, attr, value)
+            expense.updated_at = now
+            fields.update(attrs)
+        with transaction.atomic():
+            model.objects.bulk_update(expenses, sorted(fields), batch_size=settings.EXPENSE_BULK_BATCH_SIZE)
+            record_changes(added=expenses, removed=previous)
+        return expenses
 
-class ExpenseSerializer(serializers.ModelSerializer):
+
+class ExpenseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     total = serializers.SerializerMethodField()
 
     class Meta:
         model = Expense
-        fields = '__all__'
+        # The recurring key is internal to the scheduler.
+        exclude = ("recurring", "occurrence")
         read_only_fields = ("id", "created_at", "updated_at", "user", "total")
+        list_serializer_class = ExpenseListSerializer
 
-    def get_total(self, obj) -> float:
+    @extend_schema_field(serializers.DecimalField(max_digits=17, decimal_places=2, coerce_to_string=False))
+    def get_total(self, obj):
         """
-        Calculate the total amount of the expense based on the tax type.
+        Return the stored tax-inclusive total of the expense.
         """
-        if obj.tax_type == TaxTypeChoice.FLAT.value:
-            return obj.amount + obj.tax
-        elif obj.tax_type == TaxTypeChoice.PERCENTAGE.value:
-            return obj.amount + (obj.amount * (obj.tax / 100))
-        return obj.amount
+        if obj.total is None:
+            # Not backfilled yet.
+            return expense_total(obj.amount, obj.tax, obj.tax_type)
+        return obj.total
+
+
+class ExpenseFastSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """
+    Read-only serializer for list and export paths that builds the exact
+    output of `ExpenseSerializer` from `values(*source_fields)` rows,
+    skipping model instances and DRF's per-field machinery.
+    """
+    source_fields = (
+        "id",
+        "title",
+        "description",
+        "amount",
+        "transaction_type",
+        "tax",
+        "tax_type",
+        "total",
+        "created_at",
+        "updated_at",
+        "user_id",
+    )
+
+    # Quantisation used by the `amount` (max_digits=10) and `tax` (max_digits=5)
+    # DecimalFields of `ExpenseSerializer`.
+    cents = decimal.Decimal(".01")
+    amount_context = decimal.Context(prec=10)
+    tax_context = decimal.Context(prec=5)
+
+    @staticmethod
+    def format_decimal(value, places, context):
+        if value is None:
+            return None
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f"{value.quantize(places, context=context):f}"
+
+    @staticmethod
+    def format_datetime(value, tz):
+        if not value:
+            return None
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    def to_representation(self, row):
+        tz = timezone.get_current_timezone()
+        amount, tax, tax_type, total = row["amount"], row["tax"], row["tax_type"], row["total"]
+        title, description = row["title"], row["description"]
+        return {
+            "id": row["id"],
+            "total": expense_total(amount, tax, tax_type) if total is None else total,
+            "title": None if title is None else str(title),
+            "description": None if description is None else str(description),
+            "amount": self.format_decimal(amount, self.cents, self.amount_context),
+            "transaction_type": row["transaction_type"],
+            "tax": self.format_decimal(tax, self.cents, self.tax_context),
+            "tax_type": tax_type,
+            "created_at": self.format_datetime(row["created_at"], tz),
+            "updated_at": self.format_datetime(row["updated_at"], tz),
+            "user": row["user_id"],
+        }
+
+
+class ExpenseSummaryQuerySerializer(serializers.Serializer):
+    """
+    Serializer for validating expense summary query parameters.
+    """
+    period = serializers.ChoiceField(choices=list(SUMMARY_PERIODS), default="month")
+    group_by = serializers.MultipleChoiceField(choices=SUMMARY_DIMENSIONS, required=False)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    transaction_type = serializers.ChoiceField(choices=TransactionTypeChoice.choices, required=False)
+    tax_type = serializers.ChoiceField(choices=TaxTypeChoice.choices, required=False)
+
+
+class ExpenseListQuerySerializer(serializers.Serializer):
+    """
+    Serializer for validating expense list filter and ordering parameters.
+    """
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    min_amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    min_total = serializers.DecimalField(max_digits=17, decimal_places=2, required=False)
+    max_total = serializers.DecimalField(max_digits=17, decimal_places=2, required=False)
+    transaction_type = serializers.ChoiceField(choices=TransactionTypeChoice.choices, required=False)
+    tax_type = serializers.ChoiceField(choices=TaxTypeChoice.choices, required=False)
+    ordering = serializers.ChoiceField(choices=EXPENSE_ORDERINGS, required=False)
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] >= attrs["end"]:
+            raise serializers.ValidationError({"end": "Must be after start."})
+        if "min_amount" in attrs and "max_amount" in attrs and attrs["min_amount"] > attrs["max_amount"]:
+            raise serializers.ValidationError({"max_amount": "Must not be less than min_amount."})
+        if "min_total" in attrs and "max_total" in attrs and attrs["min_total"] > attrs["max_total"]:
+            raise serializers.ValidationError({"max_total": "Must not be less than min_total."})
+        return attrs
+
+
+class ExpenseSummarySerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Serializer for one aggregated expense summary bucket.
+    """
+    period = serializers.DateTimeField()
+    transaction_type = serializers.CharField(required=False)
+    tax_type = serializers.CharField(required=False)
+    credit = serializers.DecimalField(max_digits=17, decimal_places=2)
+    debit = serializers.DecimalField(max_digits=17, decimal_places=2)
+    net = serializers.DecimalField(max_digits=17, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class ExpenseBalanceSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Serializer for the overall balance of a user's expenses.
+    """
+    credit = serializers.DecimalField(max_digits=17, decimal_places=2)
+    debit = serializers.DecimalField(max_digits=17, decimal_places=2)
+    net = serializers.DecimalField(max_digits=17, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class ExpenseBulkDeleteSerializer(serializers.Serializer):
+    """
+    Serializer for validating a bulk expense deletion request.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.EXPENSE_BULK_MAX_ITEMS,
+    )
+
+
+class ExpenseExportQuerySerializer(serializers.Serializer):
+    """
+    Serializer for validating expense export query parameters.
+    """
+    output = serializers.ChoiceField(choices=["csv", "ndjson"], default="csv")
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+
+class ExpenseImportSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for the progress of an expense CSV import.
+    """
+    file = serializers.FileField(write_only=True)
+
+    class Meta:
+        model = ExpenseImport
+        fields = (
+            "id",
+            "file",
+            "source",
+            "columns",
+            "status",
+            "rows_processed",
+            "imported_count",
+            "rejected_count",
+            "error",
+            "created_at",
+            "updated_at",
+        )
+        read_only_fields = (
+            "id",
+            "source",
+            "status",
+            "rows_processed",
+            "imported_count",
+            "rejected_count",
+            "error",
+            "created_at",
+            "updated_at",
+        )
+
+    def validate_columns(self, value):
+        """
+        Check the column mapping is {expense field: CSV header}.
+        """
+        if isinstance(value, str):
+            # Multipart uploads send the mapping as a JSON string.
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise serializers.ValidationError("Value must be valid JSON.")
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Expected an object mapping expense fields to CSV headers.")
+        unknown = sorted(set(value) - set(IMPORT_FIELDS))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown expense fields: {', '.join(unknown)}.")
+        if not all(isinstance(header, str) for header in value.values()):
+            raise serializers.ValidationError("CSV headers must be strings.")
+        return value
+
+
+class RecurringExpenseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for recurring expense schedules. The recurrence itself
+    (`frequency`, `interval`, `starts_at`) is fixed once created; the
+    occurrences already made were made under it.
+    """
+
+    class Meta:
+        model = RecurringExpense
+        fields = '__all__'
+        read_only_fields = ("id", "user", "occurrences", "next_run_at", "created_at", "updated_at")
+
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Ensure this value is greater than or equal to 1.")
+        return value
+
+    def validate_count(self, value):
+        if value is not None and value < 1:
+            raise serializers.ValidationError("Ensure this value is greater than or equal to 1.")
+        return value
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            changed = sorted(
+                field for field in ("frequency", "interval", "starts_at")
+                if field in attrs and attrs[field] != getattr(self.instance, field)
+            )
+            if changed:
+                raise serializers.ValidationError(
+                    {field: ["Cannot be changed; create a new schedule instead."] for field in changed}
+                )
+        starts_at = attrs.get("starts_at", getattr(self.instance, "starts_at", None))
+        ends_at = attrs.get("ends_at", getattr(self.instance, "ends_at", None))
+        if starts_at is not None and ends_at is not None and ends_at < starts_at:
+            raise serializers.ValidationError({"ends_at": ["Must not be before starts_at."]})
+        return attrs
+
+    def create(self, validated_data):
+        schedule = RecurringExpense(**validated_data)
+        schedule.schedule_next()
+        schedule.save()
+        return schedule
+
+    def update(self, instance, validated_data):
+        with serialized_writes(), transaction.atomic():
+            # Re-read under lock: the scheduler may have advanced `occurrences`
+            # and `next_run_at` since `instance` was loaded, and saving those
+            # back would create the same occurrence again.
+            instance = RecurringExpense.objects.select_for_update().get(pk=instance.pk)
+            resumed = validated_data.get("is_active") and not instance.is_active
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            # `ends_at` or `count` may have moved the end of the schedule.
+            instance.schedule_next()
+            if resumed:
+                # Occurrences that fell in the pause are not created.
+                instance.skip_until(timezone.now())
+            instance.save()
+        return instance
+
+
+# Job kinds clients can submit through the jobs endpoint, with the serializer
+# validating their params. Imports are queued by the import endpoint.
+SUBMITTABLE_JOBS = {
+    "export": ExpenseExportQuerySerializer,
+    "rebuild_rollups": None,
+}
+
+
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for the state, progress and result of a background job.
+    """
+
+    class Meta:
+        model = Job
+        fields = (
+            "id",
+            "kind",
+            "params",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_at",
+            "progress",
+            "progress_detail",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+        read_only_fields = fields
+
+
+class JobSubmitSerializer(serializers.Serializer):
+    """
+    Serializer for submitting a background job: its `kind` and the params
+    its serializer in `SUBMITTABLE_JOBS` accepts.
+    """
+    kind = serializers.ChoiceField(choices=sorted(SUBMITTABLE_JOBS))
+    params = serializers.DictField(required=False, default=dict)
+
+    def validate(self, attrs):
+        params_serializer = SUBMITTABLE_JOBS[attrs["kind"]]
+        if params_serializer is None:
+            if attrs["params"]:
+                raise serializers.ValidationError({"params": ["This job takes no params."]})
+            return attrs
+        params = params_serializer(data=attrs["params"])
+        if not params.is_valid():
+            raise serializers.ValidationError({"params": params.errors})
+        # Stored as JSON; the handler validates them again when it runs.
+        attrs["params"] = dict(params.data)
+        return attrs
 
-        
\ No newline at end of file
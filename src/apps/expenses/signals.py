@@ -0,0 +1,54 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Expense
+from .rollups import ROLLUP_FIELDS, record_changes, signals_are_suspended
+from .search import FTS_TABLE, ensure_sqlite_search
+
+
+@receiver(pre_save, sender=Expense)
+def remember_previous_expense(sender, instance, raw=False, **kwargs):
+    """
+    Keep the stored state of an expense about to be updated so the rollup
+    bucket it used to count towards can be decremented.
+    """
+    if raw or instance.pk is None or signals_are_suspended():
+        instance._rollup_previous = None
+        return
+    instance._rollup_previous = sender.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Expense)
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Move the expense's contribution from its previous bucket to its current one.
+    """
+    if raw or signals_are_suspended():
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    record_changes(added=[instance], removed=[previous] if previous else ())
+    instance._rollup_previous = None
+
+
+@receiver(post_delete, sender=Expense)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    """
+    Remove a deleted expense's contribution from its bucket.
+    """
+    if signals_are_suspended():
+        return
+    record_changes(removed=[instance])
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using="default", **kwargs):
+    """
+    Recreate the FTS5 triggers when a migration rebuilt `expenses_expense`
+    on SQLite (which drops its triggers), reindexing the table.
+    """
+    if sender.label != "expenses":
+        return
+    connection = connections[using]
+    if connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names():
+        ensure_sqlite_search(connection)
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AllExpense, ExpenseMonthlyRollup, SUMMARY_DIMENSIONS
+
+
+def can_use_rollups(filters):
+    """
+    Rollups answer month-level queries whose bounds fall on month starts.
+    """
+    if not settings.EXPENSE_SUMMARY_USE_ROLLUPS or filters["period"] != "month":
+        return False
+    for bound in ("start", "end"):
+        if bound in filters:
+            value = timezone.localtime(filters[bound])
+            if value.day != 1 or value.time() != datetime.min.time():
+                return False
+    return True
+
+
+def summary_rows(user, filters):
+    """
+    Return the summary rows for `user` and the validated
+    `ExpenseSummaryQuerySerializer` data, read from the monthly rollups
+    when they can answer the query and from the expenses otherwise.
+    """
+    group_by = [field for field in SUMMARY_DIMENSIONS if field in filters.get("group_by", ())]
+
+    if can_use_rollups(filters):
+        queryset = ExpenseMonthlyRollup.objects.all()
+        if "start" in filters:
+            queryset = queryset.filter(month__gte=timezone.localtime(filters["start"]).date())
+        if "end" in filters:
+            queryset = queryset.filter(month__lt=timezone.localtime(filters["end"]).date())
+    else:
+        queryset = AllExpense.objects.all()
+        if "start" in filters:
+            queryset = queryset.filter(created_at__gte=filters["start"])
+        if "end" in filters:
+            queryset = queryset.filter(created_at__lt=filters["end"])
+    if not user.is_superuser:
+        queryset = queryset.filter(user=user)
+    for field in SUMMARY_DIMENSIONS:
+        if field in filters:
+            queryset = queryset.filter(**{field: filters[field]})
+
+    if queryset.model is ExpenseMonthlyRollup:
+        return queryset.summary(group_by=group_by)
+    return queryset.summary(period=filters["period"], group_by=group_by)
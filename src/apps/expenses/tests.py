@@ -1,3 +1,1782 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Sum
+from django.http import Http404, StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.views.static import serve
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from src import metrics
+from src.apps.auth.serializers import UserTokenObtainPairSerializer
+from src.log_handlers import LazyFileHandler
+from src.routers import ReplicaRouter, reset_read_alias, set_read_alias
+from src.schema import SchemaCache
+from src.storage import private_storage
+from src.testing import QueryBudgetMixin
+
+from .archive import archive_batch, archive_cutoff
+from .benchmarks import compare, prepare_users, run_scenario, seed_users
+from .exports import EXPORT_COLUMNS
+from .jobs import JOB_HANDLERS, JobLost, claim, enqueue, report_progress, run_job, run_next
+from .models import (
+    AllExpense,
+    ArchivedExpense,
+    Expense,
+    ExpenseImport,
+    ExpenseMonthlyRollup,
+    FrequencyChoice,
+    ImportStatusChoice,
+    Job,
+    JobStatusChoice,
+    RecurringExpense,
+    TaxTypeChoice,
+    TransactionTypeChoice,
+    expense_total,
+)
+from .pagination import ExpensePageNumberPagination
+from .recurring import materialize_due
+from .rollups import record_changes
+from .serializers import ExpenseFastSerializer, ExpenseSerializer, RecurringExpenseSerializer
+from .views import ExpenseListCreateView
+from .writer import serialized_writes
+
+
+class ExpenseFastSerializerTests(TestCase):
+    """
+    The fast serializer must render byte-for-byte what `ExpenseSerializer` does.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("parity", "parity@example.com", "password123")
+        cases = [
+            ("500.00", "5.00", TaxTypeChoice.FLAT, TransactionTypeChoice.CREDIT, None),
+            ("333", "5", TaxTypeChoice.PERCENTAGE, TransactionTypeChoice.DEBIT, ""),
+            ("10.00", "7.25", TaxTypeChoice.PERCENTAGE, TransactionTypeChoice.DEBIT, "Café ☕ \"quoted\""),
+            ("99999999.99", "999.99", TaxTypeChoice.PERCENTAGE, TransactionTypeChoice.CREDIT, "large"),
+            ("0.01", "0", TaxTypeChoice.FLAT, TransactionTypeChoice.DEBIT, "multi\nline"),
+        ]
+        for index, (amount, tax, tax_type, transaction_type, description) in enumerate(cases):
+            Expense.objects.create(
+                user=cls.user,
+                title=f"Expense {index}",
+                description=description,
+                amount=Decimal(amount),
+                tax=Decimal(tax),
+                tax_type=tax_type,
+                transaction_type=transaction_type,
+            )
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_matches_model_serializer(self):
+        queryset = Expense.objects.order_by("id")
+        expected = self.render(ExpenseSerializer(queryset, many=True).data)
+        rows = queryset.values(*ExpenseFastSerializer.source_fields)
+        self.assertEqual(self.render(ExpenseFastSerializer(rows, many=True).data), expected)
+
+    def test_list_endpoint_matches_model_serializer(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse("expense-list-create") + "?page_size=10"
+        with override_settings(EXPENSE_CACHE_ENABLED=False, EXPENSE_FAST_SERIALIZER=True):
+            fast = client.get(url).content
+        with override_settings(EXPENSE_CACHE_ENABLED=False, EXPENSE_FAST_SERIALIZER=False):
+            slow = client.get(url).content
+        self.assertEqual(fast, slow)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite-specific")
+class ExpenseListFilterIndexTests(TestCase):
+    """
+    Every documented filter and ordering combination of the expense list
+    must be answered from indexes on both branches of the
+    `expenses_expense_all` view, not a table scan or a sort of all the
+    user's rows.
+    """
+    # (query parameters, live-table index, archive index, sorts); a range
+    # filter without its own ordering sorts the rows in the range, and only
+    # those.
+    combinations = [
+        ({}, "expense_user_created_idx", "expense_archive_user_idx", False),
+        (
+            {"start": "2024-01-01T00:00:00Z", "end": "2024-02-01T00:00:00Z"},
+            "expense_user_created_idx", "expense_archive_user_idx", False,
+        ),
+        ({"transaction_type": "CR"}, "expense_user_type_created_idx", "expense_archive_user_idx", False),
+        (
+            {"transaction_type": "DB", "start": "2024-01-01T00:00:00Z", "end": "2024-02-01T00:00:00Z"},
+            "expense_user_type_created_idx", "expense_archive_user_idx", False,
+        ),
+        ({"tax_type": "FL"}, "expense_user_tax_created_idx", "expense_archive_user_idx", False),
+        ({"tax_type": "PE", "start": "2024-01-01T00:00:00Z"}, "expense_user_tax_created_idx", "expense_archive_user_idx", False),
+        ({"min_amount": "10", "max_amount": "20"}, "expense_user_amount_idx", "expense_archive_amount_idx", True),
+        ({"min_amount": "10", "ordering": "amount"}, "expense_user_amount_idx", "expense_archive_amount_idx", False),
+        ({"max_amount": "20", "ordering": "-amount"}, "expense_user_amount_idx", "expense_archive_amount_idx", False),
+        ({"ordering": "amount"}, "expense_user_amount_idx", "expense_archive_amount_idx", False),
+        ({"ordering": "-amount"}, "expense_user_amount_idx", "expense_archive_amount_idx", False),
+        ({"min_total": "10", "max_total": "20"}, "expense_user_total_idx", "expense_archive_total_idx", True),
+        ({"min_total": "10", "ordering": "total"}, "expense_user_total_idx", "expense_archive_total_idx", False),
+        ({"max_total": "20", "ordering": "-total"}, "expense_user_total_idx", "expense_archive_total_idx", False),
+        ({"ordering": "total"}, "expense_user_total_idx", "expense_archive_total_idx", False),
+        ({"ordering": "-total"}, "expense_user_total_idx", "expense_archive_total_idx", False),
+        ({"ordering": "created_at"}, "expense_user_created_idx", "expense_archive_user_idx", False),
+        ({"ordering": "-created_at"}, "expense_user_created_idx", "expense_archive_user_idx", False),
+        (
+            {"end": "2024-02-01T00:00:00Z", "ordering": "created_at"},
+            "expense_user_created_idx", "expense_archive_user_idx", False,
+        ),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("filters", "filters@example.com", "password123")
+
+    def query_plan(self, params):
+        """
+        Return the plan of the page query the list endpoint runs, as
+        {branch: [steps]} for the live ("LEFT") and archive ("RIGHT") tables.
+        """
+        request = Request(APIRequestFactory().get("/", params))
+        request.user = self.user
+        view = ExpenseListCreateView(request=request, args=(), kwargs={}, format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())[:50]
+        sql, sql_params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", sql_params)
+            steps = [row[-1] for row in cursor.fetchall()]
+        self.assertEqual(steps[:2], ["MERGE (UNION ALL)", "LEFT"], steps)
+        right = steps.index("RIGHT")
+        return {"LEFT": steps[2:right], "RIGHT": steps[right + 1:]}
+
+    def test_filter_combinations_use_an_index(self):
+        for params, index, archive_index, sorts in self.combinations:
+            with self.subTest(params=params):
+                plan = self.query_plan(params)
+                for branch, expected in (("LEFT", index), ("RIGHT", archive_index)):
+                    steps = plan[branch]
+                    self.assertFalse([step for step in steps if step.startswith("SCAN ")], steps)
+                    self.assertTrue([step for step in steps if f"INDEX {expected} " in step], steps)
+                    self.assertEqual("USE TEMP B-TREE FOR ORDER BY" in steps, sorts, steps)
+
+    def test_unknown_values_are_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for params in ({"ordering": "title"}, {"transaction_type": "XX"}, {"min_amount": "5", "max_amount": "1"}, {"min_total": "5", "max_total": "1"}):
+            with self.subTest(params=params):
+                response = client.get(reverse("expense-list-create"), params)
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(EXPENSE_CACHE_ENABLED=False)
+class ExpenseEndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Every expense endpoint must run a fixed number of queries, however many
+    expenses the user has; a per-row query fails the N+1 check.
+    """
+    rows = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("budget", "budget@example.com", "password123")
+        Expense.objects.bulk_create(
+            Expense(
+                user=cls.user,
+                title=f"Groceries {index}",
+                amount=Decimal(index + 1),
+                tax=Decimal("5"),
+                tax_type=TaxTypeChoice.PERCENTAGE if index % 2 else TaxTypeChoice.FLAT,
+                transaction_type=TransactionTypeChoice.CREDIT if index % 3 else TransactionTypeChoice.DEBIT,
+            )
+            for index in range(cls.rows)
+        )
+        cls.expense = Expense.objects.filter(user=cls.user).first()
+        cls.expense_import = ExpenseImport.objects.create(user=cls.user, source="budget.csv")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def item(self, index):
+        return {"title": f"Bulk {index}", "amount": "10.00", "tax": "1.00", "tax_type": "FL"}
+
+    def test_list(self):
+        url = reverse("expense-list-create")
+        for params, budget in (
+            ({}, 2),
+            ({"pagination": "cursor"}, 1),
+            ({"q": "groceries"}, 2),
+            ({"min_total": "1", "ordering": "-total"}, 2),
+        ):
+            with self.subTest(params=params), self.assertMaxQueries(budget):
+                self.assertEqual(self.client.get(url, {"page_size": 50, **params}).status_code, 200)
+
+    def test_create(self):
+        with self.assertMaxQueries(7):
+            response = self.client.post(reverse("expense-list-create"), self.item(0), format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_detail(self):
+        url = reverse("expense-detail", args=[self.expense.pk])
+        for method, budget in (("get", 1), ("delete", 1)):
+            with self.subTest(method=method), self.assertMaxQueries(budget):
+                response = getattr(self.client, method)(url, self.item(0), format="json")
+            self.assertLess(response.status_code, 300)
+
+    def test_summary_and_balance(self):
+        for rollups in (True, False):
+            with self.subTest(rollups=rollups), override_settings(EXPENSE_SUMMARY_USE_ROLLUPS=rollups):
+                with self.assertMaxQueries(1):
+                    self.assertEqual(self.client.get(reverse("expense-summary")).status_code, 200)
+                with self.assertMaxQueries(1):
+                    self.assertEqual(self.client.get(reverse("expense-balance")).status_code, 200)
+
+    def test_bulk(self):
+        url = reverse("expense-bulk")
+        with self.assertMaxQueries(9):
+            response = self.client.post(url, [self.item(index) for index in range(self.rows)], format="json")
+        self.assertEqual(response.status_code, 201)
+        ids = [item["data"]["id"] for item in response.json()["results"]]
+        with self.assertMaxQueries(7):
+            response = self.client.patch(url, [{"id": pk, "amount": "20.00"} for pk in ids], format="json")
+        self.assertEqual(response.status_code, 200)
+        with self.assertMaxQueries(9):
+            response = self.client.delete(url, {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_export(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse("expense-export"), {"output": "ndjson"})
+            body = b"".join(response.streaming_content)
+        self.assertEqual(body.count(b"\n"), self.rows)
+
+    def test_import(self):
+        rows = "".join(f"Imported {index},{index + 1}.00\n" for index in range(self.rows))
+        upload = SimpleUploadedFile("expenses.csv", f"title,amount\n{rows}".encode(), content_type="text/csv")
+        with self.settings(PRIVATE_MEDIA_ROOT=self.enterContext(TemporaryDirectory())):
+            with self.assertMaxQueries(14):
+                response = self.client.post(reverse("expense-import"), {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 201, response.content)
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse("expense-import-detail", args=[self.expense_import.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_reads(self):
+        token = UserTokenObtainPairSerializer.get_token(self.user).access_token
+        headers = {"Authorization": f"Bearer {token}"}
+        # Each budget includes the `is_active` lookup of an uncached user.
+        for name, args, budget in (
+            ("async-expense-list", [], 3),
+            ("async-expense-detail", [self.expense.pk], 2),
+            ("async-expense-summary", [], 2),
+        ):
+            await cache.aclear()
+            with self.subTest(view=name), self.assertMaxQueries(budget):
+                response = await self.async_client.get(reverse(name, args=args), headers=headers)
+            self.assertEqual(response.status_code, 200)
+
+
+class ApiBenchmarkTests(TestCase):
+    """
+    The benchmark data must be reproducible, write scenarios must leave the
+    data set as seeded, and the comparison must catch regressions.
+    """
+
+    def test_seed_is_reproducible(self):
+        def seeded_rows():
+            seed_users(2, 40, seed=7, prefix="repro")
+            return list(
+                Expense.objects.filter(user__username__startswith="repro-")
+                .order_by("user__username", "-created_at")
+                .values_list("user__username", "title", "amount", "tax", "tax_type", "transaction_type")
+            )
+
+        first = seeded_rows()
+        self.assertEqual(len(first), 80)
+        self.assertEqual(seeded_rows(), first)
+        self.assertEqual(User.objects.filter(username__startswith="repro-").count(), 2)
+
+    def test_write_scenarios_clean_up(self):
+        seed_users(1, 20, prefix="scenario")
+        users = prepare_users("scenario")
+        for name in ("create", "bulk_create", "detail"):
+            result = run_scenario(name, users, requests=3, warmup=1)
+            self.assertEqual(result["errors"], 0, name)
+            self.assertIsNotNone(result["p95_ms"], name)
+        self.assertEqual(Expense.objects.filter(user=users[0].user).count(), 20)
+
+    def test_compare(self):
+        baseline = {"scenarios": {"detail": {"throughput": 100.0, "p95_ms": 10.0}}}
+        steady = {"scenarios": {"detail": {"throughput": 95.0, "p95_ms": 10.5}, "export": {"throughput": 1.0}}}
+        slower = {"scenarios": {"detail": {"throughput": 80.0, "p95_ms": 10.5}}}
+        self.assertEqual(compare(steady, baseline, max_regression=10), [])
+        self.assertEqual(len(compare(slower, baseline, max_regression=10)), 1)
+        self.assertEqual(compare(slower, baseline, max_regression=10, metrics=("p95_ms",)), [])
+
+
+class RecurringExpenseTests(TestCase):
+    """
+    Schedules must create each occurrence exactly once, including the ones
+    missed while the scheduler was not running.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("recurring", "recurring@example.com", "password123")
+
+    def schedule(self, **fields):
+        schedule = RecurringExpense(
+            user=self.user,
+            title="Rent",
+            amount=Decimal("1000.00"),
+            tax=Decimal("5.00"),
+            tax_type=TaxTypeChoice.PERCENTAGE,
+            frequency=FrequencyChoice.DAILY,
+            **fields,
+        )
+        schedule.schedule_next()
+        schedule.save()
+        return schedule
+
+    def test_monthly_occurrences_keep_the_day(self):
+        schedule = RecurringExpense(
+            frequency=FrequencyChoice.MONTHLY, interval=1, starts_at=datetime(2024, 1, 31, 9, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(
+            [schedule.occurrence_at(number).date() for number in range(4)],
+            [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)],
+        )
+        schedule.frequency = FrequencyChoice.YEARLY
+        self.assertEqual(schedule.occurrence_at(1).date(), date(2025, 1, 31))
+
+    def test_catch_up_is_idempotent(self):
+        now = timezone.now()
+        ended = self.schedule(starts_at=now - timedelta(days=9, hours=12), count=5)
+        running = self.schedule(starts_at=now - timedelta(days=9, hours=12), interval=2)
+
+        self.assertEqual(materialize_due(now, batch_size=1, catch_up_limit=2), (6, 10))
+        self.assertEqual(materialize_due(now), (0, 0))
+
+        ended.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual((ended.occurrences, ended.next_run_at), (5, None))
+        self.assertEqual(running.occurrences, 5)
+        self.assertGreater(running.next_run_at, now)
+        expenses = Expense.objects.filter(user=self.user)
+        self.assertEqual(expenses.count(), 10)
+        self.assertEqual(expenses.values("created_at").distinct().count(), 7)
+        self.assertEqual(expenses.first().total, Decimal("1050.00"))
+        self.assertEqual(ExpenseMonthlyRollup.objects.filter(user=self.user).aggregate(n=Sum("count"))["n"], 10)
+
+    def test_update_does_not_rewind_the_scheduler(self):
+        schedule = self.schedule(starts_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(materialize_due(), (1, 1))
+        # `schedule` still holds the counters from before the run.
+        serializer = RecurringExpenseSerializer(schedule, data={"title": "Rent (flat 2)"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        with self.assertNoLogs("jobs"):
+            self.assertEqual(materialize_due(), (0, 0))
+        schedule.refresh_from_db()
+        self.assertEqual((schedule.title, schedule.occurrences), ("Rent (flat 2)", 1))
+        self.assertEqual(Expense.objects.filter(recurring=schedule).count(), 1)
+
+    def test_occurrences_are_unique(self):
+        schedule = self.schedule(starts_at=timezone.now() - timedelta(days=2, hours=1))
+        self.assertEqual(materialize_due(), (1, 3))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Expense.objects.create(user=self.user, title="Rent", amount=Decimal("1"), recurring=schedule, occurrence=0)
+
+        # A counter that fell behind skips the occurrences that exist.
+        RecurringExpense.objects.filter(pk=schedule.pk).update(occurrences=1, next_run_at=schedule.occurrence_at(1))
+        with self.assertLogs("jobs", "WARNING"):
+            self.assertEqual(materialize_due(), (0, 0))
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.occurrences, 3)
+        self.assertEqual(
+            list(Expense.objects.filter(recurring=schedule).order_by("occurrence").values_list("occurrence", flat=True)),
+            [0, 1, 2],
+        )
+
+    def test_api_creates_pauses_and_resumes(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        starts_at = timezone.now() - timedelta(days=3)
+        response = client.post(reverse("recurring-expense-list-create"), {
+            "title": "Gym",
+            "amount": "30.00",
+            "frequency": FrequencyChoice.DAILY,
+            "starts_at": starts_at.isoformat(),
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        url = reverse("recurring-expense-detail", args=[response.json()["id"]])
+        self.assertEqual(RecurringExpense.objects.get().next_run_at, starts_at)
+
+        response = client.patch(url, {"frequency": FrequencyChoice.WEEKLY}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("frequency", response.json())
+
+        client.patch(url, {"is_active": False}, format="json")
+        self.assertEqual(materialize_due(), (0, 0))
+        client.patch(url, {"is_active": True}, format="json")
+        self.assertGreater(RecurringExpense.objects.get().next_run_at, timezone.now())
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+
+
+class JobQueueTests(TestCase):
+    """
+    Jobs must run once per claim, be retried with backoff when they fail,
+    and be taken over when their worker stops renewing the lease.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("jobs", "jobs@example.com", "password123")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.enterContext(self.settings(
+            MEDIA_ROOT=self.enterContext(TemporaryDirectory()),
+            PRIVATE_MEDIA_ROOT=self.enterContext(TemporaryDirectory()),
+        ))
+
+    def test_export_is_submitted_polled_and_downloaded(self):
+        Expense.objects.bulk_create(
+            Expense(user=self.user, title=f"Expense {index}", amount=Decimal("10.00")) for index in range(5)
+        )
+        response = self.client.post(
+            reverse("job-list-create"), {"kind": "export", "params": {"output": "ndjson"}}, format="json"
+        )
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.json()["job"]["status"], JobStatusChoice.QUEUED)
+        url = response["Location"]
+
+        self.assertIsNotNone(run_next("test-worker"))
+        self.assertIsNone(run_next("test-worker"))
+
+        job = self.client.get(url).json()
+        self.assertEqual((job["status"], job["progress"], job["attempts"]), (JobStatusChoice.SUCCEEDED, 100, 1))
+        self.assertEqual(job["result"]["rows"], 5)
+        response = self.client.get(reverse("job-download", args=[job["id"]]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content).count(b"\n"), 5)
+
+    def test_export_file_is_private(self):
+        job = enqueue(self.user, "export", {"output": "csv"})
+        run_next("test-worker")
+        job.refresh_from_db()
+        name = job.result["file"]
+        self.assertTrue(private_storage.exists(name))
+
+        # Not under MEDIA_ROOT, which the DEBUG URLconf serves to anyone.
+        with self.assertRaises(Http404):
+            serve(APIRequestFactory().get(f"/media/{name}"), name, document_root=settings.MEDIA_ROOT)
+        url = reverse("job-download", args=[job.pk])
+        self.assertEqual(APIClient().get(url).status_code, 401)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("other", "other@example.com", "password123"))
+        self.assertEqual(other.get(url).status_code, 404)
+
+    def test_invalid_params_are_rejected(self):
+        response = self.client.post(
+            reverse("job-list-create"), {"kind": "export", "params": {"output": "xml"}}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("params", response.json())
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_with_backoff_then_failed(self):
+        handler = mock.Mock(side_effect=RuntimeError("boom"))
+        self.enterContext(mock.patch.dict(JOB_HANDLERS, {"flaky": handler}))
+        job = enqueue(self.user, "flaky", max_attempts=2)
+
+        with self.assertLogs("jobs", "WARNING"):
+            run_next("test-worker")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatusChoice.QUEUED, 1))
+        self.assertIn("boom", job.error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIsNone(run_next("test-worker"))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs("jobs", "ERROR"):
+            run_next("test-worker")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatusChoice.FAILED, 2))
+        self.assertEqual(handler.call_count, 2)
+
+    def test_expired_lease_is_claimed_again(self):
+        enqueue(self.user, "rebuild_rollups")
+        lost = claim("worker-a")
+        self.assertIsNone(claim("worker-b"))
+
+        Job.objects.filter(pk=lost.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        job = claim("worker-b")
+        self.assertEqual((job.pk, job.attempts, job.locked_by), (lost.pk, 2, "worker-b"))
+        with self.assertRaises(JobLost):
+            report_progress(lost, 50)
+
+    def test_lost_import_commits_nothing(self):
+        upload = SimpleUploadedFile("expenses.csv", b"title,amount\nTaxi,12.50\nLunch,8.00\n", content_type="text/csv")
+        response = self.client.post(reverse("expense-import") + "?background=true", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 202, response.content)
+        lost = claim("worker-a")
+        Job.objects.filter(pk=lost.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        job = claim("worker-b")
+
+        with self.assertLogs("jobs", "WARNING"):
+            run_job(lost)
+        expense_import = ExpenseImport.objects.get()
+        self.assertEqual((expense_import.status, expense_import.rows_processed), (ImportStatusChoice.RUNNING, 0))
+        self.assertFalse(Expense.objects.exists())
+
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result["imported_count"]), (JobStatusChoice.SUCCEEDED, 2))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+
+    def test_import_runs_in_the_background(self):
+        upload = SimpleUploadedFile("expenses.csv", b"title,amount\nTaxi,12.50\nLunch,8.00\n", content_type="text/csv")
+        response = self.client.post(reverse("expense-import") + "?background=true", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertFalse(Expense.objects.filter(user=self.user).exists())
+
+        run_next("test-worker")
+        job = self.client.get(response["Location"]).json()
+        self.assertEqual(job["status"], JobStatusChoice.SUCCEEDED, job["error"])
+        self.assertEqual(job["result"]["imported_count"], 2)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+
+
+class ExpenseImportTests(TestCase):
+    """
+    Uploaded statements and reject reports must stay out of the publicly
+    served media, and large uploads must not be imported in the request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("importer", "importer@example.com", "password123")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.media_root = self.enterContext(TemporaryDirectory())
+        self.private_root = self.enterContext(TemporaryDirectory())
+        self.enterContext(self.settings(MEDIA_ROOT=self.media_root, PRIVATE_MEDIA_ROOT=self.private_root))
+
+    def upload(self, content, **params):
+        upload = SimpleUploadedFile("statement.csv", content, content_type="text/csv")
+        url = reverse("expense-import")
+        if params:
+            url += "?" + "&".join(f"{name}={value}" for name, value in params.items())
+        return self.client.post(url, {"file": upload}, format="multipart")
+
+    def test_upload_and_rejects_are_private(self):
+        response = self.upload(b"title,amount\nTaxi,12.50\nBroken,abc\n")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["rejects"], [{"row": 2, "error": "amount: \u201cabc\u201d value must be a decimal number."}])
+
+        expense_import = ExpenseImport.objects.get()
+        self.assertTrue(private_storage.exists(expense_import.file.name))
+        self.assertTrue(expense_import.reject_report.startswith(os.path.abspath(self.private_root)))
+        self.assertEqual([name for _, _, files in os.walk(self.media_root) for name in files], [])
+        with self.assertRaises(ValueError):
+            expense_import.file.url
+
+    @override_settings(EXPENSE_IMPORT_SYNC_MAX_BYTES=16)
+    def test_large_upload_is_queued(self):
+        response = self.upload(b"title,amount\nTaxi,12.50\nLunch,8.00\n")
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(Job.objects.get().kind, "import")
+        self.assertFalse(Expense.objects.exists())
+
+
+class RequestMetricsTests(TestCase):
+    """
+    `/metrics` must not be public, and the histogram must report what was
+    recorded.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("metrics", "metrics@example.com", "password123")
+        Expense.objects.create(user=cls.user, title="Taxi", amount=Decimal("12.50"))
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def test_histogram_quantiles_and_buckets(self):
+        histogram = metrics.LatencyHistogram()
+        for seconds in [0.001] * 90 + [0.1] * 10:
+            histogram.record(seconds)
+        buckets, count, total, maximum = histogram.snapshot()
+        self.assertEqual((count, maximum), (100, 0.1))
+        self.assertAlmostEqual(total, 1.09)
+        # 1 ms lands in [992, 1008) µs and 100 ms in [98304, 100352) µs.
+        self.assertEqual(metrics.LatencyHistogram.quantile(buckets, count, maximum, 0.5), 0.001008)
+        self.assertEqual(metrics.LatencyHistogram.quantile(buckets, count, maximum, 0.9), 0.001008)
+        self.assertEqual(metrics.LatencyHistogram.quantile(buckets, count, maximum, 0.99), 0.1)
+        self.assertEqual(metrics.LatencyHistogram.cumulative(buckets, (0.001, 0.005, 0.1, 1)), [0, 90, 90, 100])
+
+    def test_render(self):
+        registry = metrics.MetricsRegistry()
+        stats = metrics.RequestMetrics()
+        stats.db_queries = 2
+        registry.record("expense-list-create", "GET", 200, 0.003, stats, 120)
+        registry.record("expense-list-create", "GET", 404, 0.2, stats, 30)
+        lines = registry.render().splitlines()
+        labels = 'view="expense-list-create",method="GET"'
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="0.005"}} 1', lines)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="0.25"}} 2', lines)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', lines)
+        self.assertIn(f"http_request_duration_seconds_count{{{labels}}} 2", lines)
+        self.assertIn(f'http_responses_total{{{labels},status="404"}} 1', lines)
+        self.assertIn(f"http_request_db_queries_total{{{labels}}} 4", lines)
+        self.assertIn(f"http_response_bytes_total{{{labels}}} 150", lines)
+        self.assertIn("# TYPE http_responses_total counter", lines)
+
+    def test_endpoint_requires_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+            response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"# TYPE http_request_duration_seconds histogram", response.content)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with self.settings(METRICS_ENABLED=False, METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer secret").status_code, 404)
+
+    def test_requests_record_auth_and_serializer_time(self):
+        token = UserTokenObtainPairSerializer.get_token(self.user).access_token
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(client.get(reverse("expense-list-create")).status_code, 200)
+        self.assertEqual(client.get(reverse("recurring-expense-list-create")).status_code, 200)
+
+        for view in ("expense-list-create", "recurring-expense-list-create"):
+            stats = metrics.registry.endpoint(view, "GET")
+            self.assertEqual(stats.statuses, {200: 1})
+            self.assertGreater(stats.totals["auth_seconds"], 0)
+            self.assertGreater(stats.totals["serializer_seconds"], 0)
+
+
+class ExpenseResponseCacheTests(TestCase):
+    """
+    Cached expense responses must be dropped by every write, and never kept
+    in a cache local to one worker process.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cached", "cached@example.com", "password123")
+        cls.expense = Expense.objects.create(user=cls.user, title="Taxi", amount=Decimal("12.50"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        location = self.enterContext(TemporaryDirectory())
+        self.enterContext(self.settings(
+            CACHES={
+                **settings.CACHES,
+                "responses": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+            },
+            EXPENSE_CACHE_ALIAS="responses",
+        ))
+
+    def titles(self):
+        response = self.client.get(reverse("expense-list-create"), {"page_size": 10})
+        self.assertEqual(response.status_code, 200)
+        return [item["title"] for item in response.json()["results"]]
+
+    def write(self, method, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(reverse("expense-bulk"), data, format="json")
+        self.assertLess(response.status_code, 300, response.content)
+
+    def test_writes_invalidate_cached_pages(self):
+        self.assertEqual(self.titles(), ["Taxi"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(), ["Taxi"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("expense-list-create"), {"title": "Lunch", "amount": "8.00"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.titles(), ["Lunch", "Taxi"])
+
+        self.write("patch", [{"id": self.expense.pk, "title": "Cab"}])
+        self.assertEqual(self.titles(), ["Lunch", "Cab"])
+        detail = self.client.get(reverse("expense-detail", args=[self.expense.pk]))
+        self.assertEqual(detail.json()["title"], "Cab")
+
+        self.write("delete", {"ids": [self.expense.pk]})
+        self.assertEqual(self.titles(), ["Lunch"])
+        self.assertEqual(self.client.get(reverse("expense-detail", args=[self.expense.pk])).status_code, 404)
+
+    def test_not_modified(self):
+        url = reverse("expense-detail", args=[self.expense.pk])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        self.write("patch", [{"id": self.expense.pk, "amount": "13.00"}])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_local_memory_cache_is_not_used(self):
+        with self.settings(EXPENSE_CACHE_ALIAS="default"):
+            self.assertNotIn("ETag", self.client.get(reverse("expense-list-create")))
+            self.assertEqual(self.client.get(reverse("expense-list-create"), HTTP_IF_NONE_MATCH="*").status_code, 200)
+
+
+class ReplicaRoutingTests(TestCase):
+    """
+    Reads go to the alias chosen for the request, and a user who just wrote
+    reads from `default` in every worker.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("writer", "writer@example.com", "password123")
+        cls.other = User.objects.create_user("reader", "reader@example.com", "password123")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        location = self.enterContext(TemporaryDirectory())
+        self.enterContext(self.settings(
+            CACHES={
+                **settings.CACHES,
+                "pins": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+            },
+            DATABASE_REPLICA_PIN_CACHE_ALIAS="pins",
+            # The test database has no replica; route "replica" reads to `default`.
+            DATABASE_REPLICA_ALIASES=["default"],
+        ))
+        self.choose_replica = self.enterContext(
+            mock.patch("src.apps.expenses.replicas.choose_replica", return_value="default")
+        )
+
+    def read(self, client=None):
+        self.choose_replica.reset_mock()
+        response = (client or self.client).get(reverse("expense-list-create"))
+        self.assertEqual(response.status_code, 200)
+        return self.choose_replica.called
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Expense))
+        token = set_read_alias("replica_1")
+        try:
+            self.assertEqual(router.db_for_read(Expense), "replica_1")
+            self.assertEqual(router.db_for_write(Expense), "default")
+        finally:
+            reset_read_alias(token)
+        self.assertIsNone(router.db_for_read(Expense))
+        self.assertTrue(router.allow_migrate("default", "expenses"))
+        self.assertFalse(router.allow_migrate("replica_1", "expenses"))
+
+    def test_writer_reads_from_primary(self):
+        self.assertTrue(self.read())
+        response = self.client.post(reverse("expense-list-create"), {"title": "Taxi", "amount": "12.50"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(self.read())
+
+        other = APIClient()
+        other.force_authenticate(self.other)
+        self.assertTrue(self.read(other))
+
+    def test_background_writes_pin_the_owner(self):
+        # Imports and other jobs run in worker processes; the shared cache
+        # carries their pins to the web workers.
+        record_changes(added=Expense.objects.bulk_create([Expense(user=self.other, title="Lunch", amount=Decimal("8.00"))]))
+        other = APIClient()
+        other.force_authenticate(self.other)
+        self.assertFalse(self.read(other))
+        self.assertTrue(self.read())
+
+    def test_local_memory_pins_disable_replicas(self):
+        with self.settings(DATABASE_REPLICA_PIN_CACHE_ALIAS="default"):
+            self.assertFalse(self.read())
+
+
+class ExpenseSearchTests(TestCase):
+    """
+    `?q=` must match every word as a prefix of the user's expenses, best
+    matches first, and follow writes made outside `Expense.save()`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("searcher", "searcher@example.com", "password123")
+        other = User.objects.create_user("stranger", "stranger@example.com", "password123")
+        now = timezone.now()
+        cls.best, cls.weaker, cls.partial, cls.foreign = Expense.objects.bulk_create([
+            Expense(user=cls.user, title="Market groceries", description="Weekly groceries at the market",
+                    amount=Decimal("40"), created_at=now - timedelta(days=3)),
+            Expense(user=cls.user, title="Taxi", description="Ride home from the groceries market after a long day",
+                    amount=Decimal("15"), created_at=now - timedelta(days=2)),
+            Expense(user=cls.user, title="Groceries", amount=Decimal("20"), created_at=now - timedelta(days=1)),
+            Expense(user=other, title="Market groceries", amount=Decimal("30"), created_at=now),
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, q, **params):
+        return self.client.get(reverse("expense-list-create"), {"q": q, "page_size": 10, **params})
+
+    def ids(self, q):
+        response = self.search(q)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item["id"] for item in response.json()["results"]]
+
+    def test_every_word_matches_as_prefix_best_first(self):
+        self.assertEqual(self.ids("groc market"), [self.best.pk, self.weaker.pk])
+        self.assertEqual(self.ids("GROC"), [self.partial.pk, self.best.pk, self.weaker.pk])
+        self.assertEqual(self.ids("ride"), [self.weaker.pk])
+        self.assertEqual(self.ids("!!"), [])
+
+    def test_index_follows_bulk_writes(self):
+        Expense.objects.filter(pk=self.partial.pk).update(title="Pharmacy")
+        self.assertEqual(self.ids("pharm"), [self.partial.pk])
+        self.assertNotIn(self.partial.pk, self.ids("groceries"))
+        Expense.objects.filter(pk=self.weaker.pk).delete()
+        self.assertEqual(self.ids("groc market"), [self.best.pk])
+
+    def test_rank_order_cannot_be_overridden(self):
+        response = self.search("groc", ordering="amount")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ordering", response.json())
+        response = self.search("groc", pagination="cursor")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("pagination", response.json())
+        self.assertEqual(self.search("", ordering="amount").status_code, 200)
+
+
+class ExpenseRollupTests(TestCase):
+    """
+    The monthly rollups must match `rebuild_expense_rollups --verify` after
+    every kind of write.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rollup", "rollup@example.com", "password123")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRollupsVerified(self):
+        output = StringIO()
+        call_command("rebuild_expense_rollups", "--verify", stdout=output)
+        self.assertIn("All expense rollups are up to date.", output.getvalue())
+
+    def months(self):
+        return dict(
+            ExpenseMonthlyRollup.objects.filter(user=self.user).values_list("month").annotate(Sum("count")).order_by()
+        )
+
+    def bulk(self, method, data):
+        response = getattr(self.client, method)(reverse("expense-bulk"), data, format="json")
+        self.assertLess(response.status_code, 300, response.content)
+        return response.json()
+
+    def test_create_update_move_and_delete(self):
+        response = self.client.post(
+            reverse("expense-list-create"),
+            {"title": "Rent", "amount": "900.00", "tax": "5", "tax_type": "PE"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        rent = Expense.objects.get(pk=response.json()["data"]["id"])
+        created = self.bulk("post", [
+            {"title": "Salary", "amount": "2500.00", "transaction_type": "CR"},
+            {"title": "Coffee", "amount": "3.40", "tax": "0.30"},
+        ])
+        salary_id, coffee_id = (item["data"]["id"] for item in created["results"])
+        self.assertRollupsVerified()
+
+        rent.amount = Decimal("950.00")
+        rent.save()
+        self.bulk("patch", [
+            {"id": salary_id, "transaction_type": "DB", "tax": "10", "tax_type": "PE"},
+            {"id": coffee_id, "amount": "4.10"},
+        ])
+        self.assertRollupsVerified()
+
+        this_month = rent.created_at.date().replace(day=1)
+        rent.created_at -= timedelta(days=45)
+        rent.save()
+        last_month = rent.created_at.date().replace(day=1)
+        self.assertEqual(self.months(), {this_month: 2, last_month: 1})
+        self.assertRollupsVerified()
+
+        rent.delete()
+        self.bulk("delete", {"ids": [coffee_id]})
+        self.assertEqual(self.months(), {this_month: 1})
+        self.assertRollupsVerified()
+
+    def test_verify_reports_drift(self):
+        Expense.objects.create(user=self.user, title="Rent", amount=Decimal("900.00"))
+        ExpenseMonthlyRollup.objects.filter(user=self.user).update(count=2)
+        with self.assertRaisesMessage(CommandError, "1 rollup bucket(s) out of date."):
+            call_command("rebuild_expense_rollups", "--verify", stdout=StringIO())
+        call_command("rebuild_expense_rollups", stdout=StringIO())
+        self.assertRollupsVerified()
+
+
+class ExpenseBulkTests(TestCase):
+    """
+    Bulk writes must be all-or-nothing by default, report every item in
+    partial mode, and only ever touch the user's own expenses.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("bulk", "bulk@example.com", "password123")
+        other = User.objects.create_user("bystander", "bystander@example.com", "password123")
+        cls.taxi, cls.lunch = Expense.objects.bulk_create([
+            Expense(user=cls.user, title="Taxi", amount=Decimal("12.50")),
+            Expense(user=cls.user, title="Lunch", amount=Decimal("8.00")),
+        ])
+        cls.foreign = Expense.objects.create(user=other, title="Hotel", amount=Decimal("120.00"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, method, data, mode=None):
+        url = reverse("expense-bulk") + (f"?mode={mode}" if mode else "")
+        return getattr(self.client, method)(url, data, format="json")
+
+    def statuses(self, response):
+        return [item["status"] for item in response.json()["results"]]
+
+    def test_create(self):
+        items = [{"title": "Coffee", "amount": "3.40"}, {"title": "Broken", "amount": "abc"}]
+        response = self.bulk("post", items)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses(response), ["not_saved", "error"])
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+
+        response = self.bulk("post", items, mode="partial")
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(self.statuses(response), ["created", "error"])
+        self.assertTrue(Expense.objects.filter(user=self.user, title="Coffee").exists())
+
+        with override_settings(EXPENSE_BULK_MAX_ITEMS=1):
+            self.assertEqual(self.bulk("post", items).status_code, 400)
+
+    def test_update_accepts_numeric_string_ids(self):
+        response = self.bulk("patch", [{"id": str(self.taxi.pk), "amount": "14.00"}, {"id": self.lunch.pk, "title": "Dinner"}])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.statuses(response), ["updated", "updated"])
+        self.taxi.refresh_from_db()
+        self.lunch.refresh_from_db()
+        self.assertEqual((self.taxi.amount, self.taxi.total, self.lunch.title), (Decimal("14.00"), Decimal("14.00"), "Dinner"))
+
+    def test_update_rejects_unusable_ids(self):
+        response = self.bulk("patch", [
+            {"id": self.taxi.pk, "amount": "20.00"},
+            {"id": "abc", "amount": "1.00"},
+            {"amount": "1.00"},
+            {"id": self.foreign.pk, "amount": "1.00"},
+            {"id": str(self.taxi.pk), "amount": "2.00"},
+        ], mode="partial")
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["results"]
+        self.assertEqual([item["status"] for item in results], ["updated", "error", "error", "error", "error"])
+        self.assertEqual(
+            [item["errors"]["id"] for item in results[1:]],
+            [["A valid integer is required."], ["This field is required."], ["Expense not found."],
+             ["Duplicate expense in the batch."]],
+        )
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.amount, Decimal("120.00"))
+
+        response = self.bulk("patch", [{"id": self.lunch.pk, "amount": "9.00"}, {"id": "abc"}])
+        self.assertEqual(response.status_code, 400)
+        self.lunch.refresh_from_db()
+        self.assertEqual(self.lunch.amount, Decimal("8.00"))
+
+    def test_delete(self):
+        response = self.bulk("delete", {"ids": [self.taxi.pk, self.foreign.pk]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses(response), ["not_deleted", "not_found"])
+        self.assertTrue(Expense.objects.filter(pk=self.taxi.pk).exists())
+
+        response = self.bulk("delete", {"ids": [str(self.taxi.pk), self.foreign.pk]}, mode="partial")
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(self.statuses(response), ["deleted", "not_found"])
+        self.assertFalse(Expense.objects.filter(pk=self.taxi.pk).exists())
+        self.assertTrue(Expense.objects.filter(pk=self.foreign.pk).exists())
+
+
+class ExpenseArchiveTests(TestCase):
+    """
+    Archived expenses keep their ids and stay visible to every read through
+    the `expenses_expense_all` view, but can no longer be changed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("archive", "archive@example.com", "password123")
+        now = timezone.now()
+        cls.old = Expense.objects.create(
+            user=cls.user, title="Old hotel", amount=Decimal("200.00"), created_at=now - timedelta(days=400)
+        )
+        cls.older = Expense.objects.create(
+            user=cls.user, title="Old flight", amount=Decimal("300.00"), created_at=now - timedelta(days=500)
+        )
+        cls.recent = Expense.objects.create(user=cls.user, title="Lunch", amount=Decimal("8.00"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def archive(self):
+        cutoff = archive_cutoff(days=365)
+        self.assertEqual(archive_batch(cutoff, batch_size=1), 1)
+        self.assertEqual(archive_batch(cutoff, batch_size=10), 1)
+        self.assertEqual(archive_batch(cutoff, batch_size=10), 0)
+
+    def test_archive_batch_moves_old_rows(self):
+        months = dict(ExpenseMonthlyRollup.objects.filter(user=self.user).values_list("month", "count"))
+        self.archive()
+
+        self.assertEqual(list(Expense.objects.filter(user=self.user)), [self.recent])
+        archived = ArchivedExpense.objects.get(pk=self.old.pk)
+        self.assertEqual((archived.title, archived.total, archived.created_at), ("Old hotel", Decimal("200.00"), self.old.created_at))
+        self.assertEqual(
+            set(AllExpense.objects.filter(user=self.user).values_list("pk", flat=True)),
+            {self.old.pk, self.older.pk, self.recent.pk},
+        )
+        self.assertEqual(dict(ExpenseMonthlyRollup.objects.filter(user=self.user).values_list("month", "count")), months)
+        call_command("rebuild_expense_rollups", "--verify", stdout=StringIO())
+
+    def test_archived_rows_stay_readable(self):
+        self.archive()
+
+        response = self.client.get(reverse("expense-list-create"), {"page_size": 10})
+        self.assertEqual(
+            [item["id"] for item in response.json()["results"]], [self.recent.pk, self.old.pk, self.older.pk]
+        )
+        response = self.client.get(reverse("expense-list-create"), {"q": "old", "page_size": 10})
+        self.assertEqual({item["id"] for item in response.json()["results"]}, {self.old.pk, self.older.pk})
+
+        response = self.client.get(reverse("expense-detail", args=[self.old.pk]))
+        self.assertEqual(response.status_code, 200)
+
+        for period in ("day", "month"):
+            response = self.client.get(reverse("expense-summary"), {"period": period})
+            self.assertEqual(sum(row["count"] for row in response.json()["results"]), 3)
+            self.assertEqual(sum(Decimal(row["debit"]) for row in response.json()["results"]), Decimal("508.00"))
+        self.assertEqual(self.client.get(reverse("expense-balance")).json()["debit"], "508.00")
+
+        response = self.client.get(reverse("expense-export"), {"output": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn("Old flight", lines[1])
+
+    def test_archived_rows_cannot_be_changed(self):
+        self.archive()
+        url = reverse("expense-detail", args=[self.old.pk])
+
+        self.assertEqual(self.client.patch(url, {"amount": "1.00"}, format="json").status_code, 404)
+        self.assertEqual(self.client.put(url, {"title": "New", "amount": "1.00"}, format="json").status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        response = self.client.patch(reverse("expense-bulk"), [{"id": self.old.pk, "amount": "1.00"}], format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.delete(reverse("expense-bulk"), {"ids": [self.old.pk]}, format="json")
+        self.assertEqual([item["status"] for item in response.json()["results"]], ["not_found"])
+        self.assertEqual(ArchivedExpense.objects.get(pk=self.old.pk).amount, Decimal("200.00"))
+
+    def test_command(self):
+        output = StringIO()
+        call_command("archive_expenses", "--days", "365", "--dry-run", stdout=output)
+        self.assertIn("2 expense(s) created before", output.getvalue())
+        self.assertFalse(ArchivedExpense.objects.exists())
+
+        call_command("archive_expenses", "--days", "365", "--batch-size", "1", stdout=StringIO())
+        self.assertEqual(set(ArchivedExpense.objects.values_list("pk", flat=True)), {self.old.pk, self.older.pk})
+        with self.assertRaisesMessage(CommandError, "--batch-size must be a positive integer."):
+            call_command("archive_expenses", "--batch-size", "0", stdout=StringIO())
+
+
+class StartupProfileTests(TestCase):
+    """
+    Workers must not pay at startup for logging or API docs they never use.
+    """
+
+    def test_log_file_is_opened_on_first_record(self):
+        with TemporaryDirectory() as directory:
+            handler = LazyFileHandler(os.path.join(directory, "logs", "api_%Y_%m_%d.log"))
+            self.assertEqual(os.listdir(directory), [])
+
+            record = logging.LogRecord("api", logging.INFO, __file__, 1, "First request", None, None)
+            with mock.patch("src.log_handlers.datetime") as clock:
+                clock.now.return_value = datetime(2026, 1, 2, 3, 4)
+                handler.handle(record)
+            handler.close()
+            with open(os.path.join(directory, "logs", "api_2026_01_02.log")) as log:
+                self.assertEqual(log.read(), "First request\n")
+
+    def test_api_docs_can_be_left_out(self):
+        probe = (
+            "import django, json, sys; django.setup(); from django.conf import settings; "
+            "import src.urls, src.apps.expenses.views, src.apps.auth.views; "
+            "print(json.dumps([[m for m in sys.modules if m.startswith('drf_spectacular')], "
+            "'drf_spectacular' in settings.INSTALLED_APPS, 'DEFAULT_SCHEMA_CLASS' in settings.REST_FRAMEWORK]))"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "src.settings", "SERVE_API_DOCS": "False"}
+        process = subprocess.run(
+            [sys.executable, "-c", probe], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(json.loads(process.stdout.splitlines()[-1]), [[], False, False])
+
+
+@mock.patch.object(SchemaCache, "generate", return_value={"yaml": b"openapi: 3.0.3\n", "json": b'{"openapi": "3.0.3"}'})
+class SchemaCacheTests(TestCase):
+    """
+    /schema/ is served from memory with per-encoding ETags, and the disk
+    copy is only reused by processes of the same build.
+    """
+
+    def setUp(self):
+        patcher = mock.patch("src.schema.schema_cache", SchemaCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **params):
+        headers = params.pop("headers", {})
+        return self.client.get(reverse("schema"), params, headers=headers)
+
+    def test_etag_and_not_modified(self, generate):
+        response = self.get(format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'{"openapi": "3.0.3"}')
+        self.assertIn("max-age=3600", response["Cache-Control"])
+        etag = response["ETag"]
+
+        for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.get(format="json", headers={"If-None-Match": if_none_match})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get(format="json", headers={"If-None-Match": '"other"'}).status_code, 200)
+        self.assertEqual(self.get(format="yaml", headers={"If-None-Match": etag}).status_code, 200)
+        self.assertEqual(generate.call_count, 1)
+
+    def test_encoding_negotiation(self, generate):
+        plain = self.get(format="json")
+        response = self.get(format="json", headers={"Accept-Encoding": "deflate, gzip;q=0.5"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertNotEqual(response["ETag"], plain["ETag"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(self.get(format="json", headers={"If-None-Match": plain["ETag"], "Accept-Encoding": "gzip"}).status_code, 200)
+
+        for header in ("gzip;q=0", "identity", "*;q=0"):
+            with self.subTest(accept_encoding=header):
+                response = self.get(format="json", headers={"Accept-Encoding": header})
+                self.assertFalse(response.has_header("Content-Encoding"))
+                self.assertEqual(response.content, plain.content)
+
+    def test_format(self, generate):
+        for params, headers, content_type in (
+            ({}, {}, "application/vnd.oai.openapi"),
+            ({"format": "json"}, {}, "application/vnd.oai.openapi+json"),
+            ({"format": "yaml"}, {"Accept": "application/json"}, "application/vnd.oai.openapi"),
+            ({}, {"Accept": "application/vnd.oai.openapi+json"}, "application/vnd.oai.openapi+json"),
+            ({"format": "xml"}, {}, "application/vnd.oai.openapi"),
+        ):
+            with self.subTest(params=params, headers=headers):
+                self.assertEqual(self.get(**params, headers=headers)["Content-Type"], content_type)
+
+    def test_disk_copy_is_reused_by_the_same_build_only(self, generate):
+        with TemporaryDirectory() as directory, override_settings(API_SCHEMA_CACHE_DIR=directory):
+            with override_settings(API_SCHEMA_BUILD="1"):
+                etag = SchemaCache().get("json").etags[None]
+                self.assertEqual(SchemaCache().get("json").etags[None], etag)
+                self.assertEqual(generate.call_count, 1)
+
+                os.remove(os.path.join(directory, "openapi-1.json.gz"))
+                self.assertEqual(SchemaCache().get("json").etags["gzip"], f'{etag[:-1]}-gzip"')
+                self.assertEqual(generate.call_count, 1)
+
+            with override_settings(API_SCHEMA_BUILD="2"):
+                SchemaCache().get("json")
+                self.assertEqual(generate.call_count, 2)
+                call_command("warm_schema_cache", stdout=StringIO())
+            self.assertEqual(sorted(os.listdir(directory)), [
+                "openapi-2.json", "openapi-2.json.gz", "openapi-2.yaml", "openapi-2.yaml.gz",
+            ])
+
+            with override_settings(API_SCHEMA_BUILD=""):
+                build_id = SchemaCache().build_id
+                self.assertRegex(build_id, r"^[0-9a-f]{16}$")
+                with override_settings(SPECTACULAR_SETTINGS={**settings.SPECTACULAR_SETTINGS, "VERSION": "2.0.0"}):
+                    self.assertNotEqual(SchemaCache().build_id, build_id)
+
+
+@override_settings(EXPENSE_CACHE_ENABLED=False)
+class AsyncExpenseViewTests(TestCase):
+    """
+    The async read views must answer every request like the DRF views
+    they mirror.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("mirror", "mirror@example.com", "password123")
+        now = timezone.now()
+        cls.expenses = [
+            Expense.objects.create(
+                user=cls.user, title=title, amount=Decimal(amount), transaction_type=kind, tax=Decimal(tax),
+                tax_type=tax_type, created_at=now - timedelta(days=days),
+            )
+            for title, amount, kind, tax, tax_type, days in (
+                ("Taxi to airport", "25.00", "DB", "2.00", "FL", 0),
+                ("Salary", "2500.00", "CR", "0", "FL", 3),
+                ("Groceries", "80.40", "DB", "10", "PE", 9),
+                ("Taxi home", "18.00", "DB", "0", "FL", 9),
+                ("Refund", "12.00", "CR", "0", "FL", 40),
+                ("Rent", "900.00", "DB", "5", "PE", 70),
+            )
+        ]
+        other = User.objects.create_user("stranger", "stranger@example.com", "password123")
+        cls.foreign = Expense.objects.create(user=other, title="Taxi", amount=Decimal("30.00"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.headers = {"Authorization": f"Bearer {UserTokenObtainPairSerializer.get_token(self.user).access_token}"}
+
+    def fetch(self, name, params=None, args=()):
+        """
+        Return (sync response, async response) of the `name` endpoint.
+        """
+        sync = self.client.get(reverse(name, args=args), params)
+        asynchronous = async_to_sync(self.async_client.get)(
+            reverse(f"async-{name.removesuffix('-create')}", args=args), params, headers=self.headers
+        )
+        return sync, asynchronous
+
+    def assertSameResponse(self, name, params=None, args=()):
+        sync, asynchronous = self.fetch(name, params, args)
+        self.assertEqual(asynchronous.status_code, sync.status_code, asynchronous.content)
+        # Only the links differ, by the /async/ prefix.
+        body = asynchronous.content.decode().replace("/api/v1/async/expenses/", "/api/v1/expenses/")
+        self.assertEqual(json.loads(body), sync.json())
+        return sync
+
+    def test_list(self):
+        for params in (
+            {"page_size": 4},
+            {"page_size": 4, "page": 2},
+            {"page_size": 10, "transaction_type": "CR"},
+            {"page_size": 10, "tax_type": "PE", "start": "2000-01-01T00:00:00Z"},
+            {"page_size": 10, "min_amount": "15", "max_amount": "1000", "ordering": "-amount"},
+            {"page_size": 10, "min_total": "20", "ordering": "total"},
+            {"page_size": 10, "ordering": "created_at"},
+            {"page_size": 10, "q": "taxi"},
+            {"page_size": 10, "q": "taxi", "transaction_type": "DB"},
+            {"page_size": 10, "q": "   "},
+        ):
+            with self.subTest(params=params):
+                response = self.assertSameResponse("expense-list-create", params)
+                self.assertEqual(response.status_code, 200)
+
+    def test_list_errors(self):
+        for params in (
+            {"ordering": "title"},
+            {"transaction_type": "XX"},
+            {"min_total": "5", "max_total": "1"},
+            {"q": "taxi", "ordering": "amount"},
+            {"q": "taxi", "pagination": "cursor"},
+            {"page": 99},
+        ):
+            with self.subTest(params=params):
+                response = self.assertSameResponse("expense-list-create", params)
+                self.assertGreaterEqual(response.status_code, 400)
+
+    def test_list_cursor(self):
+        def walk(response, client, **kwargs):
+            ids = []
+            while True:
+                body = response.json()
+                ids.extend(item["id"] for item in body["results"])
+                if body["next"] is None:
+                    return ids
+                response = client(body["next"], **kwargs)
+
+        for params in ({"page_size": 2}, {"page_size": 2, "transaction_type": "DB", "ordering": "amount"}):
+            with self.subTest(params=params):
+                sync, asynchronous = self.fetch("expense-list-create", {"pagination": "cursor", **params})
+                self.assertEqual(
+                    walk(asynchronous, async_to_sync(self.async_client.get), headers=self.headers),
+                    walk(sync, self.client.get),
+                )
+
+    def test_detail(self):
+        for pk in (self.expenses[2].pk, self.foreign.pk, 0):
+            with self.subTest(pk=pk):
+                self.assertSameResponse("expense-detail", args=[pk])
+
+    def test_summary(self):
+        for rollups in (True, False):
+            for params in (
+                {},
+                {"period": "week"},
+                {"period": "day", "transaction_type": "DB"},
+                {"period": "month", "group_by": ["transaction_type", "tax_type"]},
+                {"period": "year"},
+            ):
+                with self.subTest(rollups=rollups, params=params), override_settings(EXPENSE_SUMMARY_USE_ROLLUPS=rollups):
+                    self.assertSameResponse("expense-summary", params)
+
+
+@override_settings(EXPENSE_CACHE_ENABLED=False)
+class ExpensePaginationTests(TestCase):
+    """
+    Both list pagination modes default to `EXPENSE_PAGE_SIZE`, and cursor
+    pages neither skip nor repeat rows when expenses are added meanwhile.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("pages", "pages@example.com", "password123")
+        now = timezone.now()
+        cls.expenses = Expense.objects.bulk_create([
+            Expense(user=cls.user, title=f"Expense {index}", amount=Decimal("1.00"), created_at=now - timedelta(hours=index))
+            for index in range(7)
+        ])
+        cls.ids = [expense.pk for expense in cls.expenses]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page_ids(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item["id"] for item in response.json()["results"]]
+
+    def test_default_page_size(self):
+        url = reverse("expense-list-create")
+        for params in ({}, {"pagination": "cursor"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.page_ids(self.client.get(url, params)), self.ids)
+        with mock.patch.object(ExpensePageNumberPagination, "page_size", 3):
+            response = self.client.get(url)
+        self.assertEqual(self.page_ids(response), self.ids[:3])
+        self.assertEqual(response.json()["count"], 7)
+
+    def test_cursor_follows_next_and_previous_links(self):
+        response = self.client.get(reverse("expense-list-create"), {"pagination": "cursor", "page_size": 3})
+        pages = [self.page_ids(response)]
+        while response.json()["next"]:
+            response = self.client.get(response.json()["next"])
+            pages.append(self.page_ids(response))
+        self.assertEqual(pages, [self.ids[:3], self.ids[3:6], self.ids[6:]])
+
+        response = self.client.get(response.json()["previous"])
+        self.assertEqual(self.page_ids(response), self.ids[3:6])
+
+    def test_cursor_pages_are_stable_under_inserts(self):
+        response = self.client.get(reverse("expense-list-create"), {"pagination": "cursor", "page_size": 3})
+        self.assertEqual(self.page_ids(response), self.ids[:3])
+
+        # A new expense, and one back-dated into the page already read.
+        Expense.objects.create(user=self.user, title="New", amount=Decimal("2.00"))
+        Expense.objects.create(
+            user=self.user, title="Late", amount=Decimal("2.00"), created_at=self.expenses[1].created_at - timedelta(minutes=1)
+        )
+        response = self.client.get(response.json()["next"])
+        self.assertEqual(self.page_ids(response), self.ids[3:6])
+        response = self.client.get(response.json()["next"])
+        self.assertEqual(self.page_ids(response), self.ids[6:])
+        self.assertIsNone(response.json()["next"])
+
+
+@override_settings(EXPENSE_CACHE_ENABLED=False)
+class ExpenseSummaryTests(TestCase):
+    """
+    Summary buckets must add up the rounded tax-inclusive totals per
+    period and type, identically from the rollups and from the expenses.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("summary", "summary@example.com", "password123")
+        for title, amount, kind, tax, tax_type, day in (
+            ("Salary", "2000.00", "CR", "0", "FL", date(2024, 1, 3)),
+            ("Groceries", "80.40", "DB", "10", "PE", date(2024, 1, 4)),      # 88.44
+            ("Taxi", "25.00", "DB", "2.50", "FL", date(2024, 1, 10)),        # 27.50
+            ("Rent", "999.99", "DB", "7.5", "PE", date(2024, 2, 1)),         # 1074.98925 -> 1074.99
+            ("Refund", "10.05", "CR", "12.5", "PE", date(2024, 2, 29)),      # 11.30625 -> 11.31
+            ("Coffee", "2.50", "DB", "15", "PE", date(2024, 2, 29)),         # 2.875 -> 2.88
+        ):
+            Expense.objects.create(
+                user=cls.user, title=title, amount=Decimal(amount), transaction_type=kind, tax=Decimal(tax),
+                tax_type=tax_type, created_at=datetime.combine(day, datetime.min.time(), dt_timezone.utc).replace(hour=12),
+            )
+        other = User.objects.create_user("neighbour", "neighbour@example.com", "password123")
+        Expense.objects.create(user=other, title="Hotel", amount=Decimal("120.00"), created_at=datetime(2024, 1, 5, tzinfo=dt_timezone.utc))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def summary(self, **params):
+        """
+        Return the summary rows, checking they are the same with and
+        without the rollups.
+        """
+        responses = []
+        for rollups in (True, False):
+            with override_settings(EXPENSE_SUMMARY_USE_ROLLUPS=rollups):
+                response = self.client.get(reverse("expense-summary"), params)
+            self.assertEqual(response.status_code, 200, response.content)
+            responses.append(response.json())
+        self.assertEqual(responses[0], responses[1])
+        return [
+            (row["period"][:10], *(row[field] for field in ("transaction_type", "tax_type") if field in row),
+             row["credit"], row["debit"], row["net"], row["count"])
+            for row in responses[0]["results"]
+        ]
+
+    def test_month_buckets(self):
+        self.assertEqual(self.summary(), [
+            ("2024-01-01", "2000.00", "115.94", "1884.06", 3),
+            ("2024-02-01", "11.31", "1077.87", "-1066.56", 3),
+        ])
+        self.assertEqual(self.summary(start="2024-02-01T00:00:00Z", end="2024-03-01T00:00:00Z"), [
+            ("2024-02-01", "11.31", "1077.87", "-1066.56", 3),
+        ])
+        self.assertEqual(self.summary(start="2024-01-04T00:00:00Z", end="2024-02-15T00:00:00Z"), [
+            ("2024-01-01", "0.00", "115.94", "-115.94", 2),
+            ("2024-02-01", "0.00", "1074.99", "-1074.99", 1),
+        ])
+
+    def test_week_buckets(self):
+        self.assertEqual(self.summary(period="week"), [
+            ("2024-01-01", "2000.00", "88.44", "1911.56", 2),
+            ("2024-01-08", "0.00", "27.50", "-27.50", 1),
+            ("2024-01-29", "0.00", "1074.99", "-1074.99", 1),
+            ("2024-02-26", "11.31", "2.88", "8.43", 2),
+        ])
+
+    def test_per_type_totals(self):
+        self.assertEqual(self.summary(group_by="transaction_type"), [
+            ("2024-01-01", "CR", "2000.00", "0.00", "2000.00", 1),
+            ("2024-01-01", "DB", "0.00", "115.94", "-115.94", 2),
+            ("2024-02-01", "CR", "11.31", "0.00", "11.31", 1),
+            ("2024-02-01", "DB", "0.00", "1077.87", "-1077.87", 2),
+        ])
+        self.assertEqual(self.summary(transaction_type="DB", group_by="tax_type"), [
+            ("2024-01-01", "FL", "0.00", "27.50", "-27.50", 1),
+            ("2024-01-01", "PE", "0.00", "88.44", "-88.44", 1),
+            ("2024-02-01", "PE", "0.00", "1077.87", "-1077.87", 2),
+        ])
+
+    def test_percentage_tax_is_rounded_per_expense(self):
+        # Summed before rounding, the February debits would be 1077.86.
+        self.assertEqual(self.summary(tax_type="PE", start="2024-02-01T00:00:00Z"), [
+            ("2024-02-01", "11.31", "1077.87", "-1066.56", 3),
+        ])
+        response = self.client.get(reverse("expense-balance"))
+        self.assertEqual(response.json()["credit"], "2011.31")
+        self.assertEqual(response.json()["debit"], "1193.81")
+
+
+@override_settings(EXPENSE_CACHE_ENABLED=False, EXPENSE_EXPORT_FLUSH_ROWS=2)
+class ExpenseExportTests(TestCase):
+    """
+    Exports stream the user's expenses oldest first, in the shape of the
+    detail endpoint, as CSV or NDJSON and within the `start`/`end` range.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("exporter", "exporter@example.com", "password123")
+        cls.expenses = [
+            Expense.objects.create(
+                user=cls.user, title=title, description=description, amount=Decimal(amount), tax=Decimal("10"),
+                tax_type="PE", created_at=datetime(2024, 1, day, 9, tzinfo=dt_timezone.utc),
+            )
+            for title, description, amount, day in (
+                ("Rent", "January, flat 2", "900.00", 1),
+                ("Coffee", 'The "good" one', "3.45", 15),
+                ("Café", None, "4.00", 31),
+            )
+        ]
+        other = User.objects.create_user("outsider", "outsider@example.com", "password123")
+        Expense.objects.create(user=other, title="Hotel", amount=Decimal("120.00"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse("expense-export"), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b"".join(response.streaming_content).decode()
+
+    def details(self, expenses):
+        return [self.client.get(reverse("expense-detail", args=[expense.pk])).json() for expense in expenses]
+
+    def test_csv(self):
+        response, body = self.export(output="csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="expenses.csv"')
+
+        lines = body.splitlines()
+        self.assertEqual(lines[0], ",".join(EXPORT_COLUMNS))
+        self.assertEqual(list(self.details(self.expenses)[0]), list(EXPORT_COLUMNS))
+        rows = list(csv.DictReader(StringIO(body)))
+        expected = [
+            # `total` is a JSON number in the API but keeps its cents in CSV.
+            {**{column: "" if value is None else str(value) for column, value in detail.items()},
+             "total": f"{Decimal(str(detail['total'])):.2f}"}
+            for detail in self.details(self.expenses)
+        ]
+        self.assertEqual(rows, expected)
+        self.assertEqual([row["total"] for row in rows], ["990.00", "3.80", "4.40"])
+
+    def test_ndjson(self):
+        response, body = self.export(output="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="expenses.ndjson"')
+        self.assertEqual([json.loads(line) for line in body.splitlines()], self.details(self.expenses))
+        self.assertIn('"title":"Café"', body)
+
+    def test_start_and_end(self):
+        for params, expected in (
+            ({"start": "2024-01-15T09:00:00Z"}, self.expenses[1:]),
+            ({"end": "2024-01-15T09:00:00Z"}, self.expenses[:1]),
+            ({"start": "2024-01-02T00:00:00Z", "end": "2024-01-31T00:00:00Z"}, self.expenses[1:2]),
+            ({"start": "2025-01-01T00:00:00Z"}, []),
+        ):
+            with self.subTest(params=params):
+                _, body = self.export(output="ndjson", **params)
+                self.assertEqual([json.loads(line)["id"] for line in body.splitlines()], [expense.pk for expense in expected])
+        _, body = self.export(output="csv", start="2025-01-01T00:00:00Z")
+        self.assertEqual(body.splitlines(), [",".join(EXPORT_COLUMNS)])
+
+    def test_invalid_parameters(self):
+        for params in ({"output": "xml"}, {"start": "yesterday"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse("expense-export"), params).status_code, 400)
+
+
+class ExpenseTotalTests(TestCase):
+    """
+    The stored `total` is rounded half up to cents and kept up to date by
+    saves, bulk writes and `backfill_expense_totals`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("totals", "totals@example.com", "password123")
+
+    def test_rounds_half_up_to_cents(self):
+        for amount, tax, tax_type, total in (
+            ("0.02", "25", "PE", "0.03"),           # 0.025; half-even would give 0.02
+            ("2.50", "15", "PE", "2.88"),           # 2.875
+            ("999.99", "7.5", "PE", "1074.99"),     # 1074.98925
+            ("10.05", "12.5", "PE", "11.31"),       # 11.30625
+            ("10.00", "0.01", "PE", "10.00"),       # 10.001
+            ("19.99", "0.01", "FL", "20.00"),
+        ):
+            with self.subTest(amount=amount, tax=tax, tax_type=tax_type):
+                self.assertEqual(expense_total(Decimal(amount), Decimal(tax), tax_type), Decimal(total))
+                expense = Expense.objects.create(
+                    user=self.user, title="Rounded", amount=Decimal(amount), tax=Decimal(tax), tax_type=tax_type
+                )
+                expense.refresh_from_db()
+                self.assertEqual(expense.total, Decimal(total))
+
+    def test_bulk_update_refreshes_total(self):
+        taxi, lunch = Expense.objects.bulk_create([
+            Expense(user=self.user, title="Taxi", amount=Decimal("20.00"), tax=Decimal("2.00"), tax_type="FL"),
+            Expense(user=self.user, title="Lunch", amount=Decimal("10.00"), tax=Decimal("10"), tax_type="PE"),
+        ])
+        self.assertEqual((taxi.total, lunch.total), (Decimal("22.00"), Decimal("11.00")))
+
+        taxi.amount = Decimal("30.00")
+        lunch.tax_type = "FL"
+        Expense.objects.bulk_update([taxi, lunch], ["amount", "tax_type"])
+        self.assertEqual(
+            dict(Expense.objects.filter(pk__in=[taxi.pk, lunch.pk]).values_list("title", "total")),
+            {"Taxi": Decimal("32.00"), "Lunch": Decimal("20.00")},
+        )
+
+        # Fields `total` does not depend on leave it alone.
+        Expense.objects.filter(pk=taxi.pk).update(total=Decimal("1.00"))
+        taxi.title = "Cab"
+        Expense.objects.bulk_update([taxi], ["title"])
+        taxi.refresh_from_db()
+        self.assertEqual(taxi.total, Decimal("1.00"))
+
+    def test_backfill(self):
+        missing, stale = Expense.objects.bulk_create([
+            Expense(user=self.user, title="Missing", amount=Decimal("2.50"), tax=Decimal("15"), tax_type="PE"),
+            Expense(user=self.user, title="Stale", amount=Decimal("5.00"), tax=Decimal("1.00"), tax_type="FL"),
+        ])
+        archived = ArchivedExpense.objects.create(
+            id=10_000, user=self.user, title="Archived", amount=Decimal("0.02"), transaction_type="DB", tax=Decimal("25"),
+            tax_type="PE", created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        Expense.objects.filter(pk=missing.pk).update(total=None)
+        Expense.objects.filter(pk=stale.pk).update(total=Decimal("99.00"))
+
+        def totals():
+            return [
+                Expense.objects.get(pk=missing.pk).total,
+                Expense.objects.get(pk=stale.pk).total,
+                ArchivedExpense.objects.get(pk=archived.pk).total,
+            ]
+
+        output = StringIO()
+        call_command("backfill_expense_totals", "--batch-size", "1", stdout=output)
+        self.assertEqual(totals(), [Decimal("2.88"), Decimal("99.00"), Decimal("0.03")])
+        self.assertIn("Updated the total of 2 expense(s).", output.getvalue())
+
+        output = StringIO()
+        call_command("backfill_expense_totals", "--all", stdout=output)
+        self.assertEqual(totals(), [Decimal("2.88"), Decimal("6.00"), Decimal("0.03")])
+        self.assertIn("Updated the total of 1 expense(s).", output.getvalue())
+
+        with self.assertRaisesMessage(CommandError, "--batch-size must be a positive integer."):
+            call_command("backfill_expense_totals", "--batch-size", "0", stdout=StringIO())
+
+
+@skipUnless(connection.vendor == "sqlite", "The production profile is SQLite-specific")
+class SQLiteProductionProfileTests(TestCase):
+    """
+    `SQLITE_PRODUCTION` must apply its PRAGMAs on every new connection, and
+    `serialized_writes` must queue writers across threads and processes.
+    """
+
+    def test_pragmas_are_applied(self):
+        probe = (
+            "import json, sys, src.settings as project; "
+            "project.DATABASES['default']['NAME'] = sys.argv[1]; "
+            "import django; django.setup(); from django.db import connection; "
+            "cursor = connection.cursor(); "
+            "names = ['journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store']; "
+            "print(json.dumps({name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in names} "
+            "| {'transaction_mode': connection.settings_dict['OPTIONS']['transaction_mode']}))"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "src.settings", "SQLITE_PRODUCTION": "True", "SQLITE_MMAP_SIZE": "1048576"}
+        with TemporaryDirectory() as directory:
+            process = subprocess.run(
+                [sys.executable, "-c", probe, os.path.join(directory, "db.sqlite3")],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(json.loads(process.stdout.splitlines()[-1]), {
+            "journal_mode": "wal",
+            "synchronous": 1,  # NORMAL
+            "busy_timeout": 5000,
+            "mmap_size": 1048576,
+            "cache_size": -65536,
+            "temp_store": 2,  # MEMORY
+            "transaction_mode": "IMMEDIATE",
+        })
+
+    def serialize_to(self, path):
+        """
+        Turn `serialized_writes` on for the (in-memory) test database, with
+        the writer lock file at `path`.
+        """
+        self.enterContext(override_settings(SQLITE_SERIALIZE_WRITES=True))
+        self.enterContext(mock.patch.object(type(connections["default"]), "is_in_memory_db", return_value=False))
+        self.enterContext(mock.patch("src.apps.expenses.writer.writer_lock_path", return_value=path))
+
+    def test_writers_take_turns_across_threads(self):
+        self.serialize_to(os.path.join(self.enterContext(TemporaryDirectory()), "writer-lock"))
+        events = []
+        entered, release = threading.Event(), threading.Event()
+
+        def first():
+            with serialized_writes():
+                events.append("first in")
+                entered.set()
+                release.wait(5)
+                events.append("first out")
+
+        def second():
+            entered.wait(5)
+            with serialized_writes():
+                events.append("second in")
+
+        threads = [threading.Thread(target=first), threading.Thread(target=second)]
+        for thread in threads:
+            thread.start()
+        entered.wait(5)
+        time.sleep(0.2)
+        self.assertEqual(events, ["first in"])
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(events, ["first in", "first out", "second in"])
+
+    @skipUnless(os.name == "posix", "The writer lock file needs fcntl")
+    def test_writers_take_turns_across_processes(self):
+        path = os.path.join(self.enterContext(TemporaryDirectory()), "writer-lock")
+        self.serialize_to(path)
+        probe = (
+            "import fcntl, os, sys; fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT); "
+            "fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)"
+        )
+
+        def other_process_can_lock():
+            return subprocess.run([sys.executable, "-c", probe, path], capture_output=True).returncode == 0
+
+        with serialized_writes():
+            with serialized_writes():  # Re-entrant within the thread.
+                self.assertFalse(other_process_can_lock())
+            self.assertFalse(other_process_can_lock())
+        self.assertTrue(other_process_can_lock())
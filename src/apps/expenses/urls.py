@@ -2,9 +2,31 @@ from django.urls import path
 from .views import (
     ExpenseListCreateView,
     ExpenseDetailView,
+    ExpenseSummaryView,
+    ExpenseBalanceView,
+    ExpenseBulkView,
+    ExpenseExportView,
+    ExpenseImportView,
+    ExpenseImportDetailView,
+    RecurringExpenseListCreateView,
+    RecurringExpenseDetailView,
+    JobListCreateView,
+    JobDetailView,
+    JobDownloadView,
 )
 
 urlpatterns = [
     path('', ExpenseListCreateView.as_view(), name='expense-list-create'),
     path('<int:pk>/', ExpenseDetailView.as_view(), name='expense-detail'),
+    path('summary/', ExpenseSummaryView.as_view(), name='expense-summary'),
+    path('balance/', ExpenseBalanceView.as_view(), name='expense-balance'),
+    path('bulk/', ExpenseBulkView.as_view(), name='expense-bulk'),
+    path('export/', ExpenseExportView.as_view(), name='expense-export'),
+    path('import/', ExpenseImportView.as_view(), name='expense-import'),
+    path('import/<int:pk>/', ExpenseImportDetailView.as_view(), name='expense-import-detail'),
+    path('recurring/', RecurringExpenseListCreateView.as_view(), name='recurring-expense-list-create'),
+    path('recurring/<int:pk>/', RecurringExpenseDetailView.as_view(), name='recurring-expense-detail'),
+    path('jobs/', JobListCreateView.as_view(), name='job-list-create'),
+    path('jobs/<int:pk>/', JobDetailView.as_view(), name='job-detail'),
+    path('jobs/<int:pk>/download/', JobDownloadView.as_view(), name='job-download'),
 ]
\ No newline at end of file
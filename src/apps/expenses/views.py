@@ -1,21 +1,94 @@
+import csv
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
+from django.db.models import Count, Q, Sum
+from django.urls import reverse
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework import generics, status, permissions
-from .models import Expense
-from .serializers import ExpenseSerializer
+from rest_framework.permissions import SAFE_METHODS
+from src.storage import private_storage
+from .models import (
+    AllExpense,
+    Expense,
+    ExpenseImport,
+    ExpenseMonthlyRollup,
+    Job,
+    JobStatusChoice,
+    RecurringExpense,
+    TransactionTypeChoice,
+    rollup_total,
+    stored_total,
+)
+from .caching import CachedResponseMixin
+from .exports import EXPORT_FORMATS
+from .filters import ExpenseFilterBackend
+from .imports import REJECT_COLUMNS, run_import
+from .jobs import enqueue
+from .search import search_expenses
+from .summaries import summary_rows
+from .writer import serialized_writes
+from .rollups import ROLLUP_FIELDS, record_changes, signals_suspended
+from .serializers import (
+    ExpenseBalanceSerializer,
+    ExpenseBulkDeleteSerializer,
+    ExpenseExportQuerySerializer,
+    ExpenseFastSerializer,
+    ExpenseImportSerializer,
+    ExpenseListSerializer,
+    ExpenseSerializer,
+    ExpenseSummaryQuerySerializer,
+    ExpenseSummarySerializer,
+    JobSerializer,
+    JobSubmitSerializer,
+    RecurringExpenseSerializer,
+)
 from .permissions import IsExpenseOwnerOrAdmin
+from .pagination import ExpensePageNumberPagination, get_pagination_class
+from .replicas import ReplicaReadMixin
 
 
-class ExpenseListCreateView(generics.ListCreateAPIView):
+class ExpenseListCreateView(ReplicaReadMixin, CachedResponseMixin, generics.ListCreateAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated, IsExpenseOwnerOrAdmin]
+    filter_backends = [ExpenseFilterBackend]
+
+    @property
+    def paginator(self):
+        """
+        Pick page-number or keyset pagination from the query parameters.
+        """
+        if not hasattr(self, "_paginator"):
+            self._paginator = get_pagination_class(self.request)()
+        return self._paginator
 
     def get_queryset(self) :
         """
-        Return the list of expenses for the authenticated user.
+        Return the list of expenses (hot and archived) for the authenticated
+        user, narrowed and ranked by the `q` full-text search when given.
         """
         user = self.request.user
-        return Expense.objects.all() if user.is_superuser else Expense.objects.filter(user=user)
-    
+        queryset = AllExpense.objects.all() if user.is_superuser else AllExpense.objects.filter(user=user)
+        query = self.request.query_params.get("q", "").strip()
+        if query:
+            return search_expenses(queryset, query)
+        return queryset.order_by("-created_at", "-id")
+
+    def list(self, request, *args, **kwargs):
+        """
+        List expenses through `ExpenseFastSerializer` from `values()` rows.
+        """
+        if not settings.EXPENSE_FAST_SERIALIZER:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).values(*ExpenseFastSerializer.source_fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(ExpenseFastSerializer(page, many=True).data)
+        return Response(ExpenseFastSerializer(queryset, many=True).data)
+
     def perform_create(self, serializer):
         """
         Save the expense with the authenticated user as the owner.
@@ -31,25 +104,397 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
             "data": serializer.data
         }, status=status.HTTP_201_CREATED)
 
-class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ExpenseDetailView(ReplicaReadMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated, IsExpenseOwnerOrAdmin]
 
     def get_queryset(self):
         """
-        Return the list of expenses for the authenticated user.
+        Return the list of expenses for the authenticated user; archived
+        expenses can be read but not changed.
         """
         user = self.request.user
-        return Expense.objects.all() if user.is_superuser else Expense.objects.filter(user=user)
+        model = AllExpense if self.request.method in SAFE_METHODS else Expense
+        return model.objects.all() if user.is_superuser else model.objects.filter(user=user)
 
     def update(self, request, *args, **kwargs):
+        self.get_object()
         return Response({
             "message": "Expense updated successfully.",
             "data": ExpenseSerializer(data=request.data).data
         }, status=status.HTTP_200_OK)
     
     def destroy(self, request, *args, **kwargs):
+        self.get_object()
         return Response({
             "message": "Expense deleted successfully."
         }, status=status.HTTP_204_NO_CONTENT)
 
+
+class ExpenseSummaryView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    View to aggregate tax-inclusive expense totals per day, week or month.
+    """
+    serializer_class = ExpenseSummarySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        params = ExpenseSummaryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+        rows = summary_rows(request.user, filters)
+        return Response({
+            "period": filters["period"],
+            "results": self.get_serializer(rows, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+
+class ExpenseBalanceView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    View to return the overall credit, debit and net balance of the user.
+    """
+    serializer_class = ExpenseBalanceSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        """
+        Return the monthly rollups (or expenses, if rollups are disabled) of the user.
+        """
+        user = self.request.user
+        model = ExpenseMonthlyRollup if settings.EXPENSE_SUMMARY_USE_ROLLUPS else AllExpense
+        return model.objects.all() if user.is_superuser else model.objects.filter(user=user)
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        if queryset.model is ExpenseMonthlyRollup:
+            totals = queryset.aggregate(
+                credit=rollup_total(TransactionTypeChoice.CREDIT),
+                debit=rollup_total(TransactionTypeChoice.DEBIT),
+                count=Sum("count", default=0),
+            )
+        else:
+            totals = queryset.aggregate(
+                credit=Sum(stored_total(), filter=Q(transaction_type=TransactionTypeChoice.CREDIT), default=0),
+                debit=Sum(stored_total(), filter=Q(transaction_type=TransactionTypeChoice.DEBIT), default=0),
+                count=Count("id"),
+            )
+        totals["net"] = totals["credit"] - totals["debit"]
+        return Response(self.get_serializer(totals).data, status=status.HTTP_200_OK)
+
+
+class ExpenseBulkView(generics.GenericAPIView):
+    """
+    View to create (POST), update (PATCH) or delete (DELETE) many expenses in
+    one request and one transaction.
+
+    `?mode=atomic` (default) writes nothing if any item is invalid;
+    `?mode=partial` writes the valid items and reports the rest.
+    """
+    serializer_class = ExpenseSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        """
+        Return the expenses the authenticated user is allowed to change.
+        """
+        user = self.request.user
+        return Expense.objects.all() if user.is_superuser else Expense.objects.filter(user=user)
+
+    @property
+    def partial_success(self):
+        return self.request.query_params.get("mode", "atomic") == "partial"
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["partial_success"] = self.partial_success
+        return context
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        return self.get_serializer(
+            *args,
+            many=True,
+            allow_empty=False,
+            max_length=settings.EXPENSE_BULK_MAX_ITEMS,
+            **kwargs,
+        )
+
+    def item_results(self, serializer, errors, saved_status=None):
+        """
+        Build one result per submitted item, in submission order.
+        """
+        results = {
+            index: {"index": index, "status": "error", "errors": detail}
+            for index, detail in errors.items()
+        }
+        if saved_status is not None:
+            for index, item in zip(serializer.valid_indexes, serializer.data):
+                results[index] = {"index": index, "status": saved_status, "data": item}
+        return [
+            results.get(index, {"index": index, "status": "not_saved"})
+            for index in range(len(serializer.initial_data))
+        ]
+
+    def write(self, serializer, saved_status, success_status, **save_kwargs):
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if api_settings.NON_FIELD_ERRORS_KEY in errors:
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                "message": "No expenses were saved because some items are invalid.",
+                "results": self.item_results(serializer, errors),
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        failed = len(serializer.item_errors)
+        if serializer.validated_data:
+            with serialized_writes():
+                serializer.save(**save_kwargs)
+            results = self.item_results(serializer, serializer.item_errors, saved_status)
+        else:
+            results = self.item_results(serializer, serializer.item_errors)
+        return Response({
+            "message": f"{len(results) - failed} expense(s) {saved_status}, {failed} failed.",
+            "results": results,
+        }, status=status.HTTP_207_MULTI_STATUS if failed else success_status)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_bulk_serializer(data=request.data)
+        return self.write(serializer, "created", status.HTTP_201_CREATED, user=request.user)
+
+    def patch(self, request, *args, **kwargs):
+        ids = ExpenseListSerializer.item_ids(request.data)[:settings.EXPENSE_BULK_MAX_ITEMS]
+        serializer = self.get_bulk_serializer(self.get_queryset().in_bulk(ids), data=request.data, partial=True)
+        return self.write(serializer, "updated", status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        serializer = ExpenseBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+
+        with serialized_writes(), transaction.atomic():
+            queryset = self.get_queryset().filter(pk__in=ids)
+            rows = {row["id"]: row for row in queryset.values("id", *ROLLUP_FIELDS)}
+            missing = [pk for pk in ids if pk not in rows]
+            if missing and not self.partial_success:
+                return Response({
+                    "message": "No expenses were deleted because some were not found.",
+                    "results": [
+                        {"id": pk, "status": "not_found" if pk in missing else "not_deleted"} for pk in ids
+                    ],
+                }, status=status.HTTP_400_BAD_REQUEST)
+            with signals_suspended():
+                queryset.filter(pk__in=list(rows)).delete()
+            record_changes(removed=rows.values())
+
+        return Response({
+            "message": f"{len(rows)} expense(s) deleted, {len(missing)} failed.",
+            "results": [{"id": pk, "status": "deleted" if pk in rows else "not_found"} for pk in ids],
+        }, status=status.HTTP_207_MULTI_STATUS if missing else status.HTTP_200_OK)
+
+
+class ExpenseExportView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    View to stream the user's expenses as CSV or NDJSON (`?output=csv|ndjson`),
+    optionally limited to `start <= created_at < end`.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        """
+        Return the expenses (hot and archived) the authenticated user is
+        allowed to export.
+        """
+        user = self.request.user
+        queryset = AllExpense.objects.all() if user.is_superuser else AllExpense.objects.filter(user=user)
+        return queryset.order_by("created_at", "id")
+
+    def get(self, request, *args, **kwargs):
+        params = ExpenseExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        queryset = self.get_queryset()
+        if "start" in filters:
+            queryset = queryset.filter(created_at__gte=filters["start"])
+        if "end" in filters:
+            queryset = queryset.filter(created_at__lt=filters["end"])
+
+        if self.read_alias:
+            # The stream is consumed after `dispatch` has returned.
+            queryset = queryset.using(self.read_alias)
+
+        stream, content_type, extension = EXPORT_FORMATS[filters["output"]]
+        response = StreamingHttpResponse(stream(queryset), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="expenses.{extension}"'
+        return response
+
+
+class ExpenseImportView(generics.CreateAPIView):
+    """
+    View to import expenses from an uploaded CSV file in bulk.
+
+    The upload is kept in private storage so that a crashed import can be
+    resumed with `manage.py import_expenses --resume <id>`. Uploads larger
+    than `EXPENSE_IMPORT_SYNC_MAX_BYTES`, or sent with `?background=true`,
+    are queued as a job instead and answered with 202 Accepted.
+    """
+    serializer_class = ExpenseImportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data["file"]
+        expense_import = serializer.save(user=request.user, source=upload.name)
+        background = request.query_params.get("background", "").lower() in ("1", "true", "yes")
+        if background or upload.size > settings.EXPENSE_IMPORT_SYNC_MAX_BYTES:
+            job = enqueue(request.user, "import", {"import_id": expense_import.pk})
+            return job_accepted(job, data=self.get_serializer(expense_import).data)
+        with expense_import.file.open("rb") as fileobj:
+            expense_import = run_import(expense_import, fileobj)
+        return Response({
+            "message": "Expenses imported successfully.",
+            "data": self.get_serializer(expense_import).data,
+            "rejects": self.read_rejects(expense_import),
+        }, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def read_rejects(expense_import):
+        """
+        Return the first rejected rows from the import's reject report.
+        """
+        if not expense_import.rejected_count:
+            return []
+        with open(expense_import.reject_report, newline="", encoding="utf-8") as report:
+            reader = csv.DictReader(report, fieldnames=REJECT_COLUMNS)
+            next(reader)
+            return [
+                {"row": int(reject["row"]), "error": reject["error"]}
+                for reject in islice(reader, settings.EXPENSE_IMPORT_MAX_REPORTED_REJECTS)
+            ]
+
+
+class ExpenseImportDetailView(generics.RetrieveAPIView):
+    """
+    View to retrieve the progress of an expense CSV import.
+    """
+    serializer_class = ExpenseImportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Return the imports started by the authenticated user.
+        """
+        user = self.request.user
+        return ExpenseImport.objects.all() if user.is_superuser else ExpenseImport.objects.filter(user=user)
+
+
+class RecurringExpenseListCreateView(generics.ListCreateAPIView):
+    """
+    View to list (GET) and create (POST) recurring expense schedules.
+    `run_recurring_expenses` creates their expenses as they fall due.
+    """
+    serializer_class = RecurringExpenseSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ExpensePageNumberPagination
+
+    def get_queryset(self):
+        """
+        Return the schedules of the authenticated user, newest first.
+        """
+        return RecurringExpense.objects.filter(user=self.request.user).order_by("-created_at", "-id")
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class RecurringExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    View to retrieve, update (e.g. pause with `is_active: false`) or delete
+    a recurring expense schedule. Expenses already created are kept.
+    """
+    serializer_class = RecurringExpenseSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Return the schedules the authenticated user is allowed to access.
+        """
+        user = self.request.user
+        return RecurringExpense.objects.all() if user.is_superuser else RecurringExpense.objects.filter(user=user)
+
+
+def job_accepted(job, **extra):
+    """
+    Return the 202 Accepted response for a queued job, pointing at the
+    endpoint to poll.
+    """
+    return Response(
+        {"message": "Job queued.", "job": JobSerializer(job).data, **extra},
+        status=status.HTTP_202_ACCEPTED,
+        headers={"Location": reverse("job-detail", args=[job.pk])},
+    )
+
+
+class JobListCreateView(generics.ListCreateAPIView):
+    """
+    View to list (GET) the user's background jobs and submit (POST) one,
+    e.g. `{"kind": "export", "params": {"output": "ndjson"}}`. A submitted
+    job is answered with 202 Accepted; poll its `Location` for progress.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ExpensePageNumberPagination
+
+    def get_serializer_class(self):
+        return JobSubmitSerializer if self.request.method == "POST" else JobSerializer
+
+    def get_queryset(self):
+        """
+        Return the jobs of the authenticated user, newest first.
+        """
+        return Job.objects.filter(user=self.request.user).order_by("-created_at", "-id")
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = enqueue(request.user, serializer.validated_data["kind"], serializer.validated_data["params"])
+        return job_accepted(job)
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """
+    View to poll the status, progress and result of a background job.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Return the jobs the authenticated user is allowed to access.
+        """
+        user = self.request.user
+        return Job.objects.all() if user.is_superuser else Job.objects.filter(user=user)
+
+
+class JobDownloadView(JobDetailView):
+    """
+    View to download the file a finished export job wrote.
+    """
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != JobStatusChoice.SUCCEEDED or not (job.result or {}).get("file"):
+            return Response(
+                {"message": "This job has no file to download (yet)."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        name = job.result["file"]
+        return FileResponse(
+            private_storage.open(name, "rb"),
+            as_attachment=True,
+            filename=name.rsplit("/", 1)[-1],
+            content_type=job.result.get("content_type"),
+        )
@@ -0,0 +1,53 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+try:
+    import fcntl
+except ImportError:  # Windows: serialise within the process only.
+    fcntl = None
+
+_lock = threading.Lock()
+_state = threading.local()
+
+
+def writer_lock_path(connection):
+    return f"{connection.settings_dict['NAME']}.writer-lock"
+
+
+@contextmanager
+def serialized_writes(using="default"):
+    """
+    Queue long SQLite writes (imports, bulk writes) behind each other across
+    threads and worker processes, so they take turns on the write lock
+    instead of spinning in `busy_timeout` and starving short writes.
+
+    A no-op unless `SQLITE_SERIALIZE_WRITES` is set and `using` is SQLite;
+    re-entrant within a thread.
+    """
+    connection = connections[using]
+    if (
+        not settings.SQLITE_SERIALIZE_WRITES
+        or connection.vendor != "sqlite"
+        or connection.is_in_memory_db()
+        or getattr(_state, "held", False)
+    ):
+        yield
+        return
+
+    with _lock:
+        fd = None
+        if fcntl is not None:
+            fd = os.open(writer_lock_path(connection), os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        _state.held = True
+        try:
+            yield
+        finally:
+            _state.held = False
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
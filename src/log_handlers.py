@@ -0,0 +1,23 @@
+import logging
+import os
+from datetime import datetime
+
+
+class LazyFileHandler(logging.FileHandler):
+    """
+    `FileHandler` that does nothing on disk until the first record.
+
+    The log directory is created and the file opened on first write, and
+    `strftime` codes in `filename` (e.g. `api_%Y_%m_%d.log`) are expanded
+    at that moment, so configuring logging costs no I/O at startup and
+    processes that never log never touch the file system.
+    """
+
+    def __init__(self, filename, mode="a", encoding=None, errors=None):
+        self.filename_pattern = os.fspath(filename)
+        super().__init__(filename, mode=mode, encoding=encoding, delay=True, errors=errors)
+
+    def _open(self):
+        self.baseFilename = os.path.abspath(datetime.now().strftime(self.filename_pattern))
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
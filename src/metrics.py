@@ -0,0 +1,322 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from rest_framework import serializers
+
+# Stats of the request being handled in the current thread or task, if any.
+_current = ContextVar("request_metrics", default=None)
+
+# `le` bounds (seconds) of the exported Prometheus histograms.
+EXPORT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EXPORT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class RequestMetrics:
+    """
+    Per-request counters filled in by the query wrapper and the `timed`
+    sections while the request is handled.
+    """
+    __slots__ = ("db_queries", "db_time", "auth_time", "serializer_time", "_open")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.auth_time = 0.0
+        self.serializer_time = 0.0
+        self._open = set()
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Add the time spent in the block to `<stage>_time` of the current
+    request; nested sections of the same stage are counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or stage in metrics._open:
+        yield
+        return
+    metrics._open.add(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._open.discard(stage)
+        attr = f"{stage}_time"
+        setattr(metrics, attr, getattr(metrics, attr) + time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_timer(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument():
+    """
+    Start timing database queries on every connection. Safe to call more
+    than once.
+
+    Authentication and serializer output are timed by the classes built on
+    `TimedAuthenticationMixin` and `TimedSerializerMixin`.
+    """
+    connection_created.connect(install_query_timer, dispatch_uid="metrics-query-timer")
+    for connection in connections.all(initialized_only=True):
+        install_query_timer(connection=connection)
+
+
+class TimedAuthenticationMixin:
+    """
+    Count a DRF authentication class's `authenticate` toward the request's
+    authentication time.
+    """
+
+    def authenticate(self, request):
+        with timed("auth"):
+            return super().authenticate(request)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """
+    `ListSerializer` whose output counts toward the request's serializer
+    time once for the whole list.
+    """
+
+    @property
+    def data(self):
+        with timed("serializer"):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Count a serializer's `.data` toward the request's serializer time;
+    `many=True` instances are timed as a whole.
+    """
+
+    @property
+    def data(self):
+        with timed("serializer"):
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        # `many=True` builds a plain `ListSerializer` unless `Meta` names one.
+        if type(serializer) is serializers.ListSerializer:
+            serializer.__class__ = TimedListSerializer
+        return serializer
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of durations in microseconds.
+
+    Each power-of-two range is split into `2 ** SUB_BUCKET_BITS` equal
+    buckets, so any value is known to within ~3% at every scale, and only
+    buckets that were hit are stored.
+    """
+    SUB_BUCKET_BITS = 5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    @classmethod
+    def bucket_bounds(cls, micros):
+        """
+        Return the [lower, upper) bounds of the bucket `micros` falls in.
+        """
+        shift = max(micros.bit_length() - cls.SUB_BUCKET_BITS - 1, 0)
+        lower = (micros >> shift) << shift
+        return lower, lower + (1 << shift)
+
+    def record(self, seconds):
+        lower, _ = self.bucket_bounds(int(seconds * 1_000_000))
+        with self.lock:
+            self.counts[lower] = self.counts.get(lower, 0) + 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self.lock:
+            return sorted(self.counts.items()), self.count, self.sum, self.max
+
+    @classmethod
+    def cumulative(cls, buckets, bounds):
+        """
+        Return the number of values at or below each bound (in seconds),
+        counting each bucket at its upper edge.
+        """
+        totals = [0] * len(bounds)
+        limits = [bound * 1_000_000 for bound in bounds]
+        for lower, count in buckets:
+            _, upper = cls.bucket_bounds(lower)
+            index = bisect_left(limits, upper)
+            if index < len(totals):
+                totals[index] += count
+        running = 0
+        for index, count in enumerate(totals):
+            running += count
+            totals[index] = running
+        return totals
+
+    @classmethod
+    def quantile(cls, buckets, count, maximum, q):
+        target = q * count
+        seen = 0
+        for lower, hits in buckets:
+            seen += hits
+            if seen >= target:
+                _, upper = cls.bucket_bounds(lower)
+                return min(upper / 1_000_000, maximum)
+        return maximum
+
+
+class EndpointStats:
+    """
+    Latency histogram and totals of one (view name, method) pair.
+    """
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.lock = threading.Lock()
+        self.statuses = {}
+        self.totals = dict.fromkeys(("db_queries", "db_seconds", "auth_seconds", "serializer_seconds", "response_bytes"), 0)
+
+    def record(self, status_code, seconds, metrics, size):
+        self.latency.record(seconds)
+        with self.lock:
+            self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+            self.totals["db_queries"] += metrics.db_queries
+            self.totals["db_seconds"] += metrics.db_time
+            self.totals["auth_seconds"] += metrics.auth_time
+            self.totals["serializer_seconds"] += metrics.serializer_time
+            self.totals["response_bytes"] += size
+
+
+class MetricsRegistry:
+    """
+    In-process store of the per-endpoint stats of this worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def endpoint(self, view, method):
+        key = (view, method)
+        stats = self.endpoints.get(key)
+        if stats is None:
+            with self.lock:
+                stats = self.endpoints.setdefault(key, EndpointStats())
+        return stats
+
+    def record(self, view, method, status_code, seconds, metrics, size):
+        self.endpoint(view, method).record(status_code, seconds, metrics, size)
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+
+    def render(self):
+        """
+        Return the stats in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP http_request_duration_seconds Wall time of requests per resolved URL name.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        quantiles = [
+            "# HELP http_request_duration_quantile_seconds Latency quantiles since start, from the HDR histogram.",
+            "# TYPE http_request_duration_quantile_seconds gauge",
+        ]
+        counters = {
+            "http_responses_total": ("Responses per status code.", []),
+            "http_request_db_queries_total": ("Database queries run while handling requests.", []),
+            "http_request_db_seconds_total": ("Time spent in database queries.", []),
+            "http_request_auth_seconds_total": ("Time spent authenticating requests.", []),
+            "http_request_serializer_seconds_total": ("Time spent producing serializer output.", []),
+            "http_response_bytes_total": ("Size of non-streaming response bodies.", []),
+        }
+        for (view, method), stats in sorted(self.endpoints.items()):
+            labels = f'view="{view}",method="{method}"'
+            buckets, count, total, maximum = stats.latency.snapshot()
+            for bound, cumulative in zip(EXPORT_BUCKETS, LatencyHistogram.cumulative(buckets, EXPORT_BUCKETS)):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+            for q in EXPORT_QUANTILES:
+                value = LatencyHistogram.quantile(buckets, count, maximum, q)
+                quantiles.append(f'http_request_duration_quantile_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+
+            with stats.lock:
+                statuses = sorted(stats.statuses.items())
+                totals = dict(stats.totals)
+            for status_code, hits in statuses:
+                counters["http_responses_total"][1].append(f'{{{labels},status="{status_code}"}} {hits}')
+            for name in ("db_queries", "db_seconds", "auth_seconds", "serializer_seconds"):
+                counters[f"http_request_{name}_total"][1].append(f"{{{labels}}} {totals[name]}")
+            counters["http_response_bytes_total"][1].append(f"{{{labels}}} {totals['response_bytes']}")
+
+        lines.extend(quantiles)
+        for name, (help_text, samples) in counters.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{sample}" for sample in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; requires `Authorization: Bearer
+    <METRICS_TOKEN>`. Without a token it is only open when `DEBUG` is set.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN:
+        header = request.headers.get("Authorization", "")
+        if not constant_time_compare(header, f"Bearer {settings.METRICS_TOKEN}"):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,125 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from src import metrics
+from src.queries import QueryInspector
+
+access_logger = logging.getLogger("access")
+
+# View name recorded for requests that did not resolve to a URL pattern.
+UNRESOLVED = "<unresolved>"
+
+# Methods recorded as-is; anything else is "OTHER" to bound the label values.
+KNOWN_METHODS = {"GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"}
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure every request: wall time, database queries and their time,
+    authentication and serializer time, and response size.
+
+    The numbers go to the `access` logger and into the per-URL-name latency
+    histograms served by `/metrics`. Streaming responses are measured up to
+    the first byte; their size is not known.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.METRICS_ENABLED or settings.ACCESS_LOG_ENABLED
+        if self.enabled:
+            metrics.instrument()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        stats, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        stats, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def record(self, request, response, elapsed, stats):
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED
+        size = 0 if response.streaming else len(response.content)
+
+        if settings.METRICS_ENABLED:
+            method = request.method if request.method in KNOWN_METHODS else "OTHER"
+            metrics.registry.record(view, method, response.status_code, elapsed, stats, size)
+
+        if settings.ACCESS_LOG_ENABLED and access_logger.isEnabledFor(logging.INFO):
+            access_logger.info(
+                "view=%s db=%d/%.2fms auth=%.2fms serializer=%.2fms bytes=%s",
+                view,
+                stats.db_queries,
+                stats.db_time * 1000,
+                stats.auth_time * 1000,
+                stats.serializer_time * 1000,
+                "-" if response.streaming else size,
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "status_code": response.status_code,
+                    "response_time": elapsed * 1000,
+                    "remote_addr": request.META.get("REMOTE_ADDR", "-"),
+                },
+            )
+
+
+class QueryInspectionMiddleware:
+    """
+    Run each request under a `QueryInspector`: queries slower than
+    `SLOW_QUERY_MS` are logged as they happen, and query shapes repeated
+    `QUERY_N_PLUS_ONE_THRESHOLD` times are logged as likely N+1 patterns
+    when the response is ready.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.QUERY_INSPECTION_ENABLED
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        with QueryInspector(label=f"{request.method} {request.path}") as inspector:
+            response = self.get_response(request)
+        inspector.report()
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        with QueryInspector(label=f"{request.method} {request.path}") as inspector:
+            response = await self.get_response(request)
+        inspector.report()
+        return response
@@ -0,0 +1,157 @@
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("queries")
+
+# Inspector collecting the queries of the current request, test or task.
+_current = ContextVar("query_inspector", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Reduce `sql` to its shape: literals and parameter lists become `?`, so
+    the same query issued for different rows groups together.
+    """
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = shape.replace("%s", "?")
+    shape = _IN_LIST.sub("(?)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def query_origin():
+    """
+    Return "path:line in function" of the innermost project frame that
+    issued the current query, skipping Django, DRF and this module.
+    """
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename.startswith(base) and "site-packages" not in filename and not filename.endswith("queries.py"):
+            return f"{filename[len(base) + 1:]}:{frame.lineno} in {frame.name}"
+    return "<unknown>"
+
+
+class QueryInspector:
+    """
+    Context manager recording every query run while it is active, grouped
+    by normalized shape.
+
+    Shapes run `n_plus_one_threshold` times or more are reported as likely
+    N+1 patterns, and queries slower than `slow_query_ms` are logged at once
+    with the code that issued them. Queries run from `sync_to_async`
+    threads, and inside nested inspectors, are seen too.
+    """
+
+    def __init__(self, n_plus_one_threshold=None, slow_query_ms=None, label=""):
+        if n_plus_one_threshold is None:
+            n_plus_one_threshold = settings.QUERY_N_PLUS_ONE_THRESHOLD
+        if slow_query_ms is None:
+            slow_query_ms = settings.SLOW_QUERY_MS
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms else None
+        self.label = label
+        self.shapes = Counter()
+        self.origins = {}
+        self.count = 0
+        self.duration = 0.0
+
+    def __enter__(self):
+        install()
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        shape = normalize_sql(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == self.n_plus_one_threshold:
+            # Where the repeats come from; looked up once per shape.
+            self.origins[shape] = query_origin()
+        if self.slow_query_seconds is not None and duration >= self.slow_query_seconds:
+            logger.warning(
+                "Slow query (%.1f ms)%s at %s: %s",
+                duration * 1000,
+                f" in {self.label}" if self.label else "",
+                query_origin(),
+                sql,
+            )
+
+    def repeated(self):
+        """
+        Return [(shape, count, origin)] of the shapes run at least
+        `n_plus_one_threshold` times, most frequent first.
+        """
+        if not self.n_plus_one_threshold:
+            return []
+        return [
+            (shape, count, self.origins.get(shape, "<unknown>"))
+            for shape, count in self.shapes.most_common()
+            if count >= self.n_plus_one_threshold
+        ]
+
+    def report(self):
+        for shape, count, origin in self.repeated():
+            logger.warning(
+                "Possible N+1%s: %d queries of the same shape from %s: %s",
+                f" in {self.label}" if self.label else "",
+                count,
+                origin,
+                shape,
+            )
+
+    def summary(self):
+        """
+        Return a readable listing of the query shapes, for test failures.
+        """
+        return "\n".join(
+            f"{count:>4} x {shape}" for shape, count in self.shapes.most_common()
+        )
+
+
+def inspect_query(execute, sql, params, many, context):
+    inspector = _current.get()
+    if inspector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        # Enclosing inspectors (a test around a request) see the query too.
+        while inspector is not None:
+            inspector.record(sql, duration)
+            inspector = inspector.parent
+
+
+def install_inspector(sender=None, connection=None, **kwargs):
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
+
+
+def install():
+    """
+    Route the queries of every connection through `inspect_query`. Safe to
+    call more than once.
+    """
+    connection_created.connect(install_inspector, dispatch_uid="query-inspector")
+    for connection in connections.all(initialized_only=True):
+        install_inspector(connection=connection)
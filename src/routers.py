@@ -0,0 +1,47 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Alias the current request reads from; None leaves reads on `default`.
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def choose_replica():
+    """
+    Return a random configured read replica alias, or None without replicas.
+    """
+    aliases = settings.DATABASE_REPLICA_ALIASES
+    return random.choice(aliases) if aliases else None
+
+
+def set_read_alias(alias):
+    """
+    Route the reads of the current request (or task) to `alias`; returns a
+    token for `reset_read_alias`.
+    """
+    return _read_alias.set(alias)
+
+
+def reset_read_alias(token):
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica chosen for the current request and every
+    write, migration and read outside such a request to `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as `default`.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
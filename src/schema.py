@@ -0,0 +1,249 @@
+import gzip
+import hashlib
+import re
+import threading
+from importlib.metadata import version
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_GET
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are built.
+    brotli = None
+
+# Schema format -> (file suffix, content type).
+FORMATS = {
+    "yaml": (".yaml", "application/vnd.oai.openapi"),
+    "json": (".json", "application/vnd.oai.openapi+json"),
+}
+# Content-Encoding -> file suffix of the precompressed variant, best first.
+ENCODINGS = {"br": ".br", "gzip": ".gz"} if brotli is not None else {"gzip": ".gz"}
+
+_ACCEPT_ENCODING = re.compile(r"\s*([a-z*]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?", re.IGNORECASE)
+
+
+def extend_schema_field(field):
+    """
+    drf-spectacular's `extend_schema_field`, or a no-op decorator when the
+    API docs are off (`SERVE_API_DOCS=False`) and drf-spectacular is not loaded.
+    """
+    if not settings.SERVE_API_DOCS:
+        return lambda target: target
+    from drf_spectacular.utils import extend_schema_field
+
+    return extend_schema_field(field)
+
+
+def source_hash():
+    """
+    Hash everything the generated schema depends on: the project's Python
+    source, the drf-spectacular and DRF versions and `SPECTACULAR_SETTINGS`.
+    """
+    root = Path(settings.BASE_DIR)
+    digest = hashlib.sha256()
+    digest.update(repr((version("drf-spectacular"), version("djangorestframework"))).encode())
+    digest.update(repr(sorted(settings.SPECTACULAR_SETTINGS.items())).encode())
+    for path in sorted((root / "src").rglob("*.py")):
+        digest.update(path.relative_to(root).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(content, quality=11)
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+class SchemaVariant:
+    """
+    One format of the schema: its body, precompressed bodies and ETags.
+    """
+
+    def __init__(self, schema_format, content, encoded=None):
+        self.format = schema_format
+        self.content_type = FORMATS[schema_format][1]
+        self.content = content
+        self.encoded = encoded if encoded is not None else {
+            encoding: compress(content, encoding) for encoding in ENCODINGS
+        }
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        # Strong ETags must differ between encodings of the same resource.
+        self.etags = {None: f'"{digest}"', **{encoding: f'"{digest}-{encoding}"' for encoding in self.encoded}}
+
+
+class SchemaCache:
+    """
+    The OpenAPI schema in every format and encoding, generated once and
+    then served from memory.
+
+    With `API_SCHEMA_CACHE_DIR` set the variants are also written there,
+    so later processes (and other workers) load them instead of running
+    the generator; `warm_schema_cache` fills the directory at deploy time.
+    The files are named after the build, so a deploy never serves the
+    schema of the one before.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.variants = None
+
+    @property
+    def directory(self):
+        return Path(settings.API_SCHEMA_CACHE_DIR) if settings.API_SCHEMA_CACHE_DIR else None
+
+    @property
+    def build_id(self):
+        return settings.API_SCHEMA_BUILD or source_hash()
+
+    def path(self, schema_format, build_id):
+        return self.directory / f"openapi-{build_id}{FORMATS[schema_format][0]}"
+
+    def get(self, schema_format):
+        if self.variants is None:
+            with self.lock:
+                if self.variants is None:
+                    self.variants = self.load() or self.build()
+        return self.variants[schema_format]
+
+    def generate(self):
+        """
+        Run drf-spectacular over the URLconf and return {format: bytes}.
+        """
+        from drf_spectacular.generators import SchemaGenerator
+        from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        return {
+            "yaml": OpenApiYamlRenderer().render(schema, renderer_context={}),
+            "json": OpenApiJsonRenderer().render(schema, renderer_context={}),
+        }
+
+    def build(self):
+        variants = {
+            schema_format: SchemaVariant(schema_format, content)
+            for schema_format, content in self.generate().items()
+        }
+        if self.directory is not None:
+            self.save(variants)
+        return variants
+
+    def save(self, variants):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        build_id = self.build_id
+        for variant in variants.values():
+            path = self.path(variant.format, build_id)
+            files = [(path, variant.content)] + [
+                (path.with_name(path.name + ENCODINGS[encoding]), content)
+                for encoding, content in variant.encoded.items()
+            ]
+            for target, content in files:
+                # Write then rename, so a concurrent reader never sees half a file.
+                partial = target.with_name(target.name + ".tmp")
+                partial.write_bytes(content)
+                partial.replace(target)
+
+    def load(self):
+        """
+        Return the variants of this build stored in `API_SCHEMA_CACHE_DIR`,
+        or None if any format is missing; missing encodings are compressed again.
+        """
+        if self.directory is None:
+            return None
+        build_id = self.build_id
+        variants = {}
+        for schema_format in FORMATS:
+            path = self.path(schema_format, build_id)
+            if not path.exists():
+                return None
+            content = path.read_bytes()
+            encoded = {}
+            for encoding, extension in ENCODINGS.items():
+                compressed = path.with_name(path.name + extension)
+                encoded[encoding] = compressed.read_bytes() if compressed.exists() else compress(content, encoding)
+            variants[schema_format] = SchemaVariant(schema_format, content, encoded)
+        return variants
+
+    def prune(self):
+        """
+        Delete the files of other builds from `API_SCHEMA_CACHE_DIR` and
+        return how many were deleted.
+        """
+        keep = f"openapi-{self.build_id}."
+        stale = [path for path in self.directory.glob("openapi-*") if not path.name.startswith(keep)]
+        for path in stale:
+            path.unlink(missing_ok=True)
+        return len(stale)
+
+    def refresh(self):
+        """
+        Regenerate the schema, replacing the in-memory and on-disk copies.
+        """
+        variants = self.build()
+        with self.lock:
+            self.variants = variants
+        return variants
+
+
+schema_cache = SchemaCache()
+
+
+def preferred_encoding(header):
+    """
+    Return the best encoding of `ENCODINGS` that the Accept-Encoding
+    `header` allows, or None for identity.
+    """
+    accepted = {}
+    for part in header.split(","):
+        match = _ACCEPT_ENCODING.fullmatch(part)
+        if match:
+            try:
+                accepted[match.group(1).lower()] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def requested_format(request):
+    """
+    `?format=json|yaml` like `SpectacularAPIView`, else the Accept header;
+    YAML by default.
+    """
+    schema_format = request.GET.get("format")
+    if schema_format in FORMATS:
+        return schema_format
+    accept = request.headers.get("Accept", "")
+    return "json" if "json" in accept and "yaml" not in accept else "yaml"
+
+
+@require_GET
+def cached_schema_view(request):
+    """
+    Serve the OpenAPI schema from `schema_cache`: a memory lookup with a
+    strong ETag, `Cache-Control` and a precompressed body when the client
+    accepts one.
+    """
+    variant = schema_cache.get(requested_format(request))
+    encoding = preferred_encoding(request.headers.get("Accept-Encoding", ""))
+    etag = variant.etags[encoding]
+
+    if_none_match = request.headers.get("If-None-Match", "")
+    if if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            variant.encoded[encoding] if encoding else variant.content, content_type=variant.content_type
+        )
+        if encoding:
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_MAX_AGE)
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    return response
@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
-from decouple import config
-from datetime import datetime, timedelta
+from decouple import Csv, config
+from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,16 +21,21 @@ DEBUG = True
 ALLOWED_HOSTS = ["*"]  # Allow all hosts for development; adjust in production
 
 
+# Admin site and API docs (schema, Swagger UI, ReDoc); workers that serve
+# neither can turn them off to skip loading the admin and drf-spectacular
+SERVE_ADMIN = config("SERVE_ADMIN", default=True, cast=bool)
+SERVE_API_DOCS = config("SERVE_API_DOCS", default=True, cast=bool)
+
 # Application definition
 
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    *(["django.contrib.admin"] if SERVE_ADMIN else []),
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "drf_spectacular",
+    *(["drf_spectacular"] if SERVE_API_DOCS else []),
     "rest_framework",
     "rest_framework_simplejwt",
     "corsheaders",
@@ -43,6 +48,8 @@ INSTALLED_APPS += [
 ]
 
 MIDDLEWARE = [
+    "src.middleware.RequestMetricsMiddleware",  # Access log and latency histograms
+    "src.middleware.QueryInspectionMiddleware",  # Slow query and N+1 warnings
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # CORS middleware
@@ -83,6 +90,91 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile: WAL (readers never wait for the writer), fsync only
+# at checkpoints, waiting on locks instead of failing with "database is locked",
+# memory-mapped reads, persistent health-checked connections, and long writes
+# (imports, bulk writes) serialised through a cross-process writer lock
+SQLITE_PRODUCTION = config("SQLITE_PRODUCTION", default=False, cast=bool)
+SQLITE_BUSY_TIMEOUT_MS = config("SQLITE_BUSY_TIMEOUT_MS", default=5000, cast=int)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": config("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024, cast=int),
+    "cache_size": config("SQLITE_CACHE_SIZE", default=-64 * 1024, cast=int),  # negative: KiB
+    "temp_store": "MEMORY",
+}
+SQLITE_SERIALIZE_WRITES = config("SQLITE_SERIALIZE_WRITES", default=SQLITE_PRODUCTION, cast=bool)
+
+if SQLITE_PRODUCTION:
+    DATABASES["default"].update({
+        "OPTIONS": {
+            "init_command": ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            "transaction_mode": "IMMEDIATE",
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        },
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=600, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+    })
+
+# Read replicas: comma-separated database names, each a copy of `default` kept
+# up to date by replication. Safe requests to the expense reads use a replica,
+# except for users who wrote in the last DATABASE_REPLICA_STICKY_SECONDS
+# (keep it above the replication lag), who read their writes from `default`.
+DATABASE_REPLICAS = config("DATABASE_REPLICAS", default="", cast=Csv())
+DATABASE_REPLICA_ALIASES = []
+for index, name in enumerate(DATABASE_REPLICAS, start=1):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {**DATABASES["default"], "NAME": name, "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICA_ALIASES.append(alias)
+DATABASE_ROUTERS = ["src.routers.ReplicaRouter"]
+DATABASE_REPLICA_STICKY_SECONDS = config("DATABASE_REPLICA_STICKY_SECONDS", default=10, cast=int)
+# Cache holding those pins; it must be shared by all workers (file or Redis
+# backend), otherwise the replicas are not used
+DATABASE_REPLICA_PIN_CACHE_ALIAS = config("DATABASE_REPLICA_PIN_CACHE_ALIAS", default="default")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; use the file or Redis backend
+# (django.core.cache.backends.redis.RedisCache, requires `redis`) when
+# running several worker processes so invalidation is shared.
+
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="expense-tracker"),
+    }
+}
+
+
+# Password hashing: new hashes (and rehashes of older ones on login) use PASSWORD_HASHER
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="django.contrib.auth.hashers.PBKDF2PasswordHasher")
+PASSWORD_HASHERS = [PASSWORD_HASHER] + [
+    hasher
+    for hasher in (
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.Argon2PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+    )
+    if hasher != PASSWORD_HASHER
+]
+
+# Login password checks run on LOGIN_HASH_WORKERS threads with up to LOGIN_HASH_QUEUE_DEPTH
+# more waiting (at most LOGIN_HASH_QUEUE_TIMEOUT seconds); further logins get a 429
+LOGIN_HASH_WORKERS = config("LOGIN_HASH_WORKERS", default=os.cpu_count() or 1, cast=int)
+LOGIN_HASH_QUEUE_DEPTH = config("LOGIN_HASH_QUEUE_DEPTH", default=16, cast=int)
+LOGIN_HASH_QUEUE_TIMEOUT = config("LOGIN_HASH_QUEUE_TIMEOUT", default=2.0, cast=float)
+LOGIN_BUSY_RETRY_AFTER = config("LOGIN_BUSY_RETRY_AFTER", default=1, cast=int)
+
+# Failed logins: token buckets per username and per client IP, refilled by one
+# token every LOGIN_FAILURE_REFILL_SECONDS
+LOGIN_FAILURES_PER_USERNAME = config("LOGIN_FAILURES_PER_USERNAME", default=5, cast=int)
+LOGIN_FAILURES_PER_IP = config("LOGIN_FAILURES_PER_IP", default=20, cast=int)
+LOGIN_FAILURE_REFILL_SECONDS = config("LOGIN_FAILURE_REFILL_SECONDS", default=60, cast=int)
+LOGIN_RATE_LIMIT_CACHE_ALIAS = config("LOGIN_RATE_LIMIT_CACHE_ALIAS", default="default")
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,6 +216,10 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# User data (export results, uploaded statements, reject reports) is kept out of
+# MEDIA_ROOT, which DEBUG serves to anyone, and only streamed by views that check access
+PRIVATE_MEDIA_ROOT = config("PRIVATE_MEDIA_ROOT", default=str(BASE_DIR / "private"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -136,19 +232,103 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",  # React development server
 ]
 
+# Build `request.user` without fetching the User row per request; `is_active` and the
+# staff/superuser flags are cached and re-read at most every JWT_USER_STATE_TTL seconds
+JWT_STATELESS_AUTHENTICATION = config("JWT_STATELESS_AUTHENTICATION", default=True, cast=bool)
+JWT_USER_STATE_TTL = config("JWT_USER_STATE_TTL", default=60, cast=int)
+JWT_USER_STATE_CACHE_ALIAS = config("JWT_USER_STATE_CACHE_ALIAS", default="default")
+
+# Revoked refresh tokens are checked in memory; each worker pulls new revocations
+# from the database at most every REVOKED_TOKEN_SYNC_SECONDS
+REVOKED_TOKEN_SYNC_SECONDS = config("REVOKED_TOKEN_SYNC_SECONDS", default=30, cast=int)
+
+# Reverse proxies in front of the app that append the client address to
+# X-Forwarded-For; 0 identifies clients (e.g. for login limits) by REMOTE_ADDR
+NUM_PROXIES = config("NUM_PROXIES", default=0, cast=int)
+
 # REST Framework settings
 REST_FRAMEWORK = {
-    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    **({"DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema"} if SERVE_API_DOCS else {}),
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "src.apps.auth.authentication.StatelessJWTAuthentication"
+        if JWT_STATELESS_AUTHENTICATION
+        else "src.apps.auth.authentication.TimedJWTAuthentication",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 1,
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "LIST_SERIALIZER_ERRORS_AS_DICT": True,
+    "NUM_PROXIES": NUM_PROXIES,
 }
 
+# Expense list pagination (`?pagination=cursor` switches to keyset pagination)
+EXPENSE_PAGE_SIZE = config("EXPENSE_PAGE_SIZE", default=50, cast=int)
+EXPENSE_MAX_PAGE_SIZE = config("EXPENSE_MAX_PAGE_SIZE", default=500, cast=int)
+
+# Serialize expense lists and exports from values() rows instead of model instances
+EXPENSE_FAST_SERIALIZER = config("EXPENSE_FAST_SERIALIZER", default=True, cast=bool)
+
+# Bulk expense writes: max items per request and rows per INSERT/UPDATE batch
+EXPENSE_BULK_MAX_ITEMS = config("EXPENSE_BULK_MAX_ITEMS", default=1000, cast=int)
+EXPENSE_BULK_BATCH_SIZE = config("EXPENSE_BULK_BATCH_SIZE", default=500, cast=int)
+
+# Streaming exports: rows fetched per database round trip and rows per written block
+EXPENSE_EXPORT_CHUNK_SIZE = config("EXPENSE_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+EXPENSE_EXPORT_FLUSH_ROWS = config("EXPENSE_EXPORT_FLUSH_ROWS", default=500, cast=int)
+
+# CSV imports: rows validated and inserted per committed chunk, rejects echoed in the
+# response, and the largest upload imported within the request (bigger ones are queued)
+EXPENSE_IMPORT_BATCH_SIZE = config("EXPENSE_IMPORT_BATCH_SIZE", default=5000, cast=int)
+EXPENSE_IMPORT_MAX_REPORTED_REJECTS = config("EXPENSE_IMPORT_MAX_REPORTED_REJECTS", default=100, cast=int)
+EXPENSE_IMPORT_SYNC_MAX_BYTES = config("EXPENSE_IMPORT_SYNC_MAX_BYTES", default=1024 * 1024, cast=int)
+
+# Read-through cache of expense list/detail responses (invalidated per user on
+# write); only used when EXPENSE_CACHE_ALIAS is shared between workers, not local memory
+EXPENSE_CACHE_ENABLED = config("EXPENSE_CACHE_ENABLED", default=True, cast=bool)
+EXPENSE_CACHE_ALIAS = config("EXPENSE_CACHE_ALIAS", default="default")
+EXPENSE_CACHE_TIMEOUT = config("EXPENSE_CACHE_TIMEOUT", default=300, cast=int)
+
+# Serve month-level summaries and balances from `ExpenseMonthlyRollup`
+# (run `manage.py rebuild_expense_rollups` once after enabling on existing data)
+EXPENSE_SUMMARY_USE_ROLLUPS = config("EXPENSE_SUMMARY_USE_ROLLUPS", default=True, cast=bool)
+
+# Expenses older than this many days are moved to the archive table by
+# `manage.py archive_expenses`, this many rows per transaction
+EXPENSE_ARCHIVE_AFTER_DAYS = config("EXPENSE_ARCHIVE_AFTER_DAYS", default=365, cast=int)
+EXPENSE_ARCHIVE_BATCH_SIZE = config("EXPENSE_ARCHIVE_BATCH_SIZE", default=1000, cast=int)
+
+# `run_recurring_expenses` handles this many due schedules per transaction, and
+# creates at most EXPENSE_RECURRING_CATCH_UP_LIMIT missed occurrences of one
+# schedule per batch when catching up after downtime
+EXPENSE_RECURRING_BATCH_SIZE = config("EXPENSE_RECURRING_BATCH_SIZE", default=1000, cast=int)
+EXPENSE_RECURRING_CATCH_UP_LIMIT = config("EXPENSE_RECURRING_CATCH_UP_LIMIT", default=100, cast=int)
+
+# Background jobs run by `manage.py run_workers`: worker processes and how often
+# an idle one polls, how long a worker holds a job between progress reports
+# before another may take it over, and retries with exponential backoff
+JOB_WORKER_CONCURRENCY = config("JOB_WORKER_CONCURRENCY", default=2, cast=int)
+JOB_POLL_INTERVAL = config("JOB_POLL_INTERVAL", default=1.0, cast=float)
+JOB_LEASE_SECONDS = config("JOB_LEASE_SECONDS", default=300, cast=int)
+JOB_MAX_ATTEMPTS = config("JOB_MAX_ATTEMPTS", default=3, cast=int)
+JOB_RETRY_BACKOFF_SECONDS = config("JOB_RETRY_BACKOFF_SECONDS", default=10, cast=int)
+JOB_RETRY_MAX_BACKOFF_SECONDS = config("JOB_RETRY_MAX_BACKOFF_SECONDS", default=600, cast=int)
+
+# Per-request instrumentation: latency histograms per URL name served on
+# `/metrics` and the `access` log. Scrapes need `Authorization: Bearer
+# <METRICS_TOKEN>`; without a token `/metrics` is only served when DEBUG is set
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+ACCESS_LOG_ENABLED = config("ACCESS_LOG_ENABLED", default=True, cast=bool)
+
+# Query inspection (`src.queries`): log queries slower than SLOW_QUERY_MS
+# (0 disables) and query shapes repeated QUERY_N_PLUS_ONE_THRESHOLD times
+# in one request to the `queries` logger
+QUERY_INSPECTION_ENABLED = config("QUERY_INSPECTION_ENABLED", default=DEBUG, cast=bool)
+SLOW_QUERY_MS = config("SLOW_QUERY_MS", default=200, cast=int)
+QUERY_N_PLUS_ONE_THRESHOLD = config("QUERY_N_PLUS_ONE_THRESHOLD", default=5, cast=int)
+
 # Spectacular settings for OpenAPI schema generation
 SPECTACULAR_SETTINGS = {
     "TITLE": "Expense Tracker API",
@@ -157,6 +337,16 @@ SPECTACULAR_SETTINGS = {
     "SCHEMA_PATH_PREFIX": "/api/v[0-9]",
 }
 
+# /schema/ is generated once per process and then served from memory with an
+# ETag and gzip/brotli variants; with API_SCHEMA_CACHE_DIR set it is also kept
+# on disk, where `manage.py warm_schema_cache` writes it at deploy time
+API_SCHEMA_CACHE_ENABLED = config("API_SCHEMA_CACHE_ENABLED", default=True, cast=bool)
+API_SCHEMA_CACHE_DIR = config("API_SCHEMA_CACHE_DIR", default="")
+# Names the files in API_SCHEMA_CACHE_DIR, e.g. the release's git commit; empty
+# uses a hash of the source code and of the schema generator's versions and settings
+API_SCHEMA_BUILD = config("API_SCHEMA_BUILD", default="")
+API_SCHEMA_MAX_AGE = config("API_SCHEMA_MAX_AGE", default=3600, cast=int)
+
 
 # JWT Configuration
 ACCESS_TOKEN_LIFETIME = config("ACCESS_TOKEN_LIFETIME", default=60, cast=int)
@@ -194,8 +384,8 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "src.apps.auth.serializers.UserTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "src.apps.auth.serializers.RevocableTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
@@ -203,11 +393,9 @@ SIMPLE_JWT = {
 }
 
 
-# Logging configuration
-FILENAME_SUFFIX = str(datetime.now().date()).replace("-", "_")
+# Logging configuration; the file handlers create the directory and open their
+# file on the first record, not at startup
 LOGS_DIRECTORY = f"{BASE_DIR}/logs"
-if os.path.exists(LOGS_DIRECTORY) is False:
-    os.makedirs(LOGS_DIRECTORY, exist_ok=True)
 
 
 LOGGING = {
@@ -227,7 +415,7 @@ LOGGING = {
         },
         "short": {"format": "%(levelname)s : %(message)s"},
         "access-verbose": {
-            "format": "%(asctime)s  HTTP %(method)s %(path)s %(status_code)s [%(response_time).2f, %(remote_addr)s]",
+            "format": "%(asctime)s  HTTP %(method)s %(path)s %(status_code)s [%(response_time).2f, %(remote_addr)s] %(message)s",
             "datefmt": "%Y-%m-%d %H:%M:%S",
             "style": "%",
         },
@@ -235,8 +423,8 @@ LOGGING = {
     "handlers": {
         "log-handler": {
             "level": "DEBUG",
-            "class": "logging.FileHandler",
-            "filename": f"{LOGS_DIRECTORY}/api_{FILENAME_SUFFIX}.log",
+            "class": "src.log_handlers.LazyFileHandler",
+            "filename": f"{LOGS_DIRECTORY}/api_%Y_%m_%d.log",
             "formatter": "log-format",
         },
         "console": {
@@ -246,13 +434,13 @@ LOGGING = {
         },
         "file": {
             "level": "INFO",
-            "class": "logging.FileHandler",
+            "class": "src.log_handlers.LazyFileHandler",
             "filename": os.path.join(LOGS_DIRECTORY, "django.log"),
             "formatter": "log-format",
         },
         "access-file": {
             "level": "INFO",
-            "class": "logging.FileHandler",
+            "class": "src.log_handlers.LazyFileHandler",
             "filename": os.path.join(LOGS_DIRECTORY, "access.log"),
             "formatter": "access-verbose",
         },
@@ -278,7 +466,19 @@ LOGGING = {
             "level": "WARNING",
             "propagate": False,
         },
-        # Optional: can be uses when emitting custom access logs
+        # Slow queries and likely N+1 patterns from `src.queries`
+        "queries": {
+            "handlers": ["console", "file"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+        # Retries and failures of background jobs (`manage.py run_workers`)
+        "jobs": {
+            "handlers": ["console", "file"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        # One line per request from `src.middleware.RequestMetricsMiddleware`
         "access": {
             "handlers": ["access-file"],
             "level": "INFO",
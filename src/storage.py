@@ -0,0 +1,29 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class PrivateStorage(FileSystemStorage):
+    """
+    File storage for user data that must never be served as static media:
+    export results, uploaded statements and import reject reports.
+
+    Files live under `PRIVATE_MEDIA_ROOT`, outside `MEDIA_ROOT`, and have no
+    URL; views that check ownership stream them instead.
+    """
+
+    @property
+    def base_location(self):
+        # Read per access so that overriding the setting (e.g. in tests) applies.
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError("Private files have no URL; serve them through a view that checks access.")
+
+
+private_storage = PrivateStorage()
@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from src.queries import QueryInspector, install
+
+
+class QueryBudgetMixin:
+    """
+    `TestCase` mixin asserting an upper bound on the queries a block runs,
+    failing with the queries grouped by shape.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The test connection is already open, so `connection_created` will
+        # not fire for it; async views query through it as well.
+        install()
+
+    @contextmanager
+    def assertMaxQueries(self, limit, n_plus_one_threshold=None):
+        """
+        Fail if the block runs more than `limit` queries or repeats one
+        query shape `n_plus_one_threshold` times (see `QueryInspector`).
+        """
+        with QueryInspector(n_plus_one_threshold=n_plus_one_threshold, slow_query_ms=0) as inspector:
+            yield inspector
+        if inspector.count > limit:
+            self.fail(f"{inspector.count} queries run, budget is {limit}:\n{inspector.summary()}")
+        repeated = inspector.repeated()
+        if repeated:
+            shape, count, origin = repeated[0]
+            self.fail(f"Possible N+1: {count} queries of the same shape from {origin}:\n{shape}")
@@ -1,20 +1,37 @@
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
-)
+
+from src.metrics import metrics_view
 
 api_prefix: str = "api"
 
-urlpatterns = [
-    path("admin/", admin.site.urls),
-    path(f"schema/", SpectacularAPIView.as_view(), name="schema"),
-    path("", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
-    path("redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
+urlpatterns = []
+
+# The admin and the docs views are only imported when served.
+if settings.SERVE_ADMIN:
+    from django.contrib import admin
+
+    urlpatterns += [path("admin/", admin.site.urls)]
+
+if settings.SERVE_API_DOCS:
+    from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
+
+    if settings.API_SCHEMA_CACHE_ENABLED:
+        from src.schema import cached_schema_view as schema_view
+    else:
+        from drf_spectacular.views import SpectacularAPIView
+
+        schema_view = SpectacularAPIView.as_view()
+
+    urlpatterns += [
+        path("schema/", schema_view, name="schema"),
+        path("", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
+        path("redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
+    ]
+
+urlpatterns += [
+    path("metrics", metrics_view, name="metrics"),
 
     path(
         f"{api_prefix}/",
@@ -24,6 +41,7 @@ urlpatterns = [
                 include([
                     path("auth/", include("src.apps.auth.urls")),       # Authentication URLs
                     path("expenses/", include("src.apps.expenses.urls")),   # Expenses URLs
+                    path("async/expenses/", include("src.apps.expenses.async_urls")),   # Async expense read URLs
                 ]),
             ),
         ]),